@@ -0,0 +1,141 @@
+import threading
+from contextlib import contextmanager
+from playwright.sync_api import sync_playwright, Error as PlaywrightError
+
+class BrowserPool:
+    """
+    Shared pool of long-lived Chromium browsers for every Playwright user.
+
+    Each lease is an isolated page in a fresh browser context (own cookies,
+    storage and headers), so callers get a clean page without paying for a
+    browser launch. A browser is recycled after max_uses leases, or when it
+    has crashed or was closed by the user, and at most max_pages pages are
+    leased at a time across all threads.
+
+    Playwright's sync API is bound to the thread that started it, so browsers
+    are kept per thread (and per headless/headful mode): a worker thread reuses
+    its own browser for every page it leases. Worker threads call
+    close_thread() when done; close() shuts down the calling thread's browsers.
+
+        with service_provider.get_browser_pool().page(extra_http_headers=headers) as page:
+            page.goto(url)
+    """
+
+    def __init__(self, max_pages=8, max_uses=100, launch_options=None):
+        self.max_pages = max_pages
+        self.max_uses = max_uses
+        self.launch_options = launch_options or {}
+        self._slots = threading.BoundedSemaphore(max_pages)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.launched = 0
+        self.leased = 0
+
+    ### Leasing ###
+
+    def lease(self, headless=True, **context_options):
+        """
+        Lease a page in a new context, blocking while max_pages pages are out.
+
+        Parameters:
+            headless (bool): Use a headless browser (False for searches that need a visible window).
+            context_options: Passed to browser.new_context(), e.g. extra_http_headers or user_agent.
+
+        Returns:
+            Page: Give it back with release() from the same thread.
+        """
+        self._slots.acquire()
+        try:
+            entry = self._browser(headless)
+            context = entry['browser'].new_context(**context_options)
+            page = context.new_page()
+        except Exception:
+            self._slots.release()
+            raise
+
+        entry['uses'] += 1
+        entry['active'] += 1
+        self._state().leases[page] = entry
+        with self._lock:
+            self.leased += 1
+        return page
+
+    def release(self, page):
+        """Close a leased page's context and recycle its browser if it is worn out or gone."""
+        entry = self._state().leases.pop(page, None)
+        if entry is None:
+            return
+        try:
+            page.context.close()
+        except PlaywrightError:
+            pass    # Already closed, e.g. by the user or a browser crash
+        finally:
+            entry['active'] -= 1
+            self._slots.release()
+
+        if entry['active'] == 0 and (entry['uses'] >= self.max_uses or not entry['browser'].is_connected()):
+            self._discard(entry)
+
+    @contextmanager
+    def page(self, headless=True, **context_options):
+        """Context manager around lease() and release()."""
+        page = self.lease(headless, **context_options)
+        try:
+            yield page
+        finally:
+            self.release(page)
+
+    ### Browsers ###
+
+    def _state(self):
+        state = self._local
+        if not hasattr(state, 'browsers'):
+            state.playwright = None
+            state.browsers = {}     # headless -> {'browser', 'uses', 'active'}
+            state.leases = {}       # page -> browser entry
+        return state
+
+    def _browser(self, headless):
+        state = self._state()
+        entry = state.browsers.get(headless)
+        if entry and not entry['browser'].is_connected():
+            # Crashed or closed by the user: pages still leased from it fail on their own
+            self._discard(entry)
+            entry = None
+
+        if entry is None:
+            if state.playwright is None:
+                state.playwright = sync_playwright().start()
+            browser = state.playwright.chromium.launch(**{**self.launch_options, 'headless': headless})
+            entry = state.browsers[headless] = {'browser': browser, 'headless': headless, 'uses': 0, 'active': 0}
+            with self._lock:
+                self.launched += 1
+        return entry
+
+    def _discard(self, entry):
+        state = self._state()
+        if state.browsers.get(entry['headless']) is entry:
+            del state.browsers[entry['headless']]
+        try:
+            entry['browser'].close()
+        except PlaywrightError:
+            pass
+
+    ### Shutdown ###
+
+    def close_thread(self):
+        """Close the calling thread's browsers and Playwright driver."""
+        state = self._state()
+        for page in list(state.leases):
+            self.release(page)
+        for entry in list(state.browsers.values()):
+            self._discard(entry)
+        if state.playwright is not None:
+            state.playwright.stop()
+            state.playwright = None
+
+    def close(self):
+        """Close the pool's browsers owned by the calling thread and print usage."""
+        self.close_thread()
+        if self.leased:
+            print(f"Browser pool: {self.leased} pages served by {self.launched} browser launches.")
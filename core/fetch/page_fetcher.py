@@ -0,0 +1,144 @@
+import re
+import threading
+import requests
+from collections import Counter
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+# Content types saved as text pages; anything else is a binary document
+TEXT_TYPES = ("text/", "application/xhtml", "application/xml", "application/json", "application/javascript")
+
+# Markers of pages that render their content with JavaScript or sit behind a browser check
+SCRIPT_SHELL = re.compile(
+    rb'<div[^>]+id=["\'](?:root|app|__next|___gatsby)["\'][^>]*>\s*</div>'
+    rb'|<noscript[^>]*>[^<]{0,200}(?:enable|requires?)\s+javascript'
+    rb'|cf-browser-verification|cf_chl_|challenge-platform|Just a moment\.\.\.',
+    re.IGNORECASE,
+)
+TAGS = re.compile(rb'<script\b.*?</script>|<style\b.*?</style>|<[^>]+>', re.IGNORECASE | re.DOTALL)
+MIN_TEXT = 200              # bytes of visible text below which a scripted page is treated as a shell
+BROWSER_STATUSES = {403, 429, 503}
+CHUNK_SIZE = 64 * 1024
+
+class FetchResult:
+    """Outcome of a plain HTTP fetch: the body, or why a browser is needed instead."""
+
+    def __init__(self, url, status=None, content_type="", body=b"", needs_browser=False, reason=None):
+        self.url = url
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+        self.needs_browser = needs_browser
+        self.reason = reason
+
+    @property
+    def failed(self):
+        return self.reason is not None and not self.needs_browser
+
+    @property
+    def binary(self):
+        if not self.content_type:
+            return not self.body.lstrip()[:1] == b"<"
+        return not self.content_type.startswith(TEXT_TYPES) and "html" not in self.content_type
+
+class PageFetcher:
+    """
+    Plain-HTTP fast path for page downloads, with escalation to a browser.
+
+    A pooled keep-alive requests.Session fetches each URL; compressed transfer
+    is negotiated by requests. The response headers are read before the body,
+    so the content type decides how the URL is treated. Documents such as PDF,
+    Office files and archives are returned as bytes, to be saved untouched.
+    Bodies larger than max_size are abandoned as they are read, whether or not
+    the server sent a Content-Length.
+    HTML that looks script-rendered is flagged needs_browser: an empty
+    root/app container, a "requires JavaScript" noscript, or little visible
+    text next to scripts. So are bot challenges and network errors. The caller
+    then renders it with Playwright and reports it with count('browser').
+
+    Counters per strategy (http, http_binary, browser, failed) are kept for
+    report().
+    """
+
+    def __init__(self, pool_size=16, timeout=30, max_size=100 * 1024 * 1024):
+        self.timeout = timeout
+        self.max_size = max_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"})
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def fetch(self, url, headers=None):
+        """
+        GET url over plain HTTP.
+
+        Returns:
+            FetchResult: With needs_browser set when the page should be rendered
+                in a browser instead; otherwise body holds the raw bytes.
+        """
+        try:
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                if response.status_code in BROWSER_STATUSES:
+                    return self._escalate(url, f"HTTP {response.status_code}", response.status_code, content_type)
+                if response.status_code >= 400:
+                    return self._fail(url, f"HTTP {response.status_code}", response.status_code, content_type)
+
+                size = int(response.headers.get("Content-Length") or 0)
+                if size > self.max_size:
+                    return self._fail(url, f"{size} bytes exceeds the {self.max_size} byte limit", response.status_code, content_type)
+                # Chunked and header-less responses are only bounded by counting what is read
+                chunks, size = [], 0
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.max_size:
+                        return self._fail(url, f"more than {self.max_size} bytes", response.status_code, content_type)
+                    chunks.append(chunk)
+                body = b"".join(chunks)
+        except requests.RequestException as e:
+            return self._escalate(url, str(e))
+
+        result = FetchResult(url, response.status_code, content_type, body)
+        if result.binary:
+            self.count("http_binary")
+            return result
+
+        reason = self.needs_javascript(body)
+        if reason:
+            return self._escalate(url, reason, response.status_code, content_type)
+        self.count("http")
+        return result
+
+    @staticmethod
+    def needs_javascript(body):
+        """Return why an HTML body needs a browser to render, or None if the HTTP copy is complete."""
+        head = body[:256 * 1024]
+        if SCRIPT_SHELL.search(head):
+            return "script-rendered page or browser check"
+        if b"<script" in head.lower() and len(TAGS.sub(b"", head).strip()) < MIN_TEXT:
+            return "little text outside scripts"
+        return None
+
+    def _escalate(self, url, reason, status=None, content_type=""):
+        return FetchResult(url, status, content_type, needs_browser=True, reason=reason)
+
+    def _fail(self, url, reason, status=None, content_type=""):
+        self.count("failed")
+        return FetchResult(url, status, content_type, reason=reason)
+
+    ### Counters ###
+
+    def count(self, strategy):
+        with self._lock:
+            self.counts[strategy] += 1
+
+    def report(self):
+        counts = self.counts
+        print(
+            f"Fetch strategies: {counts['http']} pages over HTTP, {counts['http_binary']} binary files over HTTP, "
+            f"{counts['browser']} pages rendered in a browser, {counts['failed']} failed."
+        )
@@ -1,8 +1,16 @@
 from core.auth.auth_service import AuthService
+from core.browser.browser_pool import BrowserPool
 
 class ServiceProvider:
     def __init__(self):
         self.auth_service = AuthService()
+        self.browser_pool = BrowserPool()
 
     def get_auth_service(self):
         return self.auth_service
+
+    def get_browser_pool(self):
+        return self.browser_pool
+
+    def shutdown(self):
+        self.browser_pool.close()
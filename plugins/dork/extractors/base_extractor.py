@@ -1,6 +1,69 @@
-from bs4 import BeautifulSoup
+from lxml import etree, html
+
+TEXT = etree.XPath('.//text()')
+HREF = etree.XPath('string(@href)')
+
+def has_class(name):
+    """XPath predicate matching elements whose class attribute contains the class name as a token."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
 
 class BaseExtractor:
+    """
+    Extracts result links from a search engine results page.
+
+    The page is parsed once with lxml and each engine describes its results
+    with XPath expressions compiled once at import:
+
+        RESULTS      result elements in the page
+        TITLE        the title element, relative to a result
+        LINK         the element carrying the href, relative to a result
+        DESCRIPTION  elements whose text describes the result, tried in order
+                     until one matches (default: the result itself)
+    """
+
+    RESULTS = None
+    TITLE = None
+    LINK = None
+    DESCRIPTION = (etree.XPath('.'),)
+
+    @classmethod
+    def extract_links(cls, content, seen_urls):
+        if cls.RESULTS is None:
+            raise NotImplementedError("This method should be implemented in a subclass.")
+
+        links_with_details = {}
+        try:
+            page = html.fromstring(content)
+        except etree.ParserError:
+            return links_with_details   # Empty page
+
+        for result in cls.RESULTS(page):
+            title_tag = cls.TITLE(result)
+            link_tag = cls.LINK(result)
+            if not title_tag or not link_tag:
+                continue
+
+            url = HREF(link_tag[0])
+            if not url or url in seen_urls:
+                continue
+
+            links_with_details[url] = {
+                'title': cls.text(title_tag[0]),
+                'description': cls.text(cls.description(result))
+            }
+            seen_urls.add(url)
+
+        return links_with_details
+
+    @classmethod
+    def description(cls, result):
+        for selector in cls.DESCRIPTION:
+            elements = selector(result)
+            if elements:
+                return elements[0]
+        return result
+
     @staticmethod
-    def extract_links(content, seen_urls):
-        raise NotImplementedError("This method should be implemented in a subclass.")
+    def text(element):
+        """Concatenated stripped text of an element, like BeautifulSoup's get_text(strip=True)."""
+        return ''.join(text.strip() for text in TEXT(element))
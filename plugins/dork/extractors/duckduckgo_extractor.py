@@ -1,26 +1,7 @@
+from lxml import etree
 from .base_extractor import BaseExtractor
-from bs4 import BeautifulSoup
 
 class DuckDuckGoExtractor(BaseExtractor):
-    @staticmethod
-    def extract_links(content, seen_urls):
-        soup = BeautifulSoup(content, 'html.parser')
-        links_with_details = {}
-
-        for result in soup.find_all('article', {'data-testid': 'result'}):
-            title_tag = result.find('h2')
-            link_tag = title_tag.find('a', href=True) if title_tag else None
-            if title_tag and link_tag:
-                title = title_tag.get_text(strip=True)
-                url = link_tag['href']
-                
-                description = result.get_text(strip=True)
-
-                if url not in seen_urls:
-                    links_with_details[url] = {
-                        'title': title,
-                        'description': description
-                    }
-                    seen_urls.add(url)
-
-        return links_with_details
+    RESULTS = etree.XPath("//article[@data-testid='result']")
+    TITLE = etree.XPath(".//h2")
+    LINK = etree.XPath("(.//h2)[1]//a[@href]")
@@ -6,7 +6,7 @@ from plugins.dork.processing import get_all_emails, extract_files_from_links
 from plugins.website.processing import clean_data, get_keywords
 
 DATA_DIR = "data/dorking_output/"
-LINKS_FILE = "data/dorking_output/collected_links.json"
+LINKS_FILE = "data/dorking_output/collected_links.jsonl"
 DORKS_FILE = "plugins/dork/cool_dorks.txt"
 FILE_EXTENSIONS = ["pdf", "jpeg", "webp", "dat", "sql", "webm", "bin", "docx", "doc", "pptx", "xlsx", "jpg", "png", "txt", "bak", "backup", "xls", "csv", "md", "cpp", "py"]
 
@@ -25,6 +25,8 @@ class Handler(Plugin):
         collect_parser.add_argument("--download", action="store_true", help="Download content of collected links", required=False)
         collect_parser.add_argument("--slow-search", action="store_true", help="Enable slower search", required=False)
         collect_parser.add_argument("--max-pages", type=int, help="Limit on pages to collect", required=False, default=100)
+        collect_parser.add_argument("--concurrency", type=int, help="Pages downloaded at once with --download", required=False, default=8)
+        collect_parser.add_argument("--per-host", type=int, help="Pages downloaded at once from one host with --download", required=False, default=2)
 
         dorking_subparsers.add_parser("clean", help="Remove all collected data")
 
@@ -54,7 +56,10 @@ class Handler(Plugin):
             max_pages=args.max_pages, 
             link_file=LINKS_FILE,
             slow_search=args.slow_search, 
-            no_download=not args.download
+            no_download=not args.download,
+            browser_pool=self.service_provider.get_browser_pool(),
+            concurrency=args.concurrency,
+            per_host=args.per_host
         )
         dorker.run(args.query)
         print("Data collection completed.")
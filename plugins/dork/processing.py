@@ -1,6 +1,6 @@
 import os
 import re
-import json 
+from plugins.dork.services.file_logger import read_links
 
 def extract_emails_from_text(text):
     email_pattern = r'[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+'
@@ -46,14 +46,8 @@ FILE_EXTENSIONS = [
 ]
 
 def extract_files_from_links(link_file):
-    file_links = []
-    if os.path.exists(link_file):
-        with open(link_file, 'r', encoding='utf-8') as f:
-            links = json.load(f)
-            for url, details in links.items():
-                if any(url.lower().endswith(f".{ext}") for ext in FILE_EXTENSIONS):
-                    file_links.append(url)
-    return file_links
+    extensions = tuple(f".{ext}" for ext in FILE_EXTENSIONS)
+    return [url for url in read_links(link_file) if url.lower().endswith(extensions)]
 
 def process_files_for_extension(links_file):
     file_links = extract_files_from_links(links_file)
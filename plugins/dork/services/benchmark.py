@@ -0,0 +1,70 @@
+"""
+Parsing micro-benchmark for the search result extractors.
+
+Times LinkExtractor over saved search engine result pages, one HTML file per
+page named after its engine (google*.html, bing*.html, duckduckgo*.html,
+yandex*.html). The bundled fixtures in plugins/dork/benchmark_fixtures are
+synthetic pages with the engines' result markup; save real pages (e.g. from
+the browser's "Save page as") into a directory to measure those instead:
+
+    python -m plugins.dork.services.benchmark --fixtures plugins/dork/benchmark_fixtures --repeat 200
+
+Every page reports its size, the links extracted and the mean and best
+milliseconds per parse.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from plugins.dork.services.link_extractor import LinkExtractor, methods
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmark_fixtures")
+
+def load_fixtures(directory):
+    """Return [(engine, file name, HTML)] for every *.html page whose name starts with an engine name."""
+    fixtures = []
+    for name in sorted(os.listdir(directory)):
+        engine = next((engine for engine in methods if name.startswith(engine)), None)
+        if engine and name.endswith((".html", ".htm")):
+            with open(os.path.join(directory, name), "r", encoding="utf-8", errors="ignore") as f:
+                fixtures.append((engine, name, f.read()))
+    return fixtures
+
+def time_extraction(engine, content, repeat):
+    """Parse a page repeat times; returns (links found, mean ms, best ms)."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        links = LinkExtractor.extract_links(content, engine, set())
+        timings.append(time.perf_counter() - started)
+    return len(links), sum(timings) / repeat * 1000, min(timings) * 1000
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark search result extraction over saved result pages.")
+    parser.add_argument("--fixtures", type=str, default=FIXTURES_DIR, help="Directory of saved <engine>*.html pages")
+    parser.add_argument("--repeat", type=int, default=100, help="Parses per page (default: 100)")
+    parser.add_argument("--json", type=str, help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        print(f"No <engine>*.html pages found in {args.fixtures}.")
+        return 1
+
+    results = []
+    print(f"{'page':<28} {'KiB':>8} {'links':>6} {'mean ms':>9} {'best ms':>9}")
+    for engine, name, content in fixtures:
+        links, mean, best = time_extraction(engine, content, args.repeat)
+        results.append({"engine": engine, "page": name, "bytes": len(content), "links": links,
+                        "mean_ms": round(mean, 3), "best_ms": round(best, 3)})
+        print(f"{name:<28} {len(content) / 1024:>8.1f} {links:>6} {mean:>9.2f} {best:>9.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"parameters": vars(args), "results": results}, file, indent=2)
+        print(f"Results written to {args.json}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
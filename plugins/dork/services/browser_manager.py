@@ -1,24 +1,18 @@
-from playwright.sync_api import sync_playwright
-
 class BrowserManager:
-    def __init__(self):
-        self.playwright = None
-        self.browser = None
+    def __init__(self, browser_pool):
+        self.browser_pool = browser_pool
         self.page = None
 
     def start_browser(self):
-        self.playwright = sync_playwright().start()
-        self.browser = self.playwright.chromium.launch(headless=False)
-        self.page = self.browser.new_page()
+        self.page = self.browser_pool.lease(headless=False)
 
     def close_browser(self):
         try:
             if self.page:
-                self.page.close()
-            if self.browser:
-                self.browser.close()
-            if self.playwright:
-                self.playwright.stop()
+                self.browser_pool.release(self.page)
+                self.page = None
+            # Each search runs on its own worker thread, which owns the browser
+            self.browser_pool.close_thread()
         except:
             print("Browser was closed by the user or encountered an error.")
 
@@ -3,21 +3,20 @@ from concurrent.futures import ThreadPoolExecutor
 from plugins.dork.services.browser_manager import BrowserManager
 from plugins.dork.services.file_logger import FileLogger
 from plugins.dork.services.downloader import Downloader
-from plugins.dork.services.saver import deduplicate_links
 from plugins.dork.services.search_runner import SearchRunner
 
 class Dorking:
-    def __init__(self, output_dir="output", max_pages=100, slow_search=False, link_file="collected_links.json", no_download=True):
+    def __init__(self, output_dir="output", max_pages=100, slow_search=False, link_file="collected_links.jsonl", no_download=True, browser_pool=None, concurrency=8, per_host=2):
         self.output_dir = output_dir
         self.max_pages = max_pages
         self.slow_search = slow_search
         self.link_file = link_file
         self.no_download = no_download
-        self.seen_urls = set()
+        self.browser_pool = browser_pool
         self.logger = FileLogger(self.link_file)
-        self.downloader = Downloader(self.output_dir, self.link_file)
+        self.downloader = Downloader(self.output_dir, self.link_file, concurrency=concurrency, per_host=per_host)
 
-        self.seen_urls = set(self.logger.load_links().keys())
+        self.seen_urls = set(self.logger.links)
 
     def run(self, query):
         if not self.no_download:
@@ -34,7 +33,7 @@ class Dorking:
 
             futures = []
             for engine_name, engine_url in engines.items():
-                browser_manager = BrowserManager()
+                browser_manager = BrowserManager(self.browser_pool)
                 search_runner = SearchRunner(browser_manager, self.logger, self.max_pages, self.slow_search)
                 futures.append(executor.submit(search_runner.run_search, query, engine_name, engine_url, self.seen_urls))
 
@@ -48,9 +47,7 @@ class Dorking:
 
         print(f"Collected {len(all_links)} links.")
 
-        existing_links = self.logger.load_links()
-        unique_links = deduplicate_links(existing_links, all_links)
+        self.logger.log_links(all_links)
+        self.logger.close()
 
-        self.logger.log_links(unique_links)
-
-        print(f"Saved {len(unique_links)} unique links.")
+        print(f"Saved {len(self.logger.links)} unique links.")
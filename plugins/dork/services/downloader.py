@@ -1,15 +1,45 @@
+import hashlib
 import os
-import json
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import time
+import asyncio
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
+from urllib.parse import urlparse
+from core.fetch.page_fetcher import PageFetcher
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from plugins.dork.services.file_logger import FileLogger, read_links
+
+BLOCKED_RESOURCES = {"image", "font", "media"}
+MAX_FILENAME = 255     # bytes, NAME_MAX on common filesystems
+MAX_EXTENSION = 16
 
 class Downloader:
-    def __init__(self, output_dir, link_file):
+    """
+    Saves collected links, over plain HTTP where possible and with headless Chromium otherwise.
+
+    Each URL is first fetched with the pooled HTTP client (PageFetcher): static
+    pages are saved as served and documents as the original binary. Only pages
+    that need JavaScript are rendered in the browser, which is launched on the
+    first such page and never fetches images, fonts or media.
+
+    Up to concurrency URLs are fetched at once, at most per_host of them from the
+    same host. Every saved URL is appended to a download journal
+    (downloaded_links.jsonl in output_dir), so an interrupted run resumes where it
+    stopped and URLs saved before are skipped.
+    """
+
+    JOURNAL_FILE = "downloaded_links.jsonl"
+
+    def __init__(self, output_dir, link_file, concurrency=8, per_host=2, timeout=60000):
         self.output_dir = output_dir
         self.link_file = link_file
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
 
     def download_collected_links(self):
-        links = self.load_links_from_json()
+        links = read_links(self.link_file)
         if not links:
             print(f"No collected links file found at {self.link_file}. Skipping download.")
             return
@@ -21,44 +51,129 @@ class Downloader:
 
     def download_urls(self, urls: List[str]):
         os.makedirs(self.output_dir, exist_ok=True)
+        journal = FileLogger(os.path.join(self.output_dir, self.JOURNAL_FILE))
+        pending = [url for url in dict.fromkeys(urls) if url not in journal.links]
+        if len(pending) < len(urls):
+            print(f"Skipping {len(urls) - len(pending)} links downloaded before.")
+
+        started = time.monotonic()
+        fetcher = PageFetcher(pool_size=self.concurrency)
+        try:
+            saved = asyncio.run(self._download_all(pending, journal, fetcher))
+        finally:
+            journal.close()
+        print(f"Downloaded {saved} of {len(pending)} links in {time.monotonic() - started:.1f}s.")
+        fetcher.report()
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
+    ### Downloading ###
 
-            for url in urls:
+    async def _download_all(self, urls, journal, fetcher):
+        slots = asyncio.Semaphore(self.concurrency)
+        hosts = {}
+        self._browser = None
+        self._browser_lock = asyncio.Lock()
+
+        async with async_playwright() as p:
+            self._playwright = p
+            with ThreadPoolExecutor(max_workers=self.concurrency) as http_workers:
                 try:
-                    output_file = os.path.join(self.output_dir, self._sanitize_filename(url))
-                    print(f"Downloading content from {url}...")
+                    results = await asyncio.gather(*(
+                        self._download(url, slots, hosts.setdefault(urlparse(url).netloc, asyncio.Semaphore(self.per_host)),
+                                       journal, fetcher, http_workers)
+                        for url in urls
+                    ), return_exceptions=True)
+                finally:
+                    if self._browser:
+                        await self._browser.close()
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                print(f"Error downloading {url}: {result}")
+        return sum(result is True for result in results)
 
-                    page.goto(url, timeout=60000)
-                    
-                    with open(output_file, "w", encoding="utf-8") as f:
-                        f.write(page.content())
+    async def _download(self, url, slots, host_slots, journal, fetcher, http_workers):
+        # Take the host slot first so a busy host never holds global slots idle
+        async with host_slots, slots:
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(http_workers, fetcher.fetch, url)
+                if result.failed:
+                    print(f"Error fetching {url}: {result.reason}")
+                    return False
 
-                    print(f"Downloaded content for {url} to {output_file}")
+                if result.needs_browser:
+                    status, body = await self._render(url)
+                    if body is None:
+                        fetcher.count("failed")
+                        return False
+                    fetcher.count("browser")
+                    binary = False
+                else:
+                    status, body, binary = result.status, result.body, result.binary
+            except Exception as e:
+                print(f"Error fetching {url}: {e}")
+                fetcher.count("failed")
+                return False
 
-                except PlaywrightTimeoutError:
-                    print(f"Timeout error fetching {url}")
-                except Exception as e:
-                    print(f"Error fetching {url}: {e}")
-                finally:
-                    page.close()
-                    page = browser.new_page()
+        # One URL failing to save never stops the others
+        try:
+            output_file = os.path.join(self.output_dir, self._sanitize_filename(url, result.content_type if binary else None))
+            with open(output_file, "wb") as f:
+                f.write(body)
+        except Exception as e:
+            print(f"Error saving {url}: {e}")
+            fetcher.count("failed")
+            return False
+        journal.log_links({url: {"file": output_file, "status": status}})
+        print(f"Downloaded content for {url} to {output_file}")
+        return True
+
+    async def _render(self, url):
+        """Load url in the browser; returns (status, UTF-8 HTML) or (None, None) on failure."""
+        context = await self._context()
+        page = await context.new_page()
+        try:
+            response = await page.goto(url, timeout=self.timeout)
+            content = await page.content()
+        except PlaywrightTimeoutError:
+            print(f"Timeout error fetching {url}")
+            return None, None
+        except Exception as e:
+            print(f"Error fetching {url}: {e}")
+            return None, None
+        finally:
+            await page.close()
+        return (response.status if response else None), content.encode("utf-8")
+
+    async def _context(self):
+        """The shared browser context, launching Chromium on first use."""
+        async with self._browser_lock:
+            if self._browser is None:
+                self._browser = await self._playwright.chromium.launch(headless=True)
+                self._browser_context = await self._browser.new_context()
+                await self._browser_context.route("**/*", self._block_heavy_resources)
+        return self._browser_context
 
-            browser.close()
+    @staticmethod
+    async def _block_heavy_resources(route):
+        if route.request.resource_type in BLOCKED_RESOURCES:
+            await route.abort()
+        else:
+            await route.continue_()
 
-    def _sanitize_filename(self, url):
+    def _sanitize_filename(self, url, content_type=None):
         sanitized = url.replace("http://", "").replace("https://", "").replace("/", "_").replace("?", "_").replace("&", "_")
-        return sanitized[:255] + ".html"
-
-    def load_links_from_json(self):
-        if os.path.exists(self.link_file):
-            with open(self.link_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
-
-    def save_links_to_json(self, links):
-        os.makedirs(os.path.dirname(self.link_file), exist_ok=True)
-        with open(self.link_file, 'w', encoding='utf-8') as f:
-            json.dump(links, f, ensure_ascii=False, indent=4)
+        if content_type is None:
+            extension = ".html"
+        else:
+            # Binary documents keep their own extension, or get one from their content type
+            extension = os.path.splitext(urlparse(url).path)[1] or mimetypes.guess_extension(content_type) or ".bin"
+            if len(extension.encode("utf-8")) > MAX_EXTENSION:
+                extension = ".bin"
+            elif sanitized.endswith(extension):
+                sanitized = sanitized[:-len(extension)]
+        name = sanitized + extension
+        if len(name.encode("utf-8")) <= MAX_FILENAME:
+            return name
+        # Too long for the filesystem: keep a prefix and tell URLs apart by a hash of the whole URL
+        digest = "_" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+        prefix = sanitized.encode("utf-8")[:MAX_FILENAME - len(digest) - len(extension.encode("utf-8"))]
+        return prefix.decode("utf-8", "ignore") + digest + extension
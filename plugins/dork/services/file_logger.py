@@ -1,22 +1,158 @@
 import os
 import json
+import queue
+import threading
+
+def read_links(link_file):
+    """
+    Load collected links as {url: details} from a JSONL link journal.
+
+    Lines are decoded independently, so a line torn by a crash is skipped instead
+    of losing the whole file; the first record of a URL wins. A journal that does
+    not exist yet falls back to a legacy collected_links.json next to it.
+    """
+    links, _ = _read_journal(link_file)
+    return links
+
+def _read_journal(link_file):
+    """Return ({url: details}, number of lines that compaction would drop)."""
+    if not os.path.exists(link_file):
+        return _read_legacy(link_file), 0
+
+    links = {}
+    wasted = 0
+    with open(link_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                url = record.pop('url')
+            except (ValueError, KeyError, AttributeError):
+                wasted += 1
+                continue
+            if url in links:
+                wasted += 1
+            else:
+                links[url] = record
+    return links, wasted
+
+def _read_legacy(link_file):
+    legacy_file = os.path.splitext(link_file)[0] + '.json'
+    if legacy_file == link_file or not os.path.exists(legacy_file):
+        return {}
+    try:
+        with open(legacy_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        print(f"Error decoding JSON from {legacy_file}. Starting with an empty list.")
+        return {}
+
+def _record(url, details):
+    return json.dumps({'url': url, **(details or {})}, ensure_ascii=False) + '\n'
 
 class FileLogger:
+    """
+    Append-only JSONL journal of collected links, one {"url": ..., <details>} object per line.
+
+    log_links() only queues links not seen before and returns at once; a single
+    writer thread appends them, so search threads never block on the file and
+    never rewrite it. Lines left behind by crashes or by another process logging
+    the same URLs are dropped by compaction, which rewrites the journal from
+    memory once they make up a large part of it and when the logger is closed.
+    """
+
+    COMPACT_MIN_WASTED = 1000   # lines
+    COMPACT_RATIO = 0.5         # wasted lines / live links
+
     def __init__(self, link_file):
         self.link_file = link_file
+        self.links, self.wasted = _read_journal(link_file)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = None
+        self._migrated = not os.path.exists(link_file) and bool(self.links)
+
+    ### Logging ###
 
     def log_links(self, links):
-        os.makedirs(os.path.dirname(self.link_file), exist_ok=True)
+        """Queue the links whose URLs are not in the journal yet; returns how many were new."""
+        with self._lock:
+            new_links = [(url, details) for url, details in links.items() if url not in self.links]
+            for url, details in new_links:
+                self.links[url] = details
+            if new_links or self._migrated:
+                self._start_writer()
+                self._queue.put(new_links)
+        return len(new_links)
 
-        existing_links = self.load_links()
+    def load_links(self):
+        """All links logged so far, as {url: details}."""
+        with self._lock:
+            return dict(self.links)
 
-        existing_links.update(links)
+    def close(self):
+        """Write out queued links, compact if needed and stop the writer thread."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer:
+            self._queue.put(None)
+            writer.join()
+        if self.wasted:
+            self.compact()
 
-        with open(self.link_file, 'w', encoding='utf-8') as f:
-            json.dump(existing_links, f, ensure_ascii=False, indent=4)
+    def __enter__(self):
+        return self
 
-    def load_links(self):
-        if os.path.exists(self.link_file):
-            with open(self.link_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+    def __exit__(self, *exc_info):
+        self.close()
+
+    ### Writing ###
+
+    def _start_writer(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name='link-journal', daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        stopping = False
+        if self._migrated:
+            # First write after upgrading: carry the legacy collected_links.json over
+            stopping = self.compact()
+            self._migrated = False
+
+        while not stopping:
+            batches = [self._queue.get()]
+            while not self._queue.empty():
+                batches.append(self._queue.get_nowait())
+            stopping = None in batches
+
+            records = [_record(url, details) for batch in batches if batch for url, details in batch]
+            if records:
+                self._append(records)
+            if self.wasted >= max(self.COMPACT_MIN_WASTED, self.COMPACT_RATIO * len(self.links)):
+                stopping = self.compact() or stopping
+
+    def _append(self, records):
+        os.makedirs(os.path.dirname(self.link_file) or '.', exist_ok=True)
+        with open(self.link_file, 'a', encoding='utf-8') as f:
+            f.writelines(records)
+
+    def compact(self):
+        """
+        Rewrite the journal with one line per URL, replacing the old file only once complete.
+
+        Runs on the writer thread, or after it has stopped. Links still queued are
+        written as part of the snapshot and dropped from the queue; returns True if
+        the stop marker was among them.
+        """
+        stopping = False
+        with self._lock:
+            while not self._queue.empty():
+                stopping = self._queue.get_nowait() is None or stopping
+            links = list(self.links.items())
+            self.wasted = 0
+        os.makedirs(os.path.dirname(self.link_file) or '.', exist_ok=True)
+        partial = self.link_file + '.partial'
+        with open(partial, 'w', encoding='utf-8') as f:
+            f.writelines(_record(url, details) for url, details in links)
+        os.replace(partial, self.link_file)
+        return stopping
@@ -23,14 +23,13 @@ class SearchRunner:
             for page_number in range(self.max_pages):
                 if not self.browser_manager.is_browser_open():
                     print(f"User closed the browser. Saving results for {engine_name}.")
-                    self.logger.log_links(all_links)
                     break
 
                 content = self.browser_manager.get_page_content()
                 new_links = LinkExtractor.extract_links(content, engine_name, seen_urls)
                 all_links.update(new_links)
 
-                self.logger.log_links(all_links)
+                self.logger.log_links(new_links)
 
                 for attempt in range(3):
                     if NavigationHandler.navigate_to_next_page(self.browser_manager, engine_name):
@@ -1,6 +1,18 @@
+import argparse
 from plugins.plugin_base import Plugin
 from plugins.telegram.services.telegram_service import TelegramService
 
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+def parse_size(value):
+    """Parse a size such as 1048576, 500K, 20M or 2G into bytes."""
+    value = value.strip().upper().removesuffix('IB').removesuffix('B')
+    unit = value[-1] if value and value[-1] in SIZE_UNITS else ''
+    try:
+        return int(float(value[:len(value) - len(unit)]) * SIZE_UNITS[unit])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+
 class Handler(Plugin):
     def initialize(self):
         pass
@@ -24,6 +36,11 @@ class Handler(Plugin):
         telegram_collect_parser.add_argument("--monitor-channel", type=str, help="Real-time monitoring for a specific channel")
         telegram_collect_parser.add_argument("--monitor-all", action="store_true", help="Real-time monitoring for all channels")
         telegram_collect_parser.add_argument("--monitor-user", type=str, help="Real-time monitoring for messages from a specific user")
+        telegram_collect_parser.add_argument("--user-source", choices=["auto", "participants", "messages"], default="auto", help="Collect users from the member list, from message senders, or from the member list where permitted and messages otherwise (default: auto)")
+        telegram_collect_parser.add_argument("--concurrency", type=int, default=8, help="Number of channels collected at the same time (default: 8)")
+        telegram_collect_parser.add_argument("--download-workers", type=int, default=4, help="Number of attachments downloaded at the same time (default: 4)")
+        telegram_collect_parser.add_argument("--max-attachment-size", type=parse_size, help="Skip attachments larger than this size (e.g. 500K, 20M, 2G)")
+        telegram_collect_parser.add_argument("--attachment-types", nargs="+", help="Only download these attachment types: MIME types (video/mp4), families (image) or extensions (pdf)")
 
         # Display Command
         telegram_display_parser = telegram_subparsers.add_parser("display", help="Display collected Telegram data")
@@ -32,24 +49,57 @@ class Handler(Plugin):
         telegram_display_parser.add_argument("--messages", action="store_true", help="Display all messages or messages from a specific user or channel if specified")
         telegram_display_parser.add_argument("--user", type=int, help="Limit channels or messages display to a specific user")
         telegram_display_parser.add_argument("--channel", type=str, help="Limit users or messages display to a specific channel")
+        telegram_display_parser.add_argument("--limit", type=int, help="Maximum number of users or messages to display")
+        telegram_display_parser.add_argument("--offset", type=int, default=0, help="Number of users or messages to skip")
+        telegram_display_parser.add_argument("--since", type=str, help="Only display messages sent on or after this date (YYYY-MM-DD[ HH:MM:SS])")
+        telegram_display_parser.add_argument("--until", type=str, help="Only display messages sent before this date (YYYY-MM-DD[ HH:MM:SS])")
+        telegram_display_parser.add_argument("--after", type=str, help="Continue from the cursor printed at the end of the previous page")
+        telegram_display_parser.add_argument("--format", choices=["text", "jsonl", "csv"], default="text", help="Output format for users and messages (default: text)")
+        telegram_display_parser.add_argument("--output", type=str, help="Write users or messages to this file instead of stdout")
 
         # Process Command
         telegram_process_parser = telegram_subparsers.add_parser("process", help="Process collected Telegram data")
         telegram_process_parser.add_argument("--user-interactions", action="store_true", help="Analyze user interactions in a specific channel")
-        telegram_process_parser.add_argument("--keywords", nargs="+", help="Analyze messages for specific keywords in a channel")
+        telegram_process_parser.add_argument("--keywords", nargs="+", help="Analyze messages for specific keywords, in a channel if --channel is provided or across all channels")
+        telegram_process_parser.add_argument("--timeline", action="store_true", help="Show messages per --bucket, in a channel if --channel and of a user if --user is provided")
+        telegram_process_parser.add_argument("--top-posters", action="store_true", help="Show the --top users posting the most messages, in a channel if --channel is provided")
+        telegram_process_parser.add_argument("--heatmap", action="store_true", help="Show messages per weekday and hour of day (UTC)")
+        telegram_process_parser.add_argument("--bucket", choices=["hour", "day", "month", "year"], default="day", help="Time bucket for the keyword and activity timelines (default: day)")
+        telegram_process_parser.add_argument("--top", type=int, default=5, help="Number of top users and channels shown per keyword, or of top posters (default: 5)")
         telegram_process_parser.add_argument("--channel", type=str, help="Specify the channel for processing")
+        telegram_process_parser.add_argument("--user", type=int, help="Limit the activity timeline and heatmap to a user ID")
+        telegram_process_parser.add_argument("--since", type=str, help="Only activity on or after this date (YYYY-MM-DD[ HH])")
+        telegram_process_parser.add_argument("--until", type=str, help="Only activity before this date (YYYY-MM-DD[ HH])")
         telegram_process_parser.add_argument("--social-graph", action="store_true", help="Build and analyze a social network graph")
+        telegram_process_parser.add_argument("--graph-export", type=str, help="Export the social graph to this file (.graphml, or .parquet for edge and node tables)")
 
         # Export Command
-        telegram_export_parser = telegram_subparsers.add_parser("export", help="Export Telegram attachments")
-        telegram_export_parser.add_argument("--export-dir", type=str, required=True, help="Directory to export attachments to")
+        telegram_export_parser = telegram_subparsers.add_parser("export", help="Export Telegram attachments, or the collected data as Parquet")
+        telegram_export_parser.add_argument("--export-dir", type=str, required=True, help="Directory to export attachments or Parquet files to")
+        telegram_export_parser.add_argument("--format", choices=["files", "parquet"], default="files", help="Export attachment files, or messages, attachments, users and channels as Parquet (default: files)")
+        telegram_export_parser.add_argument("--tables", choices=["messages", "attachments", "users", "channels"], nargs="+", help="Tables included in a Parquet export (default: all)")
+        telegram_export_parser.add_argument("--full", action="store_true", help="Re-export every message and attachment to Parquet instead of only those added since the last export")
         telegram_export_parser.add_argument("--attachment-type", type=str, help="Filter attachments by type (e.g., image, pdf)")
         telegram_export_parser.add_argument("--channel-id", type=int, help="Specify the channel ID for attachment retrieval")
         telegram_export_parser.add_argument("--user-id", type=int, help="Specify the user ID for attachment retrieval")
+        telegram_export_parser.add_argument("--since", type=str, help="Only attachments of messages sent on or after this date (YYYY-MM-DD[ HH:MM:SS])")
+        telegram_export_parser.add_argument("--until", type=str, help="Only attachments of messages sent before this date (YYYY-MM-DD[ HH:MM:SS])")
+        telegram_export_parser.add_argument("--workers", type=int, default=8, help="Number of files exported at the same time (default: 8)")
+        telegram_export_parser.add_argument("--dry-run", action="store_true", help="Only report how many files and bytes would be exported")
+
+        # Monitor Command
+        telegram_monitor_parser = telegram_subparsers.add_parser("monitor", help="Raise alerts for keywords in incoming messages in real time")
+        telegram_monitor_parser.add_argument("--keywords-file", type=str, help="File with one keyword or phrase per line (# comments allowed), reloaded whenever it changes")
+        telegram_monitor_parser.add_argument("--keywords", nargs="+", help="Keywords to watch for, in addition to the keywords file")
+        telegram_monitor_parser.add_argument("--alerts-output", type=str, default="data/telegram_alerts.jsonl", help="JSONL file alerts are appended to (default: data/telegram_alerts.jsonl)")
 
         # Search Command
         telegram_search_parser = telegram_subparsers.add_parser("search", help="Search through collected Telegram data")
-        telegram_search_parser.add_argument("query", type=str, help="Search query for messages, users, channels, or attachments")
+        telegram_search_parser.add_argument("query", type=str, help="Search query for messages, users, channels, or attachments. Supports \"phrases\", prefix* and OR/NOT")
+        telegram_search_parser.add_argument("--type", choices=["messages", "users", "channels", "attachments"], nargs="+", help="Limit the search to these entity types")
+        telegram_search_parser.add_argument("--limit", type=int, default=20, help="Maximum results per entity type (default: 20)")
+        telegram_search_parser.add_argument("--page", type=int, default=1, help="Page of results to show (default: 1)")
+        telegram_search_parser.add_argument("--rebuild-index", action="store_true", help="Rebuild the full-text index before searching")
     
     def handle(self, args):
         self.initialize_on_running()
@@ -58,36 +108,42 @@ class Handler(Plugin):
             "process": self._process,
             "display": self._display,
             "export": self._export,
+            "monitor": self._monitor,
             "search": self._search,
         }
         
         action = args.action
         
-        if action in action_map:
-            action_map[action](args)
+        try:
+            if action in action_map:
+                action_map[action](args)
+        finally:
+            self.telegram_service.close()
 
     def _collect(self, args):
+        self.telegram_service.configure_attachments(args.download_workers, args.max_attachment_size, args.attachment_types)
+
         if args.channels:
             self.telegram_service.collect_all_channels()
             print("Collected all channels.")
 
         if args.users:
             if args.channel:
-                self.telegram_service.collect_all_participants_in_channel(args.channel)
+                self.telegram_service.collect_all_participants_in_channel(args.channel, args.user_source)
                 print(f"Collected users from channel: {args.channel}")
             else:
-                self.telegram_service.collect_all_users()
+                self.telegram_service.collect_all_users(args.concurrency, args.user_source)
                 print("Collected users across all channels.")
 
         if args.messages:
             if args.channel:
                 self.telegram_service.collect_messages_in_channel(args.channel)
             else:
-                self.telegram_service.collect_all_messages()
+                self.telegram_service.collect_all_messages(args.concurrency)
                 print("Collected all messages across channels.")
 
         if args.user_messages:
-            self.telegram_service.collect_messages_from_user(args.user_messages)
+            self.telegram_service.collect_messages_from_user(args.user_messages, args.concurrency)
             print(f"Collected all messages from user ID: {args.user_messages}")
 
         if args.monitor_channel:
@@ -102,6 +158,9 @@ class Handler(Plugin):
             self.telegram_service.start_realtime_monitoring_for_user(args.monitor_user)
             print(f"Started real-time monitoring for user: {args.monitor_user}")
 
+        if args.monitor_channel or args.monitor_all or args.monitor_user:
+            self.telegram_service.run_realtime_monitoring()
+
     def _process(self, args):
         if args.user_interactions:
             if args.channel:
@@ -113,16 +172,72 @@ class Handler(Plugin):
                 print("Please provide a channel using --channel.")
 
         if args.keywords:
-            if args.channel:
-                keyword_analysis = self.telegram_service.keyword_analysis_in_channel(args.keywords, args.channel)
-                print(f"Keywords found in channel {args.channel}: {keyword_analysis}")
-            else:
-                print("Please provide a channel using --channel.")
+            self._print_keyword_analysis(args)
+
+        if args.timeline or args.top_posters or args.heatmap:
+            self._print_activity(args)
 
         if args.social_graph:
-            self.telegram_service.build_social_network_graph()
+            self.telegram_service.build_social_network_graph(args.graph_export)
             print("Social network graph generated and analyzed.")
 
+    def _print_keyword_analysis(self, args):
+        analysis = self.telegram_service.analyze_keywords(args.keywords, args.channel, args.bucket)
+        scope = f"channel {args.channel}" if args.channel else "all channels"
+        print(f"Keyword analysis of {analysis['scanned']} messages in {scope}:")
+
+        top_users = {
+            keyword: sorted(users.items(), key=lambda item: item[1], reverse=True)[:args.top]
+            for keyword, users in analysis['users'].items()
+        }
+        usernames = self.telegram_service.get_usernames(
+            user_id for users in top_users.values() for user_id, _ in users
+        )
+
+        for keyword, count in analysis['counts'].items():
+            print(f"\n{keyword}: {count} messages, {analysis['occurrences'][keyword]} mentions")
+            if not count:
+                continue
+
+            print("  Top users:")
+            for user_id, user_count in top_users[keyword]:
+                print(f"    {usernames.get(user_id) or user_id}: {user_count}")
+
+            if not args.channel:
+                print("  Top channels:")
+                channels = sorted(analysis['channels'][keyword].items(), key=lambda item: item[1], reverse=True)
+                for channel_id, channel_count in channels[:args.top]:
+                    print(f"    {channel_id}: {channel_count}")
+
+            print(f"  Per {args.bucket}:")
+            for time_bucket, bucket_count in analysis['buckets'][keyword].items():
+                print(f"    {time_bucket}: {bucket_count}")
+
+    def _print_activity(self, args):
+        scope = f"channel {args.channel}" if args.channel else "all channels"
+        if args.user:
+            scope += f", user {args.user}"
+        filters = {'since': args.since, 'until': args.until}
+
+        if args.timeline:
+            timeline = self.telegram_service.activity_timeline(args.channel, args.user, args.bucket, **filters)
+            print(f"Messages per {args.bucket} in {scope}:")
+            peak = max((count for _, count in timeline), default=0)
+            for time_bucket, count in timeline:
+                print(f"  {time_bucket}  {count:>8}  {'#' * round(40 * count / peak)}")
+
+        if args.top_posters:
+            print(f"Top {args.top} posters in {scope.split(',')[0]}:")
+            for user_id, username, count in self.telegram_service.top_posters(args.channel, args.top, **filters):
+                print(f"  {username or user_id}: {count}")
+
+        if args.heatmap:
+            heatmap = self.telegram_service.posting_heatmap(args.channel, args.user, **filters)
+            print(f"Messages per weekday and hour (UTC) in {scope}:")
+            print("       " + "".join(f"{hour:>6}" for hour in range(24)))
+            for weekday, counts in zip(("Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"), heatmap):
+                print(f"  {weekday}  " + "".join(f"{count:>6}" for count in counts))
+
     def _display(self, args):
         if args.channels:
             if args.user:
@@ -132,37 +247,79 @@ class Handler(Plugin):
                 self.telegram_service.display_all_channels()
                 print("All collected channels:")
 
+        if args.users or args.messages:
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8', newline='') as output:
+                    self._display_rows(args, output)
+                print(f"Saved to {args.output}")
+            else:
+                self._display_rows(args, None)
+
+    def _display_rows(self, args, output):
+        options = {
+            'limit': args.limit,
+            'offset': args.offset,
+            'since': args.since,
+            'until': args.until,
+            'after': args.after,
+            'output_format': args.format,
+            'output': output,
+        }
+
         if args.users:
             if args.channel:
-                self.telegram_service.display_users_in_channel(args.channel)
+                self.telegram_service.display_users_in_channel(args.channel, **options)
             else:
-                self.telegram_service.display_all_users()
+                self.telegram_service.display_all_users(**options)
 
         if args.messages:
             if args.user and args.channel:
-                messages = self.telegram_service.display_messages_from_user_in_channel(args.user, args.channel)
-                print(f"Messages from user ID {args.user} in channel {args.channel}.")
+                self.telegram_service.display_messages_from_user_in_channel(args.user, args.channel, **options)
             elif args.user:
-                messages = self.telegram_service.display_messages_from_user(args.user)
-                print(f"All messages from user ID {args.user} across all channels.")
+                self.telegram_service.display_messages_from_user(args.user, **options)
             elif args.channel:
-                messages = self.telegram_service.display_messages_in_channel(args.channel)
-                print(f"Messages in channel {args.channel}.")
+                self.telegram_service.display_messages_in_channel(args.channel, **options)
             else:
-                messages = self.telegram_service.display_all_messages()
-                
+                self.telegram_service.display_all_messages(**options)
 
     def _export(self, args):
+        if args.format == "parquet":
+            self.telegram_service.export_parquet(args.export_dir, args.tables, args.full)
+            return
+
         export_dir = args.export_dir
         attachment_type = args.attachment_type
         channel_id = args.channel_id
         user_id = args.user_id
 
-        self.telegram_service.export_attachments(export_dir, attachment_type=attachment_type, channel_id=channel_id, user_id=user_id)
-        print(f"Attachments exported to {export_dir}")
+        self.telegram_service.export_attachments(
+            export_dir,
+            attachment_type=attachment_type,
+            channel_id=channel_id,
+            user_id=user_id,
+            since=args.since,
+            until=args.until,
+            dry_run=args.dry_run,
+            workers=args.workers,
+        )
+
+    def _monitor(self, args):
+        if not args.keywords_file and not args.keywords:
+            print("Please provide --keywords-file or --keywords.")
+            return
+
+        if args.keywords:
+            self.telegram_service.start_keyword_monitoring(args.keywords)
+        if args.keywords_file:
+            self.telegram_service.start_keyword_file_monitoring(args.keywords_file)
+        self.telegram_service.set_alert_output(args.alerts_output)
+        self.telegram_service.run_realtime_monitoring()
 
     def _search(self, args):
-        search_results = self.telegram_service.search_collected_data(args.query)
+        if args.rebuild_index:
+            self.telegram_service.rebuild_search_index()
+
+        search_results = self.telegram_service.search_collected_data(args.query, limit=args.limit, page=args.page, entity_types=args.type)
         print(f"Search results for '{args.query}':")
         for entity_type, results in search_results.items():
             print(f"{entity_type.capitalize()} Matches:")
@@ -0,0 +1,319 @@
+"""
+Collection and storage throughput benchmark for the Telegram plugin.
+
+Runs the real collection, indexing and analysis code against FakeTelegramClient,
+a stand-in for the Telethon client that generates synthetic channels, users,
+messages and documents on demand, so storage changes can be measured without
+a Telegram account or network access:
+
+    python -m plugins.telegram.services.benchmark --channels 20 --messages 5000 --json bench.json
+
+Every stage reports its wall time, items per second, the peak RSS of the
+process so far and the size of the database (including its WAL) afterwards.
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from telethon.tl.functions.channels import GetParticipantsRequest
+from telethon.tl.functions.messages import GetHistoryRequest
+from telethon.tl.types import (
+    Channel, ChatPhotoEmpty, User, Message, PeerChannel, PeerUser, MessageReplyHeader, MessageFwdHeader,
+    MessageMediaDocument, Document, DocumentAttributeFilename, ChannelParticipant,
+)
+from telethon.tl.types.channels import ChannelParticipants
+from plugins.telegram.services.telegram_database import DatabaseManager
+from plugins.telegram.services.data.data_collection import DataCollector
+from plugins.telegram.services.data.data_processing import DataProcessor
+from plugins.telegram.services.intelligence_analysis import IntelligenceAnalysis
+from plugins.telegram.services.search_and_storage import DataIndexer
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+WORDS = (
+    'market', 'price', 'wallet', 'exchange', 'update', 'release', 'server', 'access', 'leak', 'database',
+    'account', 'telegram', 'channel', 'group', 'payment', 'crypto', 'bitcoin', 'token', 'private', 'public',
+    'today', 'tomorrow', 'link', 'file', 'download', 'new', 'old', 'big', 'small', 'free', 'paid', 'team',
+)
+KEYWORDS = ['bitcoin', 'leak', 'database', 'exploit kit']
+SEARCH_QUERIES = ['bitcoin', 'wallet AND leak', '"private channel"', 'data*', 'exchange OR market']
+
+class _History:
+    """Result of a GetHistoryRequest."""
+    def __init__(self, messages):
+        self.messages = messages
+
+class FakeTelegramClient:
+    """
+    Stand-in for the Telethon client, serving a deterministic synthetic corpus.
+
+    Implements what the collectors use: get_dialogs(), get_entity(),
+    iter_messages(), __call__() for GetHistoryRequest and GetParticipantsRequest,
+    iter_download() and download_media(). Messages are generated when requested
+    from (channel, message ID), so the corpus size does not affect memory use.
+    """
+
+    def __init__(self, channels=20, messages=5000, users=2000, members=500, attachment_every=50, documents=200,
+                 document_size=64 * 1024, latency=0.0, seed=0):
+        """
+        Parameters:
+            channels (int): Number of channels.
+            messages (int): Messages per channel.
+            users (int): Users in total; each channel has `members` of them.
+            attachment_every (int): Every n-th message carries a document (0 for none).
+            documents (int): Distinct documents, so reposts of the same file are exercised.
+            document_size (int): Size of each document in bytes.
+            latency (float): Seconds each request takes, to simulate the network.
+        """
+        self.loop = asyncio.new_event_loop()
+        self.channel_count = channels
+        self.message_count = messages
+        self.user_count = users
+        self.member_count = min(members, users)
+        self.attachment_every = attachment_every
+        self.document_count = documents
+        self.document_size = document_size
+        self.latency = latency
+        self.seed = seed
+        self.requests = 0
+        self.bytes_downloaded = 0
+        self._members = {}
+        # A pool of generated texts keeps message generation cheap next to the code being measured
+        text_rng = random.Random(seed)
+        self._texts = [' '.join(text_rng.choices(WORDS, k=text_rng.randint(5, 25))) + (' exploit kit' if i % 50 == 0 else '')
+                       for i in range(4096)]
+        self.base_date = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+    ### Entities ###
+
+    def channel(self, channel_id):
+        return Channel(id=channel_id, title=f"Channel {channel_id}", photo=ChatPhotoEmpty(), date=self.base_date,
+                       access_hash=channel_id * 7, username=f"channel{channel_id}", megagroup=channel_id % 2 == 0,
+                       participants_count=self.member_count)
+
+    def user(self, user_id):
+        return User(id=user_id, access_hash=user_id * 11, username=f"user{user_id}", first_name=f"First{user_id}",
+                    last_name=f"Last{user_id}")
+
+    def members(self, channel_id):
+        if channel_id not in self._members:
+            step = max(1, self.user_count // self.member_count)
+            self._members[channel_id] = [1 + (channel_id * 7919 + k * step) % self.user_count
+                                         for k in range(self.member_count)]
+        return self._members[channel_id]
+
+    def get_dialogs(self):
+        class Dialog:
+            def __init__(self, entity):
+                self.entity = entity
+        return [Dialog(self.channel(channel_id)) for channel_id in range(1, self.channel_count + 1)]
+
+    async def get_entity(self, key):
+        key = getattr(key, 'channel_id', getattr(key, 'user_id', key))
+        if isinstance(key, str):
+            key = int(key.lstrip('@').removeprefix('channel').removeprefix('user'))
+        return self.channel(key) if key <= self.channel_count else self.user(key)
+
+    ### Messages ###
+
+    def message(self, channel_id, message_id):
+        rng = random.Random((self.seed * 1000003 + channel_id) * 1000003 + message_id)
+        members = self.members(channel_id)
+        text = self._texts[rng.randrange(len(self._texts))]
+
+        reply_to = fwd_from = media = None
+        if message_id > 1 and rng.random() < 0.2:
+            reply_to = MessageReplyHeader(reply_to_msg_id=rng.randint(max(1, message_id - 100), message_id - 1))
+        elif rng.random() < 0.05:
+            origin = PeerChannel(rng.randint(1, self.channel_count)) if rng.random() < 0.5 else PeerUser(rng.choice(members))
+            fwd_from = MessageFwdHeader(date=self.base_date, from_id=origin)
+        if self.attachment_every and message_id % self.attachment_every == 0:
+            media = MessageMediaDocument(document=self.document(rng.randint(1, self.document_count)))
+
+        return Message(
+            id=message_id, peer_id=PeerChannel(channel_id), message=text, from_id=PeerUser(rng.choice(members)),
+            date=self.base_date + datetime.timedelta(minutes=message_id * 7 + channel_id),
+            reply_to=reply_to, fwd_from=fwd_from, media=media,
+        )
+
+    def document(self, document_id):
+        return Document(id=document_id, access_hash=0, file_reference=b'', date=self.base_date, mime_type='application/pdf',
+                        size=self.document_size, dc_id=1, attributes=[DocumentAttributeFilename(f"document{document_id}.pdf")])
+
+    def _message_ids(self, offset_id=0, min_id=0):
+        """Message IDs newest first, below offset_id and above min_id."""
+        top = min(offset_id - 1, self.message_count) if offset_id else self.message_count
+        return range(top, min_id, -1)
+
+    async def iter_messages(self, entity, limit=None, offset_id=0, min_id=0, from_user=None, **kwargs):
+        channel_id = entity.channel_id
+        from_user = getattr(from_user, 'user_id', from_user)
+        count = 0
+        for message_id in self._message_ids(offset_id, min_id):
+            if message_id % 100 == 0:
+                await self._request()
+            message = self.message(channel_id, message_id)
+            if from_user is not None and message.from_id.user_id != from_user:
+                continue
+            yield message
+            count += 1
+            if limit and count >= limit:
+                return
+
+    async def __call__(self, request):
+        await self._request()
+        if isinstance(request, GetHistoryRequest):
+            ids = self._message_ids(request.offset_id, request.min_id)[:request.limit]
+            return _History([self.message(request.peer.channel_id, message_id) for message_id in ids])
+        if isinstance(request, GetParticipantsRequest):
+            members = self.members(request.channel.channel_id)[request.offset:request.offset + request.limit]
+            return ChannelParticipants(
+                count=self.member_count,
+                participants=[ChannelParticipant(user_id=user_id, date=self.base_date) for user_id in members],
+                chats=[],
+                users=[self.user(user_id) for user_id in members],
+            )
+        raise NotImplementedError(type(request).__name__)
+
+    async def _request(self):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+
+    ### Downloads ###
+
+    async def iter_download(self, document, offset=0, request_size=512 * 1024, file_size=None, **kwargs):
+        chunk = bytes([document.id % 256]) * request_size
+        position = offset
+        while position < document.size:
+            await self._request()
+            size = min(request_size, document.size - position)
+            self.bytes_downloaded += size
+            yield chunk[:size]
+            position += size
+
+    async def download_media(self, message, file=None):
+        document = message.media.document
+        with open(file, 'wb') as output:
+            async for chunk in self.iter_download(document):
+                output.write(chunk)
+        return file
+
+class Benchmark:
+    """Runs each stage against a FakeTelegramClient and a fresh database, recording its metrics."""
+
+    def __init__(self, client, directory, concurrency=8, download_workers=4):
+        self.client = client
+        self.directory = directory
+        self.db_path = os.path.join(directory, 'benchmark.db')
+        self.db_manager = DatabaseManager(self.db_path)
+        self.collector = DataCollector(client, self.db_manager, concurrency)
+        self.collector.configure_attachments(workers=download_workers, directory=os.path.join(directory, 'attachments'))
+        self.results = []
+
+    def run(self):
+        client = self.client
+        self._stage('collect channels', self.collector.collect_all_channels, lambda: client.channel_count, 'channels')
+        self._stage('collect messages', lambda: self.collector.collect_messages_from_multiple_channels(),
+                    lambda: self._count('messages'), 'messages')
+        self._stage('collect users', lambda: self.collector.collect_all_users(source='participants'),
+                    lambda: self._count('user_channels'), 'memberships')
+        user_id = client.members(1)[0]
+        self._stage('collect one user\'s messages', lambda: self.collector.collect_messages_from_user(user_id),
+                    lambda: client.channel_count, 'channels')
+        self._stage('recollect messages (incremental)', lambda: self.collector.collect_messages_from_multiple_channels(),
+                    lambda: client.channel_count, 'channels')
+        self._stage('rebuild search index', DataIndexer(self.db_manager).index_all_data,
+                    lambda: self._count('messages'), 'messages')
+        indexer = DataIndexer(self.db_manager)
+        self._stage('search', lambda: [indexer.search(query) for query in SEARCH_QUERIES for _ in range(10)],
+                    lambda: len(SEARCH_QUERIES) * 10, 'queries')
+        processor = DataProcessor(self.db_manager)
+        self._stage('keyword analysis', lambda: processor.analyze_keywords(KEYWORDS),
+                    lambda: self._count('messages'), 'messages')
+        analysis = IntelligenceAnalysis(None, self.db_manager)
+        self._stage('social graph', analysis.build_social_graph, lambda: self._count('messages'), 'messages')
+        self.db_manager.close()
+        return self.results
+
+    def _stage(self, name, action, items, unit):
+        requests = self.client.requests
+        started = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            action()
+        elapsed = time.perf_counter() - started
+        count = items()
+        self.results.append({
+            'stage': name,
+            'seconds': round(elapsed, 3),
+            'items': count,
+            'unit': unit,
+            'per_second': round(count / elapsed, 1) if elapsed else None,
+            'requests': self.client.requests - requests,
+            'peak_rss_mb': self._peak_rss_mb(),
+            'db_size_mb': round(self._db_size() / 1024 ** 2, 2),
+        })
+        print(self._format(self.results[-1]))
+
+    def _count(self, table):
+        return self.db_manager.fetchone(f"SELECT COUNT(*) FROM {table}")[0]
+
+    def _db_size(self):
+        return sum(os.path.getsize(path) for path in (self.db_path, self.db_path + '-wal') if os.path.exists(path))
+
+    @staticmethod
+    def _peak_rss_mb():
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        return round(peak / 1024 ** (2 if sys.platform == 'darwin' else 1), 1)
+
+    @staticmethod
+    def _format(result):
+        rate = f"{result['per_second']:>12,.0f} {result['unit']}/s" if result['per_second'] else ' ' * 14
+        return (f"{result['stage']:<34} {result['seconds']:>8.2f}s {rate:<26} "
+                f"RSS {result['peak_rss_mb']} MB   DB {result['db_size_mb']} MB")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Telegram collection and storage against a synthetic corpus.")
+    parser.add_argument("--channels", type=int, default=20, help="Number of channels (default: 20)")
+    parser.add_argument("--messages", type=int, default=5000, help="Messages per channel (default: 5000)")
+    parser.add_argument("--users", type=int, default=2000, help="Number of users (default: 2000)")
+    parser.add_argument("--members", type=int, default=500, help="Members per channel (default: 500)")
+    parser.add_argument("--attachment-every", type=int, default=50, help="Attach a document to every n-th message, 0 for none (default: 50)")
+    parser.add_argument("--documents", type=int, default=200, help="Number of distinct documents (default: 200)")
+    parser.add_argument("--document-size", type=int, default=64 * 1024, help="Size of each document in bytes (default: 65536)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per request (default: 0)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Channels collected at the same time (default: 8)")
+    parser.add_argument("--download-workers", type=int, default=4, help="Concurrent attachment downloads (default: 4)")
+    parser.add_argument("--directory", type=str, help="Keep the database and attachments here instead of a temporary directory")
+    parser.add_argument("--json", type=str, help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    client = FakeTelegramClient(args.channels, args.messages, args.users, args.members, args.attachment_every,
+                                args.documents, args.document_size, args.latency)
+    print(f"Synthetic corpus: {args.channels} channels x {args.messages} messages, {args.users} users, "
+          f"a document every {args.attachment_every} messages.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.directory or tmp
+        os.makedirs(directory, exist_ok=True)
+        results = Benchmark(client, directory, args.concurrency, args.download_workers).run()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'parameters': vars(args), 'results': results}, file, indent=2)
+        print(f"Results written to {args.json}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
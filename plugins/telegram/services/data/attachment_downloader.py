@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import os
+from telethon import utils
+from telethon.errors.rpcerrorlist import FloodWaitError
+from telethon.tl.types import MessageMediaDocument, DocumentAttributeFilename
+from plugins.telegram.services.data.blob_store import BlobStore
+
+class AttachmentDownloader:
+    """
+    Background download queue for message attachments.
+
+    Collectors enqueue documents and carry on; a pool of worker tasks streams
+    each one to a partial file chunk by chunk, hashing it on the way, and
+    commits it to the content-addressed BlobStore once complete. Memory use does
+    not depend on file size and a crash never leaves a truncated blob. Partial
+    files are kept between runs and downloads resume from the last whole chunk.
+
+    A Telegram document already mapped to a stored blob is never downloaded
+    again: its messages are simply recorded against the existing blob. The same
+    document queued from several messages in one run is downloaded once.
+
+    Documents can be filtered by size and by type before they are queued.
+    """
+
+    REQUEST_SIZE = 512 * 1024     # must be a multiple of 4 KiB, at most 1 MiB
+    HASH_BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self, client, db_manager, directory=BlobStore.DEFAULT_DIRECTORY, workers=4, max_size=None, types=None,
+                 on_saved=None):
+        """
+        Parameters:
+            client: Telethon client.
+            db_manager: DatabaseManager used to look up documents already stored.
+            directory (str): Root directory of the blob store.
+            workers (int): Number of concurrent downloads.
+            max_size (int): Skip documents larger than this many bytes.
+            types (list[str]): Only download documents matching one of these types: a MIME type
+                ("video/mp4"), a MIME family ("image" or "image/*"), a subtype or file extension ("pdf").
+            on_saved (coroutine function): Called with the attachment records of every stored document.
+        """
+        self.client = client
+        self.db_manager = db_manager
+        self.blob_store = BlobStore(directory)
+        self.workers = workers
+        self.max_size = max_size
+        self.types = [t.lower().rstrip('*').rstrip('/').lstrip('.') for t in types] if types else None
+        self.on_saved = on_saved
+
+        self.pending = {}         # document ID -> messages waiting for it
+        self.downloaded = 0
+        self.reused = 0
+        self.skipped = 0
+        self.failed = 0
+
+    ### Lifecycle ###
+
+    def start(self):
+        """Start the worker tasks on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def drain(self):
+        """Wait for every queued download to finish, then stop the workers."""
+        if self._queue.qsize():
+            print(f"Waiting for {self._queue.qsize()} queued attachment downloads to finish...")
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        print(f"Attachments: {self.downloaded} downloaded, {self.reused} already stored, "
+              f"{self.skipped} skipped, {self.failed} failed.")
+
+    ### Queueing ###
+
+    def enqueue(self, message):
+        """Queue the document attached to a message, if it passes the filters. Never blocks."""
+        document = message.media.document if isinstance(message.media, MessageMediaDocument) else None
+        if not document:
+            return False
+
+        if not self.accepts(document):
+            self.skipped += 1
+            return False
+
+        if document.id in self.pending:
+            self.pending[document.id].append(message)
+        else:
+            self.pending[document.id] = [message]
+            self._queue.put_nowait(document)
+        return True
+
+    def accepts(self, document):
+        """Apply the size and type filters to a document."""
+        if self.max_size is not None and (document.size or 0) > self.max_size:
+            return False
+        if self.types is None:
+            return True
+
+        mime_type = (document.mime_type or 'application/octet-stream').lower()
+        family, _, subtype = mime_type.partition('/')
+        extension = os.path.splitext(self.get_file_name(document))[1].lstrip('.').lower()
+        return any(t in (mime_type, family, subtype, extension) for t in self.types)
+
+    ### Downloading ###
+
+    async def _worker(self):
+        while True:
+            document = await self._queue.get()
+            try:
+                sha256, path = await self._store(document)
+                records = [self.attachment_record(message, document, sha256, path)
+                           for message in self.pending.pop(document.id)]
+                if self.on_saved:
+                    await self.on_saved(records)
+            except Exception as e:
+                self.failed += 1
+                messages = self.pending.pop(document.id, [])
+                print(f"Failed to download document {document.id} "
+                      f"(message IDs {', '.join(str(m.id) for m in messages)}): {e}")
+            finally:
+                self._queue.task_done()
+
+    async def download(self, message):
+        """
+        Store the document of a single message right away, outside the queue.
+
+        Returns:
+            list[dict]: The attachment record, or an empty list if there is no document.
+        """
+        document = message.media.document if isinstance(message.media, MessageMediaDocument) else None
+        if not document:
+            return []
+        sha256, path = await self._store(document)
+        return [self.attachment_record(message, document, sha256, path)]
+
+    async def _store(self, document):
+        """
+        Make sure a document is in the blob store, downloading it only if needed.
+
+        Returns:
+            tuple: (sha256, blob path)
+        """
+        known = self.db_manager.get_document_blob(document.id)
+        if known and os.path.exists(known[1]):
+            self.reused += 1
+            return known[0], known[1]
+
+        partial_path = self.blob_store.partial_path(document.id)
+        sha256 = await self._download(document, partial_path)
+        size = os.path.getsize(partial_path)
+        if document.size is not None and size != document.size:
+            # A stream cut short must never be stored as a valid blob under its digest
+            os.remove(partial_path)
+            raise IOError(f"downloaded {size} of {document.size} bytes")
+        path = self.blob_store.commit(partial_path, sha256)
+        self.downloaded += 1
+        print(f"Downloaded document {document.id} ({document.mime_type}, {document.size} bytes) to {path}")
+        return sha256, path
+
+    async def _download(self, document, partial_path, retries=3):
+        for attempt in range(1, retries + 1):
+            try:
+                return await self._stream_to_file(document, partial_path)
+            except FloodWaitError as e:
+                print(f"FloodWait on download: waiting {e.seconds} seconds.")
+                await asyncio.sleep(e.seconds)
+            except (TimeoutError, ConnectionError) as e:
+                if attempt == retries:
+                    raise
+                wait_time = 2 ** attempt
+                print(f"{type(e).__name__} on download, retry {attempt}/{retries} in {wait_time} seconds.")
+                await asyncio.sleep(wait_time)
+        raise TimeoutError(f"gave up after {retries} attempts")
+
+    async def _stream_to_file(self, document, partial_path):
+        """
+        Append the remaining chunks of a document to its partial file.
+
+        Returns:
+            str: SHA-256 hex digest of the complete file.
+        """
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        # Only whole chunks are trusted: a chunk cut short by a crash is fetched again
+        offset -= offset % self.REQUEST_SIZE
+        digest = hashlib.sha256()
+
+        with open(partial_path, 'a+b') as file:
+            file.truncate(offset)
+            if offset:
+                print(f"Resuming download of document {document.id} at {offset} bytes.")
+                file.seek(0)
+                while block := file.read(self.HASH_BLOCK_SIZE):
+                    digest.update(block)
+
+            async for chunk in self.client.iter_download(
+                    document, offset=offset, request_size=self.REQUEST_SIZE, file_size=document.size):
+                file.write(chunk)
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def attachment_record(self, message, document, sha256, path):
+        """Attachment row of a message pointing at its blob."""
+        mime_type = document.mime_type or "application/octet-stream"
+        return {
+            'channel_id': utils.get_peer_id(message.peer_id, add_mark=False),
+            'message_id': message.id,
+            'file_name': self.get_file_name(document),
+            'file_type': mime_type.split('/')[-1],
+            'file_path': path,
+            'mime_type': mime_type,
+            'size': document.size,
+            'document_id': document.id,
+            'sha256': sha256,
+        }
+
+    @staticmethod
+    def get_file_name(document):
+        """Extract or create a file name for the document."""
+        for attr in document.attributes:
+            if isinstance(attr, DocumentAttributeFilename):
+                return attr.file_name
+        return f"{document.id}.dat"
@@ -0,0 +1,255 @@
+import errno
+import os
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+FICLONE = 0x40049409    # ioctl(dest_fd, FICLONE, src_fd): copy-on-write clone (Btrfs, XFS, bcachefs, ...)
+
+# Errors meaning "this way of placing a file is not possible between these two filesystems"
+UNSUPPORTED = {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EMLINK, errno.ENOSYS}
+
+class AttachmentQuery:
+    """
+    Composable filter over stored attachments.
+
+    Every filter is optional and they combine with AND:
+
+        AttachmentQuery(attachment_type='image', channel_id=123, since='2024-01-01')
+
+    attachment_type matches the stored file type ("pdf", "jpeg"), the full MIME
+    type ("video/mp4") or a MIME family ("image"). since is inclusive, until
+    exclusive, both compared with the message date.
+    """
+
+    COLUMNS = ('id', 'message_id', 'file_path', 'file_name', 'file_type', 'size', 'sha256')
+
+    def __init__(self, attachment_type=None, channel_id=None, user_id=None, since=None, until=None):
+        self.attachment_type = attachment_type
+        self.channel_id = channel_id
+        self.user_id = user_id
+        self.since = since
+        self.until = until
+
+    def sql(self):
+        """Build the query. Messages are only joined when a message filter is used."""
+        conditions, params = [], []
+
+        if self.attachment_type:
+            conditions.append("(attachments.file_type = ? OR attachments.mime_type = ? OR attachments.mime_type LIKE ?)")
+            params += [self.attachment_type, self.attachment_type, f"{self.attachment_type}/%"]
+
+        message_filters = (
+            ('messages.channel_id = ?', self.channel_id),
+            ('messages.user_id = ?', self.user_id),
+            ('messages.date >= ?', self.since),
+            ('messages.date < ?', self.until),
+        )
+        join = ''
+        for condition, value in message_filters:
+            if value is not None:
+                join = ('JOIN messages ON attachments.channel_id = messages.channel_id '
+                        'AND attachments.message_id = messages.message_id')
+                conditions.append(condition)
+                params.append(value)
+
+        columns = ', '.join(f'attachments.{column}' for column in self.COLUMNS)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return f"SELECT {columns} FROM attachments {join} {where} ORDER BY attachments.id", params
+
+    def subdirectory(self):
+        """Export subdirectory reflecting the filters, e.g. channel_1/user_2/images."""
+        parts = []
+        if self.channel_id:
+            parts.append(f"channel_{self.channel_id}")
+        if self.user_id:
+            parts.append(f"user_{self.user_id}")
+        if self.attachment_type:
+            parts.append(f"{self.attachment_type.replace('/', '_')}s")
+        return os.path.join(*parts) if parts else ''
+
+class AttachmentExporter:
+    """
+    Exports the attachments selected by an AttachmentQuery to a directory.
+
+    Each file is placed with the cheapest method the two filesystems allow:
+
+        reflink   -- FICLONE copy-on-write clone: no data copied, fully independent file
+        hardlink  -- a second name for the same file: no data copied
+        copy      -- a regular copy
+
+    Reflinks are tried first because a hardlinked export shares its data with
+    the attachment store, so editing it would change the stored file. Methods
+    that fail for a pair of devices are not retried for that pair. Files are
+    placed by a thread pool.
+    """
+
+    METHODS = ('reflink', 'hardlink', 'copy')
+
+    def __init__(self, db_manager, workers=8):
+        self.db_manager = db_manager
+        self.workers = workers
+        self._unsupported = set()   # (source device, destination device, method)
+
+    def fetch(self, query):
+        """Return the attachment rows matching a query as (file_path, file_name, file_type) tuples."""
+        sql, params = query.sql()
+        return [(row[2], row[3], row[4]) for row in self.db_manager.execute(sql, params)]
+
+    def plan(self, query, export_dir):
+        """
+        Work out the destination of every matching attachment.
+
+        Names used twice get the message ID appended; files already exported with
+        the same size are left out so an interrupted export can simply be rerun.
+
+        Returns:
+            tuple: (list of (source, destination, size), Counter of skipped reasons)
+        """
+        sql, params = query.sql()
+        target_dir = os.path.join(export_dir, query.subdirectory())
+        planned, taken, skipped = [], set(), Counter()
+
+        for _, message_id, file_path, file_name, _, size, _ in self.db_manager.execute(sql, params):
+            if not file_path or not os.path.exists(file_path):
+                skipped['missing'] += 1
+                continue
+
+            size = size if size is not None else os.path.getsize(file_path)
+            destination = os.path.join(target_dir, file_name or os.path.basename(file_path))
+            stem, extension = os.path.splitext(destination)
+            suffix = 0
+            while destination in taken:
+                suffix += 1
+                destination = f"{stem}_{message_id}{extension}" if suffix == 1 else f"{stem}_{message_id}_{suffix}{extension}"
+            taken.add(destination)
+
+            if os.path.exists(destination) and os.path.getsize(destination) == size:
+                skipped['already exported'] += 1
+                continue
+            planned.append((file_path, destination, size))
+
+        return planned, skipped
+
+    def export(self, query, export_dir, dry_run=False):
+        """
+        Export the attachments matching a query.
+
+        Returns:
+            dict: files and bytes per method, skipped counts and elapsed seconds.
+        """
+        started = time.monotonic()
+        planned, skipped = self.plan(query, export_dir)
+        total_bytes = sum(size for _, _, size in planned)
+
+        if dry_run:
+            same_device = self._count_same_device(planned, export_dir)
+            print(f"Dry run: {len(planned)} files, {self._format_size(total_bytes)} would be exported to {export_dir}.")
+            print(f"  {same_device} on the same filesystem as the export directory (reflink or hardlink, no data copied)")
+            print(f"  {len(planned) - same_device} on another filesystem (copied)")
+            for reason, count in skipped.items():
+                print(f"  {count} skipped: {reason}")
+            return {'files': len(planned), 'bytes': total_bytes, 'skipped': dict(skipped), 'dry_run': True}
+
+        for directory in {os.path.dirname(destination) for _, destination, _ in planned}:
+            os.makedirs(directory, exist_ok=True)
+
+        methods, method_bytes, failed = Counter(), Counter(), 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="attachment-export") as executor:
+            for (source, destination, size), result in zip(planned, executor.map(self._place_safely, planned)):
+                if result is None:
+                    failed += 1
+                else:
+                    methods[result] += 1
+                    method_bytes[result] += size
+
+        elapsed = time.monotonic() - started
+        print(f"Exported {sum(methods.values())} files ({self._format_size(total_bytes)}) to {export_dir} "
+              f"in {elapsed:.1f}s:")
+        for method in self.METHODS:
+            if methods[method]:
+                print(f"  {method}: {methods[method]} files, {self._format_size(method_bytes[method])}")
+        for reason, count in skipped.items():
+            print(f"  {count} skipped: {reason}")
+        if failed:
+            print(f"  {failed} failed")
+
+        return {
+            'files': dict(methods),
+            'bytes': dict(method_bytes),
+            'skipped': dict(skipped),
+            'failed': failed,
+            'elapsed': elapsed,
+        }
+
+    ### Placing Files ###
+
+    def _place_safely(self, item):
+        source, destination, _ = item
+        try:
+            return self.place(source, destination)
+        except OSError as e:
+            print(f"Failed to export {source} to {destination}: {e}")
+            return None
+
+    def place(self, source, destination):
+        """
+        Place one file at its destination with the cheapest supported method.
+
+        Returns:
+            str: The method used ("reflink", "hardlink" or "copy").
+        """
+        devices = (os.stat(source).st_dev, os.stat(os.path.dirname(destination)).st_dev)
+        if os.path.exists(destination):
+            os.remove(destination)
+
+        for method in ('reflink', 'hardlink'):
+            if (*devices, method) in self._unsupported:
+                continue
+            try:
+                getattr(self, f'_{method}')(source, destination)
+                return method
+            except OSError as e:
+                if e.errno not in UNSUPPORTED:
+                    raise
+                self._unsupported.add((*devices, method))
+                if os.path.exists(destination):
+                    os.remove(destination)
+
+        shutil.copy2(source, destination)
+        return 'copy'
+
+    @staticmethod
+    def _reflink(source, destination):
+        if fcntl is None:
+            raise OSError(errno.ENOSYS, "reflinks are not supported on this platform")
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        shutil.copystat(source, destination)
+
+    @staticmethod
+    def _hardlink(source, destination):
+        os.link(source, destination)
+
+    ### Reporting ###
+
+    @staticmethod
+    def _count_same_device(planned, export_dir):
+        directory = export_dir
+        while not os.path.exists(directory):
+            directory = os.path.dirname(os.path.abspath(directory))
+        export_device = os.stat(directory).st_dev
+        return sum(1 for source, _, _ in planned if os.stat(source).st_dev == export_device)
+
+    @staticmethod
+    def _format_size(size):
+        for unit in ('B', 'KiB', 'MiB', 'GiB'):
+            if size < 1024 or unit == 'GiB':
+                return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+            size /= 1024
@@ -0,0 +1,104 @@
+from telethon.tl.types import PeerUser, PeerChannel, PeerChat
+
+class BatchWriter:
+    """
+    Buffers collected messages, attachment records and keyword alerts and
+    writes them in batches, one transaction per flush.
+
+    Collectors hand over whole history pages with add_messages(); the buffer is
+    flushed automatically once it reaches batch_size rows, and explicitly with
+    flush() (e.g. at the end of each page) or when used as a context manager.
+    """
+
+    def __init__(self, db_manager, batch_size=500):
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.messages = []
+        self.attachments = []
+        self.alerts = []
+        self.inserted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    @staticmethod
+    def message_row(message, channel_id):
+        """Convert a Telethon message into a row for the messages table."""
+        return {
+            'message_id': message.id,
+            'channel_id': channel_id,
+            'user_id': message.from_id.user_id if isinstance(message.from_id, PeerUser) else None,
+            'date': message.date.strftime("%Y-%m-%d %H:%M:%S") if message.date else None,
+            'content': message.message,
+            **BatchWriter.message_relations(message),
+        }
+
+    @staticmethod
+    def message_relations(message):
+        """Extract the replied-to message and the forward origin of a Telethon message."""
+        reply_to = getattr(message, 'reply_to', None)
+        # Replies to a message in another chat cannot be joined to their parent, so they are not kept
+        reply_to_message_id = None
+        if reply_to is not None and getattr(reply_to, 'reply_to_peer_id', None) is None:
+            reply_to_message_id = getattr(reply_to, 'reply_to_msg_id', None)
+
+        fwd_from = getattr(message, 'fwd_from', None)
+        origin = getattr(fwd_from, 'from_id', None)
+        return {
+            'reply_to_message_id': reply_to_message_id,
+            'fwd_from_user_id': origin.user_id if isinstance(origin, PeerUser) else None,
+            'fwd_from_channel_id': (
+                origin.channel_id if isinstance(origin, PeerChannel)
+                else origin.chat_id if isinstance(origin, PeerChat) else None
+            ),
+        }
+
+    def add_message(self, message, channel_id):
+        """Buffer a single Telethon message."""
+        self.messages.append(self.message_row(message, channel_id))
+        if len(self.messages) >= self.batch_size:
+            self.flush()
+
+    def add_messages(self, messages, channel_id):
+        """Buffer a page of Telethon messages."""
+        self.messages.extend(self.message_row(message, channel_id) for message in messages)
+        if len(self.messages) >= self.batch_size:
+            self.flush()
+
+    def add_attachment(self, attachment):
+        """Buffer an attachment record (dict as accepted by DatabaseManager.save_attachments)."""
+        self.attachments.append(attachment)
+        if len(self.attachments) >= self.batch_size:
+            self.flush()
+
+    def add_alert(self, alert):
+        """Buffer a keyword alert (dict as accepted by DatabaseManager.save_alerts)."""
+        self.alerts.append(alert)
+        if len(self.alerts) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write everything buffered so far in one transaction.
+
+        Returns:
+            int: Number of messages newly inserted by this flush.
+        """
+        if not self.messages and not self.attachments and not self.alerts:
+            return 0
+
+        with self.db_manager.transaction():
+            inserted = self.db_manager.save_messages(self.messages) if self.messages else 0
+            if self.attachments:
+                self.db_manager.save_attachments(self.attachments)
+            if self.alerts:
+                self.db_manager.save_alerts(self.alerts)
+
+        self.messages = []
+        self.attachments = []
+        self.alerts = []
+        self.inserted += inserted
+        return inserted
@@ -0,0 +1,49 @@
+import os
+
+class BlobStore:
+    """
+    Content-addressed storage for attachment files.
+
+    Every distinct file is stored once, under the SHA-256 of its content:
+
+        <directory>/blobs/ab/cd/abcd...   (the full hex digest)
+
+    so the same meme, PDF or video reposted across channels takes the space of
+    one copy, and files that share a name can never overwrite each other.
+    Downloads in progress live in <directory>/.partial until committed.
+    """
+
+    DEFAULT_DIRECTORY = 'data/attachments'
+
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = directory
+        self.partial_dir = os.path.join(directory, '.partial')
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+    def blob_path(self, sha256):
+        """Path of the blob with the given SHA-256 hex digest."""
+        return os.path.join(self.directory, 'blobs', sha256[:2], sha256[2:4], sha256)
+
+    def partial_path(self, document_id):
+        """Path of the partial download of a Telegram document."""
+        return os.path.join(self.partial_dir, f"{document_id}.part")
+
+    def exists(self, sha256):
+        return os.path.exists(self.blob_path(sha256))
+
+    def commit(self, partial_path, sha256):
+        """
+        Move a finished download into the store under its digest.
+
+        If the content is already stored the partial file is discarded.
+
+        Returns:
+            str: Path of the blob.
+        """
+        path = self.blob_path(sha256)
+        if os.path.exists(path):
+            os.remove(partial_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(partial_path, path)
+        return path
@@ -0,0 +1,444 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from telethon.errors.rpcerrorlist import FloodWaitError, RPCError, ChannelPrivateError, ChatAdminRequiredError
+from telethon.tl.functions.channels import GetParticipantsRequest
+from telethon.tl.functions.messages import GetHistoryRequest
+from telethon.tl.types import ChannelParticipantsSearch, PeerChannel, PeerUser, MessageMediaDocument
+from plugins.telegram.services.data.attachment_downloader import AttachmentDownloader
+from plugins.telegram.services.data.batch_writer import BatchWriter
+from plugins.telegram.services.entity_cache import EntityCache
+
+class CollectionEngine:
+    """
+    asyncio-native collection engine running several channel collectors at once
+    over the single Telethon client.
+
+    - A semaphore bounds how many channels are collected concurrently.
+    - A FloodWait raised to any collector pauses every collector until the wait
+      has elapsed, then the request is retried.
+    - All database writes are queued to one writer task, which runs them on a
+      dedicated thread and groups whatever is pending into one transaction.
+    - Attachments are handed to an AttachmentDownloader whose workers download
+      them in the background while collection continues; the run only ends once
+      the download queue has drained.
+    - Channels are addressed through the EntityCache, so collecting a stored
+      channel costs no get_entity() call, and every user seen is cached.
+    """
+
+    WRITE_QUEUE_SIZE = 64
+    WRITE_GROUP_SIZE = 32
+
+    def __init__(self, client, db_manager, concurrency=8, attachment_options=None, entity_cache=None):
+        self.client = client
+        self.db_manager = db_manager
+        self.entity_cache = entity_cache or EntityCache(client, db_manager)
+        self.concurrency = concurrency
+        self._flood_until = 0
+        self._seen_users = set()    # users already upserted in this run
+        self.downloader = AttachmentDownloader(client, db_manager, on_saved=self._record_attachments, **(attachment_options or {}))
+
+    ### Running ###
+
+    def run(self, coro):
+        """Run a collection coroutine to completion on the client's event loop."""
+        return self.client.loop.run_until_complete(self._run(coro))
+
+    async def _run(self, coro):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._write_queue = asyncio.Queue(maxsize=self.WRITE_QUEUE_SIZE)
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="telegram-writer") as executor:
+            writer_task = asyncio.ensure_future(self._writer(executor))
+            self.downloader.start()
+            try:
+                return await coro
+            finally:
+                await self.downloader.drain()
+                await self._write_queue.put(None)
+                await writer_task
+
+    async def _gather(self, coros):
+        """Run collectors concurrently, reporting failures without cancelling the rest."""
+        results = await asyncio.gather(*coros, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Collector failed: {result}")
+        return results
+
+    ### Flood Control ###
+
+    async def _wait_for_flood(self):
+        delay = self._flood_until - asyncio.get_event_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _register_flood_wait(self, error):
+        resume_at = asyncio.get_event_loop().time() + error.seconds
+        self._flood_until = max(self._flood_until, resume_at)
+        print(f"FloodWait: pausing all collectors for {error.seconds} seconds.")
+
+    async def _call(self, request):
+        """Send a request through the client, waiting out any FloodWait and retrying."""
+        while True:
+            await self._wait_for_flood()
+            try:
+                return await self.client(request)
+            except FloodWaitError as e:
+                self._register_flood_wait(e)
+
+    ### Writer ###
+
+    async def _write(self, job):
+        """Queue a write job (a callable run on the writer thread)."""
+        await self._write_queue.put(job)
+
+    async def _writer(self, executor):
+        loop = asyncio.get_event_loop()
+        done = False
+        while not done:
+            jobs = [await self._write_queue.get()]
+            while len(jobs) < self.WRITE_GROUP_SIZE and not self._write_queue.empty():
+                jobs.append(self._write_queue.get_nowait())
+            if None in jobs:
+                done = True
+                jobs = [job for job in jobs if job is not None]
+            if jobs:
+                await loop.run_in_executor(executor, self._run_jobs, jobs)
+
+    def _run_jobs(self, jobs):
+        try:
+            with self.db_manager.transaction():
+                for job in jobs:
+                    job()
+        except Exception as e:
+            # Fall back to one transaction per job so a single bad job only loses itself
+            print(f"Grouped write failed ({e}); retrying jobs individually.")
+            for job in jobs:
+                try:
+                    with self.db_manager.transaction():
+                        job()
+                except Exception as job_error:
+                    print(f"Write failed: {job_error}")
+
+    def _write_page_job(self, channel_id, messages, checkpoint=None, user_id=None):
+        rows = [BatchWriter.message_row(message, channel_id) for message in messages]
+
+        def job():
+            inserted = self.db_manager.save_messages(rows)
+            if checkpoint and user_id is not None:
+                self.db_manager.update_user_checkpoint(user_id, channel_id, **checkpoint)
+            elif checkpoint:
+                self.db_manager.update_checkpoint(channel_id, **checkpoint)
+            print(f"Collected {inserted} new messages from channel {channel_id} (page ending at ID {messages[-1].id})")
+        return job
+
+    ### Message Collection ###
+
+    async def collect_channels(self, channel_ids):
+        """Collect messages from many channels concurrently."""
+        return await self._gather(self.collect_channel(channel_id) for channel_id in channel_ids)
+
+    async def collect_channel(self, channel_id):
+        """
+        Collect one channel incrementally from its checkpoint.
+
+        Fetches messages newer than the high-water mark first, then resumes an
+        unfinished backfill from the lowest stored message ID.
+        """
+        async with self._semaphore:
+            entity = self._input_peer(channel_id)
+            checkpoint = self.db_manager.get_checkpoint(channel_id)
+
+            # A channel that was empty when backfilled has no high-water mark: catch up from the start
+            if checkpoint and (checkpoint['max_message_id'] or checkpoint['backfill_complete']):
+                newest_id, completed = await self._collect_history(entity, channel_id, min_id=checkpoint['max_message_id'] or 0)
+                # The high-water mark only moves once every newer message is stored,
+                # otherwise an interrupted catch-up would leave a gap behind it.
+                if completed and newest_id:
+                    await self._write(lambda: self.db_manager.update_checkpoint(channel_id, max_message_id=newest_id))
+
+            if not checkpoint or not checkpoint['backfill_complete']:
+                offset_id = checkpoint['min_message_id'] if checkpoint and checkpoint['min_message_id'] else 0
+                if offset_id:
+                    print(f"Resuming backfill of channel {channel_id} below message ID {offset_id}")
+                _, completed = await self._collect_history(entity, channel_id, offset_id=offset_id, backfill=True)
+                if completed:
+                    await self._write(lambda: self.db_manager.update_checkpoint(channel_id, backfill_complete=True))
+
+            print(f"Finished collecting channel {channel_id}.")
+
+    async def _collect_history(self, entity, channel_id, offset_id=0, min_id=0, backfill=False, limit=100):
+        """
+        Page backwards through a channel's history from offset_id down to min_id.
+
+        Each page becomes one write job. During a backfill the checkpoint is
+        advanced in the same job, so an interruption resumes from the last stored
+        page.
+
+        Returns:
+            tuple: (newest message ID seen, whether the walk reached the end)
+        """
+        newest_id = None
+
+        while True:
+            try:
+                history = await self._call(GetHistoryRequest(
+                    peer=entity,
+                    limit=limit,
+                    offset_id=offset_id,
+                    offset_date=None,
+                    max_id=0,
+                    min_id=min_id,
+                    add_offset=0,
+                    hash=0
+                ))
+            except RPCError as e:
+                print(f"Failed to retrieve messages from channel {channel_id}: {e}")
+                return newest_id, False
+
+            if not history.messages:
+                return newest_id, True
+
+            page_newest = history.messages[0].id
+            page_oldest = history.messages[-1].id
+            newest_id = newest_id or page_newest
+
+            checkpoint = {'max_message_id': page_newest, 'min_message_id': page_oldest} if backfill else None
+            await self._write(self._write_page_job(channel_id, history.messages, checkpoint))
+
+            for message in history.messages:
+                if message.media and isinstance(message.media, MessageMediaDocument):
+                    self._queue_attachment(message, channel_id)
+
+            offset_id = page_oldest
+
+    SEARCH_BATCH_SIZE = 100
+
+    async def collect_messages_from_user(self, user_id, channel_ids):
+        """
+        Collect the messages a user sent in many channels concurrently.
+
+        Each chat is searched server-side for the user's messages
+        (iter_messages(from_user=...), a messages.search request) instead of
+        downloading its whole history, and a per-(user, channel) checkpoint makes
+        repeat runs fetch only what is new, the same way collect_channel() does.
+        """
+        try:
+            await self._wait_for_flood()
+            user = await self.entity_cache.resolve_async(user_id, 'user', save=self._save_entities)
+        except (RPCError, ValueError) as e:
+            print(f"Failed to resolve user {user_id}: {e}")
+            return []
+        return await self._gather(
+            self._collect_messages_from_user_in_channel(user['input_peer'], user_id, channel_id) for channel_id in channel_ids
+        )
+
+    async def _collect_messages_from_user_in_channel(self, user, user_id, channel_id):
+        async with self._semaphore:
+            entity = self._input_peer(channel_id)
+            checkpoint = self.db_manager.get_user_checkpoint(user_id, channel_id)
+
+            # No messages found by the backfill leaves no high-water mark: search from the start again
+            if checkpoint and (checkpoint['max_message_id'] or checkpoint['backfill_complete']):
+                newest_id, completed = await self._search_user_messages(
+                    entity, user, user_id, channel_id, min_id=checkpoint['max_message_id'] or 0)
+                if completed and newest_id:
+                    await self._write(lambda: self.db_manager.update_user_checkpoint(user_id, channel_id, max_message_id=newest_id))
+
+            if not checkpoint or not checkpoint['backfill_complete']:
+                offset_id = checkpoint['min_message_id'] if checkpoint and checkpoint['min_message_id'] else 0
+                _, completed = await self._search_user_messages(
+                    entity, user, user_id, channel_id, offset_id=offset_id, backfill=True)
+                if completed:
+                    await self._write(lambda: self.db_manager.update_user_checkpoint(user_id, channel_id, backfill_complete=True))
+
+            print(f"Finished collecting messages from user {user_id} in channel {channel_id}.")
+
+    async def _search_user_messages(self, entity, user, user_id, channel_id, offset_id=0, min_id=0, backfill=False):
+        """
+        Walk the user's messages in one chat from offset_id down to min_id, newest first.
+
+        Messages are written in batches; during a backfill each batch also moves
+        the checkpoint, so an interrupted walk resumes below the last stored batch.
+
+        Returns:
+            tuple: (newest message ID seen, whether the walk reached the end)
+        """
+        newest_id = None
+        batch = []
+
+        async def flush():
+            nonlocal batch
+            if batch:
+                checkpoint = {'max_message_id': batch[0].id, 'min_message_id': batch[-1].id} if backfill else None
+                await self._write(self._write_page_job(channel_id, batch, checkpoint, user_id))
+                for message in batch:
+                    if message.media and isinstance(message.media, MessageMediaDocument):
+                        self._queue_attachment(message, channel_id)
+                batch = []
+
+        try:
+            while True:
+                await self._wait_for_flood()
+                try:
+                    async for message in self.client.iter_messages(entity, from_user=user, offset_id=offset_id, min_id=min_id):
+                        newest_id = newest_id or message.id
+                        offset_id = message.id
+                        batch.append(message)
+                        if len(batch) >= self.SEARCH_BATCH_SIZE:
+                            await flush()
+                    return newest_id, True
+                except FloodWaitError as e:
+                    # Resume the search below the last message seen once the wait is over
+                    self._register_flood_wait(e)
+        except RPCError as e:
+            print(f"Failed to search messages of user {user_id} in channel {channel_id}: {e}")
+            return newest_id, False
+        finally:
+            await flush()
+
+    def _input_peer(self, channel_id):
+        """InputPeer of a channel or group from the entity cache; a bare PeerChannel if it is not cached."""
+        record = self.entity_cache.lookup(channel_id)
+        if record and record['type'] != 'user':
+            return record['input_peer']
+        return PeerChannel(channel_id)
+
+    ### User Collection ###
+
+    USER_BATCH_SIZE = 500
+    PARTICIPANTS_PAGE_SIZE = 200    # the API maximum
+
+    async def collect_participants(self, entities, source='auto'):
+        """
+        Collect the users of many channels concurrently.
+
+        Parameters:
+            entities (list): Channel entities, peers, usernames or IDs.
+            source (str): "participants" to page through the member list, "messages" to
+                scan the history for senders, or "auto" to use the member list where
+                permitted and fall back to the history scan otherwise.
+        """
+        self._seen_users = set()
+        return await self._gather(self.collect_participants_in_channel(entity, source) for entity in entities)
+
+    async def collect_participants_in_channel(self, entity_name_or_id, source='auto'):
+        """Collect the users of one channel from its member list or its message history."""
+        async with self._semaphore:
+            try:
+                await self._wait_for_flood()
+                entity = await self.entity_cache.resolve_async(entity_name_or_id, save=self._save_entities)
+            except (RPCError, ValueError) as e:
+                print(f"Failed to resolve '{entity_name_or_id}': {e}")
+                return
+
+            if source != 'messages':
+                if entity['type'] == 'channel':
+                    try:
+                        await self._collect_member_list(entity)
+                        return
+                    except (ChatAdminRequiredError, ChannelPrivateError) as e:
+                        if source == 'participants':
+                            print(f"Cannot list participants of '{entity_name_or_id}': {e}")
+                            return
+                        print(f"Member list of '{entity_name_or_id}' not available ({type(e).__name__}); scanning messages instead.")
+                elif source == 'participants':
+                    print(f"'{entity_name_or_id}' is not a channel or supergroup; scanning messages instead.")
+
+            await self._collect_message_senders(entity, entity_name_or_id)
+
+    async def _collect_member_list(self, entity):
+        """Page through the member list with GetParticipantsRequest, one batched write per page."""
+        offset, total = 0, None
+
+        while True:
+            participants = await self._call(GetParticipantsRequest(
+                entity['input_peer'], ChannelParticipantsSearch(''), offset=offset, limit=self.PARTICIPANTS_PAGE_SIZE, hash=0
+            ))
+            if not getattr(participants, 'users', None):
+                break
+
+            total = participants.count
+            offset += len(participants.participants)
+            await self._write_users(entity['id'], [self._user_row(user) for user in participants.users], participants.users)
+
+        print(f"Collected {offset} participants of '{entity['title']}'.")
+        if total and offset < total:
+            # Telegram only lists a limited number of members of large groups
+            print(f"Note: '{entity['title']}' reports {total} members but only {offset} are listed by the API.")
+
+    async def _collect_message_senders(self, entity, entity_name_or_id):
+        """Collect active users by scanning the history for distinct senders."""
+        active_users = set()
+        batch, senders = [], []
+        offset_id = 0
+
+        try:
+            while True:
+                try:
+                    async for message in self.client.iter_messages(entity['input_peer'], offset_id=offset_id):
+                        offset_id = message.id
+                        if not isinstance(message.from_id, PeerUser) or message.from_id.user_id in active_users:
+                            continue
+
+                        active_users.add(message.from_id.user_id)
+                        batch.append(self._user_row(message.sender, message.from_id.user_id))
+                        if message.sender is not None:
+                            senders.append(message.sender)
+                        if len(batch) >= self.USER_BATCH_SIZE:
+                            await self._write_users(entity['id'], batch, senders)
+                            batch, senders = [], []
+                    break
+                except FloodWaitError as e:
+                    # Resume the iteration below the last message seen once the wait is over
+                    self._register_flood_wait(e)
+                    await self._wait_for_flood()
+        except RPCError as e:
+            print(f"Failed to retrieve messages from '{entity_name_or_id}': {e}")
+        finally:
+            if batch:
+                await self._write_users(entity['id'], batch, senders)
+
+        print(f"Collected {len(active_users)} unique active users from '{entity_name_or_id}'.")
+
+    async def _write_users(self, channel_id, users, entities=()):
+        """Queue one batched write: users not yet upserted in this run, every membership, and the user entities."""
+        seen = self._seen_users
+        new_users = [user for user in users if user['user_id'] not in seen]
+        seen.update(user['user_id'] for user in new_users)
+        user_ids = [user['user_id'] for user in users]
+        new_ids = {user['user_id'] for user in new_users}
+        resolved = self.entity_cache.remember_many([entity for entity in entities if entity.id in new_ids], persist=False)
+
+        def job():
+            self.db_manager.save_users(new_users)
+            self.db_manager.save_user_channels(user_ids, channel_id)
+            if resolved:
+                self.db_manager.save_entities(resolved)
+        await self._write(job)
+
+    async def _save_entities(self, records):
+        await self._write(lambda: self.db_manager.save_entities(records))
+
+    @staticmethod
+    def _user_row(user, user_id=None):
+        return {
+            'user_id': user_id if user_id is not None else user.id,
+            'username': getattr(user, 'username', None),
+            'first_name': getattr(user, 'first_name', None),
+            'last_name': getattr(user, 'last_name', None),
+        }
+
+    ### Attachments ###
+
+    def _queue_attachment(self, message, channel_id):
+        """Queue an attachment for download unless it is already stored, with (channel_id, message_id, document_id) as the unique key."""
+        document = message.media.document
+        if self.db_manager.fetchone('SELECT 1 FROM attachments WHERE channel_id = ? AND message_id = ? AND document_id = ?',
+                                    (channel_id, message.id, document.id)):
+            print(f"Skipping duplicate attachment for message ID {message.id} in channel {channel_id} (document {document.id})")
+            return
+        self.downloader.enqueue(message)
+
+    async def _record_attachments(self, attachments):
+        await self._write(lambda: self.db_manager.save_attachments(attachments))
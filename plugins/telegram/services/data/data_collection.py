@@ -1,29 +1,23 @@
-from io import BytesIO
-import os
-import sqlite3
-import time
 from telethon import TelegramClient
-from telethon.tl.functions.channels import GetParticipantsRequest
-from telethon.tl.types import ChannelParticipantsSearch, PeerChannel, MessageMediaDocument, PeerUser
-from telethon.tl.functions.messages import GetHistoryRequest
-from telethon.errors.rpcerrorlist import ChannelPrivateError, ChatAdminRequiredError, RPCError
 from telethon.tl.types import Channel, Chat
 from plugins.telegram.services.telegram_database import DatabaseManager
-from telethon.tl.types import (
-    MessageMediaDocument,
-    DocumentAttributeFilename,
-    PeerUser
-)
+from plugins.telegram.services.data.collection_engine import CollectionEngine
+from plugins.telegram.services.entity_cache import EntityCache
 
 class DataCollector:
-    def __init__(self, client, db_manager):
+    def __init__(self, client, db_manager, concurrency=8, entity_cache=None):
         self.client: TelegramClient = client
         self.db_manager: DatabaseManager = db_manager
+        self.concurrency = concurrency
+        self.entity_cache = entity_cache or EntityCache(client, db_manager)
+        self.attachment_options = {}
 
     ### Channel Collection ###
     def collect_all_channels(self):
         """Collect all accessible channels, groups, and supergroups and save them with member counts."""
         dialogs = self.client.get_dialogs()
+        # The dialog list carries the access hash of every chat and user in it: cache them all
+        self.entity_cache.remember_many([dialog.entity for dialog in dialogs])
         for dialog in dialogs:
             if isinstance(dialog.entity, (Channel, Chat)):
                 entity = dialog.entity
@@ -60,265 +54,90 @@ class DataCollector:
             print(f"Error retrieving member count for {entity.title}: {e}")
             return 0
 
-    def collect_all_users(self):
-        """Collect all users across all channels and save them in the database."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
+    def collect_all_users(self, concurrency=None, source='auto'):
+        """
+        Collect all users across all channels concurrently and save them in the database.
 
-        cursor.execute("SELECT channel_id, title FROM channels")
-        channels = cursor.fetchall()
+        source selects how users are found: "participants" (the member list),
+        "messages" (senders in the history) or "auto" (the member list where
+        permitted, the history otherwise).
+        """
+        channels = self.db_manager.fetchall("SELECT channel_id, title FROM channels")
 
-        for channel_id, channel_name in channels:
-            print(f"Collecting users in channel: {channel_name}")
-            self.collect_active_users_in_channel(channel_name)
+        print(f"Collecting users in {len(channels)} channels: {', '.join(str(title) for _, title in channels)}")
+
+        engine = self._engine(concurrency)
+        engine.run(engine.collect_participants([channel_id for channel_id, _ in channels], source))
 
-        conn.close()
-        
     def collect_active_users_in_channel(self, entity_name_or_id):
         """Collect active users by retrieving messages from the specified entity."""
-        try:
-            entity = self.client.get_entity(entity_name_or_id)
-            active_users = set()
-
-            for message in self.client.iter_messages(entity):
-                if isinstance(message.from_id, PeerUser):
-                    user_id = message.from_id.user_id
-                    active_users.add(user_id)
-
-                    user_data = {
-                        'user_id': user_id,
-                        'username': getattr(message.sender, 'username', None),
-                        'first_name': getattr(message.sender, 'first_name', None),
-                        'last_name': getattr(message.sender, 'last_name', None),
-                    }
-                    self.db_manager.save_user(user_data, entity.id)
-                    print(f"Collected active user: {user_data}")
-
-            print(f"Collected {len(active_users)} unique active users from '{entity_name_or_id}'.")
-
-        except RPCError as e:
-            print(f"Failed to retrieve messages from '{entity_name_or_id}': {e}")
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
-            
-    def collect_users_in_channel(self, channel_name):
-        try:
-            entity = self.client.get_entity(channel_name)
+        self.collect_users_in_channel(entity_name_or_id, source='messages')
             
-            if not isinstance(entity, (Channel, Chat)):
-                print(f"The provided entity '{channel_name}' is not a valid channel or group.")
-                return
-
-            all_participants = []
-            offset = 0
-            limit = 100  # Telegram API limit
-
-            while True:
-                participants = self.client(GetParticipantsRequest(
-                    entity,
-                    ChannelParticipantsSearch(''),
-                    offset=offset,
-                    limit=limit,
-                    hash=0
-                ))
-
-                if not participants.users:
-                    break
-
-                all_participants.extend(participants.users)
-                offset += len(participants.users)
-
-                for participant in participants.users:
-                    user_data = {
-                        'user_id': participant.id,
-                        'username': participant.username,
-                        'first_name': participant.first_name,
-                        'last_name': participant.last_name,
-                    }
-                    self.db_manager.save_user(user_data, entity.id)
-
-                print(f"Processed {len(participants.users)} users in the current batch for {channel_name}.")
-
-            print(f"Collected all users in '{channel_name}'. Total users: {len(all_participants)}")
-
-        except ChannelPrivateError:
-            print(f"Cannot access the channel '{channel_name}' because it is private.")
-        except ChatAdminRequiredError:
-            print(f"Cannot access participants in '{channel_name}' - Admin privileges required.")
-        except Exception as e:
-            print(f"An error occurred: {e}")
+    def collect_users_in_channel(self, channel_name, source='auto'):
+        """Collect the users of one channel, from its member list where permitted and its messages otherwise."""
+        engine = self._engine()
+        engine.run(engine.collect_participants([channel_name], source))
 
     def _save_channel(self, channel):
         """Helper method to save a channel to the database."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT 1 FROM channels WHERE channel_id = ?', (channel.id,))
-        if cursor.fetchone() is None:
+        with self.db_manager.transaction() as cursor:
             cursor.execute('''
-                INSERT INTO channels (channel_id, title, username, date_created)
+                INSERT OR IGNORE INTO channels (channel_id, title, username, date_created)
                 VALUES (?, ?, ?, ?)
             ''', (channel.id, channel.title, channel.username, channel.date))
-            print(f"Collected and saved channel: {channel.title}")
-        conn.commit()
-        conn.close()
+            if cursor.rowcount:
+                print(f"Collected and saved channel: {channel.title}")
 
     ### Message Collection ###
 
     def collect_messages_in_channel(self, channel_identifier):
-        """Collect all messages from a specific channel or group, using either name or ID."""
-
-        channel_identifier = int(channel_identifier)
-        entity = PeerChannel(channel_identifier)
-        channel_id = channel_identifier
-
-
-        offset_id, limit = 0, 100
-
-        while True:
-            try:
-                history = self.client(GetHistoryRequest(
-                    peer=entity,
-                    limit=limit,
-                    offset_id=offset_id,
-                    offset_date=None,
-                    max_id=0,
-                    min_id=0,
-                    add_offset=0,
-                    hash=0
-                ))
-
-                if not history.messages:
-                    break
-
-                for message in history.messages:
-                    self._save_message(message, channel_id)
-                    if message.media and isinstance(message.media, MessageMediaDocument):
-                        self._save_attachment(message)
-
-                offset_id = history.messages[-1].id
-
-            except Exception as e:
-                print(f"Failed to retrieve messages: {e}")
-                break
-
-    def collect_messages_from_user(self, user_id):
-        """Collect all messages across channels sent by a specific user."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT channel_id FROM channels')
-        channels = cursor.fetchall()
-        
-        for (channel_id,) in channels:
-            self._collect_messages_from_user_in_channel(user_id, channel_id)
-
-    def _collect_messages_from_user_in_channel(self, user_id, channel_id):
-        """Helper method to collect messages from a specific user within a specific channel."""
-        channel = PeerChannel(channel_id)
-        offset_id, limit = 0, 100
-
-        while True:
-            history = self.client(GetHistoryRequest(
-                peer=channel, limit=limit, offset_id=offset_id,
-                max_id=0, min_id=0, add_offset=0, hash=0))
-            
-            if not history.messages:
-                break
-
-            for message in history.messages:
-                if message.from_id.user_id == user_id:
-                    self._save_message(message, channel_id)
-                    if message.media and isinstance(message.media, MessageMediaDocument):
-                        self._save_attachment(message)
-
-            offset_id = history.messages[-1].id
-
-    def collect_messages_from_multiple_channels(self, channel_names=None):
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-
+        """
+        Collect messages from a specific channel or group by ID, incrementally.
+
+        The per-channel checkpoint records the highest and lowest message IDs
+        already stored. A repeat collection first fetches only messages newer than
+        the high-water mark, then resumes an unfinished backfill from the lowest
+        stored ID instead of walking the whole history again.
+        """
+        engine = self._engine()
+        engine.run(engine.collect_channel(int(channel_identifier)))
+
+    def collect_messages_from_user(self, user_id, concurrency=None):
+        """Collect all messages across channels sent by a specific user, searching each channel server-side."""
+        channels = self.db_manager.fetchall('SELECT channel_id FROM channels')
+
+        engine = self._engine(concurrency)
+        engine.run(engine.collect_messages_from_user(user_id, [channel_id for (channel_id,) in channels]))
+
+    def collect_messages_from_multiple_channels(self, channel_names=None, concurrency=None):
+        """Collect messages from the given channels (titles or IDs), or from every stored channel, concurrently."""
         if channel_names:
-            cursor.execute('SELECT channel_id FROM channels WHERE title IN (?) or channel_id in (?)', (channel_names,channel_names,))
+            placeholders = ', '.join('?' for _ in channel_names)
+            channels = self.db_manager.fetchall(
+                f'SELECT channel_id FROM channels WHERE title IN ({placeholders}) OR channel_id IN ({placeholders})',
+                (*channel_names, *channel_names)
+            )
         else:
-            cursor.execute('SELECT channel_id FROM channels')
-        
-        channels = cursor.fetchall()
-        for (channel_id,) in channels:
-            self.collect_messages_in_channel(channel_id)
-
-    def _save_message(self, message, channel_id):
-        """Save a message to the database, including its date and handling cases where user_id is missing."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-
-        user_id = message.from_id.user_id if isinstance(message.from_id, PeerUser) else None
-        message_date = message.date.strftime("%Y-%m-%d %H:%M:%S") if message.date else None
-
-        cursor.execute('SELECT 1 FROM messages WHERE message_id = ?', (message.id,))
-        if cursor.fetchone() is None:
-            cursor.execute('''
-                INSERT INTO messages (message_id, channel_id, user_id, date, content)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (message.id, channel_id, user_id, message_date, message.message))
-            print(f"Collected message ID: {message.id}, Date: {message_date}")
-
-        conn.commit()
-        conn.close()
-
-    def _save_attachment(self, message, retries=3):
-        """Save attachment, checking for duplicates with (message_id, file_name) as the unique key."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-
-        document = message.media.document if isinstance(message.media, MessageMediaDocument) else None
-        if not document:
-            print(f"No document found in message ID {message.id}")
-            return
-
-        file_name = self._get_file_name(document)
-        file_path = os.path.join('attachments/', file_name)
-
-        cursor.execute('SELECT 1 FROM attachments WHERE message_id = ? AND file_name = ?', (message.id, file_name))
-        if cursor.fetchone():
-            print(f"Skipping duplicate attachment for message ID {message.id} with file name {file_name}")
-            conn.close()
-            return
-
-        print(f"Starting download for message ID {message.id} with file name {file_name}")
-        attempt = 0
-
-        while attempt < retries:
-            try:
-                with open(file_path, 'wb') as file:
-                    buffer = BytesIO()
-                    self.client.download_media(document, file=buffer)
-                    buffer.seek(0)
-                    file.write(buffer.read())
-
-                mime_type = document.mime_type or "application/octet-stream"
-                file_size = document.size
-                cursor.execute('''
-                    INSERT INTO attachments (message_id, file_name, file_type, file_path, mime_type, size)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (message.id, file_name, mime_type.split('/')[-1], file_path, mime_type, file_size))
-                print(f"Successfully downloaded and saved {mime_type} for message ID {message.id} at {file_path}")
-
-                conn.commit()
-                break
-
-            except TimeoutError:
-                attempt += 1
-                wait_time = 2 ** attempt
-                print(f"TimeoutError, retry {attempt}/{retries}. Waiting {wait_time} seconds.")
-                time.sleep(wait_time)
-            except Exception as e:
-                print(f"Unexpected error during download for message ID {message.id}: {e}")
-                break
-            
-        conn.close()
-
-    def _get_file_name(self, document):
-        """Extract or create a file name for the document."""
-        for attr in document.attributes:
-            if isinstance(attr, DocumentAttributeFilename):
-                return attr.file_name
-        return f"{document.id}.dat"
\ No newline at end of file
+            channels = self.db_manager.fetchall('SELECT channel_id FROM channels')
+
+        engine = self._engine(concurrency)
+        engine.run(engine.collect_channels([channel_id for (channel_id,) in channels]))
+
+    def _engine(self, concurrency=None):
+        """Create a collection engine over this collector's client and database."""
+        return CollectionEngine(self.client, self.db_manager, concurrency or self.concurrency, self.attachment_options,
+                                self.entity_cache)
+
+    def configure_attachments(self, workers=4, max_size=None, types=None, directory=None):
+        """
+        Configure background attachment downloads for subsequent collections.
+
+        Parameters:
+            workers (int): Number of concurrent downloads.
+            max_size (int): Skip attachments larger than this many bytes.
+            types (list[str]): Only download these MIME types, MIME families or file extensions.
+            directory (str): Root of the attachment blob store (default: data/attachments).
+        """
+        self.attachment_options = {'workers': workers, 'max_size': max_size, 'types': types}
+        if directory:
+            self.attachment_options['directory'] = directory
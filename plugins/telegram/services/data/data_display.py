@@ -1,16 +1,35 @@
-import sqlite3
+import csv
+import json
+import sys
 
 class DataDisplay:
+    """
+    Displays collected data.
+
+    Message and user listings are streamed straight from the database cursor,
+    so the first rows appear immediately and memory use stays flat however
+    large the result. They accept these paging options:
+
+        limit, offset    -- page size and plain offset
+        since, until     -- message date range, since inclusive, until exclusive
+                            ("YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS")
+        after            -- keyset cursor printed at the end of the previous page
+        output_format    -- "text", "jsonl" or "csv"
+        output           -- file object to write to (default: stdout)
+
+    They return the number of rows written.
+    """
+
+    MESSAGE_COLUMNS = ('id', 'message_id', 'channel_id', 'user_id', 'date', 'username', 'first_name', 'last_name', 'content')
+    USER_COLUMNS = ('user_id', 'username', 'first_name', 'last_name')
+
     def __init__(self, db_manager):
         self.db_manager = db_manager
 
     def display_channels(self):
         """Display all channels, groups, and supergroups with type, member counts, and user counts."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-
         # Join channels with user_channels to get a count of unique users per channel
-        cursor.execute('''
+        cursor = self.db_manager.execute('''
             SELECT ch.channel_id, ch.title, ch.username, ch.type, ch.member_count, COUNT(DISTINCT uc.user_id) AS user_count
             FROM channels ch
             LEFT JOIN user_channels uc ON ch.channel_id = uc.channel_id
@@ -18,7 +37,6 @@ class DataDisplay:
         ''')
         
         channels = cursor.fetchall()
-        conn.close()
 
         # Display results, including user count and channel_id
         for channel_id, title, username, channel_type, member_count, user_count in channels:
@@ -29,17 +47,13 @@ class DataDisplay:
     
     def display_single_channel(self, channel_name):
         """Display information for a single channel by its title."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        cursor = self.db_manager.execute('''
             SELECT title, username, type, member_count
             FROM channels
             WHERE title = ?
         ''', (channel_name,))
         
         channel = cursor.fetchone()
-        conn.close()
 
         if channel:
             title, username, channel_type, member_count = channel
@@ -49,128 +63,53 @@ class DataDisplay:
             print(f"No channel found with title '{channel_name}'.")
             return None
             
-    def display_all_users(self):
-        """Retrieve and display all unique users across all channels."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT DISTINCT user_id, username, first_name, last_name
-            FROM users
-        ''')
-        
-        users = cursor.fetchall()
-        conn.close()
-        
-        for user in users:
-            print(user)
-            
-        return users
-
-    def display_messages_in_channel(self, channel_name):
-        """Display all messages in a specific channel, including user details and message dates."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        
-        # Fetch messages joined with user data for a specific channel based on the title
-        cursor.execute('''
-            SELECT messages.content, messages.date, users.username, users.first_name, users.last_name
-            FROM messages
-            JOIN users ON messages.user_id = users.user_id
-            WHERE messages.channel_id = (SELECT channel_id FROM channels WHERE title = ?)
-        ''', (channel_name,))
-        
-        messages = cursor.fetchall()
-        conn.close()
-        
-        for content, date, username, first_name, last_name in messages:
-            print(f"Date: {date}, User: {username}, Name: {first_name} {last_name}, Message: {content}")
-            
-        return messages
+    def display_all_users(self, **options):
+        """Stream all unique users across all channels, ordered by user ID."""
+        return self._stream_users([], [], **options)
+
+    def display_messages_in_channel(self, channel_name, **options):
+        """Stream all messages in a specific channel, including user details and message dates."""
+        return self._stream_messages(
+            ['messages.channel_id = (SELECT channel_id FROM channels WHERE title = ?)'], [channel_name], **options
+        )
     
-    def display_all_messages(self):
-        """Display all messages, including user details and message dates."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT messages.content, messages.date, users.username, users.first_name, users.last_name
-            FROM messages
-            JOIN users ON messages.user_id = users.user_id
-        ''')
-        messages = cursor.fetchall()
-        
-        conn.close()
-        
-        for content, date, username, first_name, last_name in messages:
-            print(f"Date: {date}, User: {username}, Name: {first_name} {last_name}, Message: {content}")
-        
-        return messages
+    def display_all_messages(self, **options):
+        """Stream all messages, including user details and message dates."""
+        return self._stream_messages([], [], **options)
 
-    def display_messages_from_user(self, user_id):
-        """Display all messages from a specific user across all channels, including message dates."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT content, date
-            FROM messages
-            WHERE user_id = ?
-        ''', (user_id,))
-        messages = cursor.fetchall()
-        conn.close()
-        
-        for content, date in messages:
-            print(f"Message: {content}, Date: {date}")
-        
-        return messages
+    def display_messages_from_user(self, user_id, **options):
+        """Stream all messages from a specific user across all channels, including message dates."""
+        return self._stream_messages(['messages.user_id = ?'], [user_id], **options)
     
     def display_latest_messages_in_channel(self, channel_name, limit=10):
         """Retrieve and display the latest messages from a specified channel, including dates."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT content, date 
+        cursor = self.db_manager.execute('''
+            SELECT messages.content, messages.date, users.username, users.first_name, users.last_name
             FROM messages 
             JOIN users ON messages.user_id = users.user_id
-            WHERE channel_id = (SELECT channel_id FROM channels WHERE title = ?)
-            ORDER BY date DESC
+            WHERE messages.channel_id = (SELECT channel_id FROM channels WHERE title = ?)
+            ORDER BY messages.date DESC
             LIMIT ?
         ''', (channel_name, limit))
         
         messages = cursor.fetchall()
-        conn.close()
         
         for content, date, username, first_name, last_name in messages:
             print(f"Date: {date}, User: {username}, Name: {first_name} {last_name}, Message: {content}")
         
         return messages
     
-    def display_messages_from_user_in_channel(self, user_id, channel_name):
-        """Retrieve messages from a specific user within a specific channel, including dates."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT content, date
-            FROM messages
-            WHERE user_id = ? AND channel_id = (SELECT channel_id FROM channels WHERE title = ?)
-            ORDER BY date DESC
-        ''', (user_id, channel_name))
-
-        messages = cursor.fetchall()
-        conn.close()
-        
-        for content, date in messages:
-            print(f"Message: {content}, Date: {date}")
-        
-        return messages
+    def display_messages_from_user_in_channel(self, user_id, channel_name, **options):
+        """Stream messages from a specific user within a specific channel, including dates."""
+        return self._stream_messages(
+            ['messages.user_id = ?', 'messages.channel_id = (SELECT channel_id FROM channels WHERE title = ?)'],
+            [user_id, channel_name],
+            **options
+        )
     
     def display_channels_for_user(self, user_id):
         """Retrieve all channels a specific user has participated in."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('''
+        cursor = self.db_manager.execute('''
             SELECT DISTINCT channels.channel_id, channels.title, channels.date_created
             FROM channels
             JOIN user_channels ON channels.channel_id = user_channels.channel_id
@@ -178,57 +117,128 @@ class DataDisplay:
         ''', (user_id,))
 
         channels = cursor.fetchall()
-        conn.close()
         
         for channel_id, title, date_created in channels:
             print(f"Channel ID: {channel_id}, Title: {title}, Created on: {date_created}")
         
         return channels
     
-    def display_users_in_channel(self, channel_name):
-        """Retrieve users in a specific channel using channel_id."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-
+    def display_users_in_channel(self, channel_name, **options):
+        """Stream users in a specific channel using channel_id."""
         # First, find the channel_id for the given channel title
-        cursor.execute('SELECT channel_id FROM channels WHERE username = ? OR title = ?', (channel_name, channel_name))
+        cursor = self.db_manager.execute('SELECT channel_id FROM channels WHERE username = ? OR title = ?', (channel_name, channel_name))
         channel = cursor.fetchone()
 
         if channel is None:
             print(f"No channel found with title '{channel_name}'.")
-            conn.close()
-            return []
-
-        channel_id = channel[0]
+            return 0
 
-        cursor.execute('''
-            SELECT users.user_id, users.username, users.first_name, users.last_name
-            FROM users
-            JOIN user_channels ON users.user_id = user_channels.user_id
-            WHERE user_channels.channel_id = ?
-        ''', (channel_id,))
-
-        users = cursor.fetchall()
-        
-        conn.close()
-        
-        for user_id, username, first_name, last_name in users:
-            print(f"User ID: {user_id}, Username: {username}, Name: {first_name} {last_name}")
-        
-        return users
+        return self._stream_users(
+            ['users.user_id IN (SELECT user_id FROM user_channels WHERE channel_id = ?)'], [channel[0]], **options
+        )
     
     def display_channel_statistics(self):
         """Display subscriber counts for all collected channels."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
+        cursor = self.db_manager.execute('''
             SELECT title, member_count
             FROM channels
         ''')
         channel_stats = cursor.fetchall()
-        conn.close()
         
         for title, count in channel_stats:
             print(f"Channel: {title}, Subscribers: {count}")
         
         return channel_stats
+
+    ### Streaming ###
+
+    def _stream_messages(self, conditions, params, limit=None, offset=0, since=None, until=None, after=None,
+                         output_format='text', output=None):
+        """Build the filtered, keyset-paginated message query and stream its rows to the output."""
+        conditions, params = list(conditions), list(params)
+        if since:
+            conditions.append('messages.date >= ?')
+            params.append(since)
+        if until:
+            conditions.append('messages.date < ?')
+            params.append(until)
+        if after:
+            after_date, after_id = after.rsplit('|', 1)
+            conditions.append('(messages.date, messages.id) > (?, ?)')
+            params.extend([after_date, int(after_id)])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        cursor = self.db_manager.execute(f'''
+            SELECT messages.id, messages.message_id, messages.channel_id, messages.user_id, messages.date,
+                   users.username, users.first_name, users.last_name, messages.content
+            FROM messages
+            LEFT JOIN users ON messages.user_id = users.user_id
+            {where}
+            ORDER BY messages.date, messages.id
+            LIMIT ? OFFSET ?
+        ''', (*params, -1 if limit is None else limit, offset))
+
+        def format_text(row):
+            _, _, _, _, date, username, first_name, last_name, content = row
+            return f"Date: {date}, User: {username}, Name: {first_name} {last_name}, Message: {content}"
+
+        count, last = self._write_rows(cursor, self.MESSAGE_COLUMNS, output_format, output, format_text)
+        if limit is not None and count == limit:
+            self._print_next_cursor(f"{last[4]}|{last[0]}")
+        return count
+
+    def _stream_users(self, conditions, params, limit=None, offset=0, after=None, output_format='text', output=None, **_):
+        """Build the filtered, keyset-paginated user query and stream its rows to the output."""
+        conditions, params = list(conditions), list(params)
+        if after:
+            conditions.append('users.user_id > ?')
+            params.append(int(after))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        cursor = self.db_manager.execute(f'''
+            SELECT users.user_id, users.username, users.first_name, users.last_name
+            FROM users
+            {where}
+            ORDER BY users.user_id
+            LIMIT ? OFFSET ?
+        ''', (*params, -1 if limit is None else limit, offset))
+
+        def format_text(row):
+            user_id, username, first_name, last_name = row
+            return f"User ID: {user_id}, Username: {username}, Name: {first_name} {last_name}"
+
+        count, last = self._write_rows(cursor, self.USER_COLUMNS, output_format, output, format_text)
+        if limit is not None and count == limit:
+            self._print_next_cursor(str(last[0]))
+        return count
+
+    def _write_rows(self, cursor, columns, output_format, output, format_text):
+        """
+        Write rows from a cursor one at a time in the requested format.
+
+        Returns:
+            tuple: (number of rows written, last row written or None)
+        """
+        output = output or sys.stdout
+        count, last = 0, None
+
+        if output_format == 'csv':
+            writer = csv.writer(output)
+            writer.writerow(columns)
+            write = writer.writerow
+        elif output_format == 'jsonl':
+            write = lambda row: output.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n')
+        else:
+            write = lambda row: output.write(format_text(row) + '\n')
+
+        for row in cursor:
+            write(row)
+            count, last = count + 1, row
+
+        output.flush()
+        return count, last
+
+    @staticmethod
+    def _print_next_cursor(cursor):
+        # stderr, so the hint never ends up inside JSONL or CSV output
+        print(f"More results available, continue with: --after '{cursor}'", file=sys.stderr)
@@ -1,6 +1,5 @@
-import sqlite3
-import re
-from collections import defaultdict
+from collections import Counter, defaultdict
+from plugins.telegram.services.data.keyword_matcher import KeywordMatcher
 
 class DataProcessor:
     def __init__(self, db_manager):
@@ -9,75 +8,197 @@ class DataProcessor:
         
     def analyze_user_activity(self, channel_name):
         """Analyze user activity levels in a specified channel."""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT users.username, COUNT(messages.message_id) as message_count
-            FROM messages
-            JOIN users ON messages.user_id = users.user_id
-            WHERE messages.channel_id = (SELECT channel_id FROM channels WHERE title = ?)
-            GROUP BY users.username
-            ORDER BY message_count DESC
-        ''', (channel_name,))
-        
-        activity_data = cursor.fetchall()
-        conn.close()
-        return activity_data
+        return self._messages_per_user(channel_name)
         
     def keyword_analysis_in_channel(self, keywords, channel_name):
         """Analyze messages in a specified channel for specified keywords."""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        keyword_counts = {}
-        for keyword in keywords:
-            cursor.execute('''
-                SELECT COUNT(*) 
-                FROM messages
-                WHERE channel_id = (SELECT channel_id FROM channels WHERE title = ?)
-                AND content LIKE ?
-            ''', (channel_name, f'%{keyword}%'))
-            count = cursor.fetchone()[0]
-            keyword_counts[keyword] = count
-        
-        conn.close()
-        return keyword_counts
+        return self.analyze_keywords(keywords, channel_name)['counts']
 
     def process_user_interactions(self, channel_name):
         """Process user interactions for posts in a specific channel."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT users.username, COUNT(messages.id) as post_count
-            FROM messages
-            JOIN users ON messages.user_id = users.user_id
-            WHERE messages.channel_id = (SELECT channel_id FROM channels WHERE title = ?)
+        return self._messages_per_user(channel_name)
+
+    def _messages_per_user(self, channel_name):
+        """(username, message count) of every known user of a channel, most active first, from the daily rollup."""
+        return self.db_manager.fetchall('''
+            SELECT users.username, SUM(per_user.message_count) AS message_count
+            FROM (
+                SELECT user_id, SUM(message_count) AS message_count
+                FROM activity_daily
+                WHERE channel_id = (SELECT channel_id FROM channels WHERE title = ?)
+                GROUP BY user_id
+            ) AS per_user
+            JOIN users ON users.user_id = per_user.user_id
             GROUP BY users.username
-            ORDER BY post_count DESC
+            ORDER BY message_count DESC
         ''', (channel_name,))
 
-        results = cursor.fetchall()
-        conn.close()
-        return results
-
     def analyze_keywords_in_messages(self, keywords, channel_name):
         """Analyze messages for specific keywords."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT content FROM messages
-            WHERE channel_id = (SELECT channel_id FROM channels WHERE title = ?)
-        ''', (channel_name,))
+        return self.analyze_keywords(keywords, channel_name)['counts']
+
+    ### Keyword Analysis ###
+
+    # Prefix of the stored "YYYY-MM-DD HH:MM:SS" date that identifies each bucket
+    TIME_BUCKETS = {'hour': 13, 'day': 10, 'month': 7, 'year': 4}
+
+    def analyze_keywords(self, keywords, channel_name=None, bucket='day'):
+        """
+        Count keyword mentions in one pass over the messages of a channel, or of
+        the whole database when no channel is given.
+
+        Every message is read once and matched against all keywords at the same
+        time, so the cost does not grow with the number of keywords.
+
+        Returns:
+            dict: {
+                'counts':      {keyword: messages mentioning it},
+                'occurrences': {keyword: total mentions},
+                'users':       {keyword: {user_id: messages mentioning it}},
+                'channels':    {keyword: {channel_id: messages mentioning it}},
+                'buckets':     {keyword: {time bucket: messages mentioning it}},
+                'scanned':     number of messages read,
+            }
+        """
+        matcher = KeywordMatcher(keywords)
+        prefix = self.TIME_BUCKETS[bucket]
+
+        counts = dict.fromkeys(matcher.keywords, 0)
+        occurrences = dict.fromkeys(matcher.keywords, 0)
+        users = defaultdict(Counter)
+        channels = defaultdict(Counter)
+        buckets = defaultdict(Counter)
+        scanned = 0
+
+        if channel_name:
+            cursor = self.db_manager.execute('''
+                SELECT user_id, channel_id, date, content FROM messages
+                WHERE channel_id = (SELECT channel_id FROM channels WHERE title = ?)
+            ''', (channel_name,))
+        else:
+            cursor = self.db_manager.execute('SELECT user_id, channel_id, date, content FROM messages')
+
+        findall = matcher.findall
+        for user_id, channel_id, date, content in cursor:
+            scanned += 1
+            found = findall(content)
+            if not found:
+                continue
+
+            time_bucket = date[:prefix] if date else None
+            for keyword in found:
+                occurrences[keyword] += 1
+            for keyword in set(found):
+                counts[keyword] += 1
+                users[keyword][user_id] += 1
+                channels[keyword][channel_id] += 1
+                buckets[keyword][time_bucket] += 1
+
+        return {
+            'counts': counts,
+            'occurrences': occurrences,
+            'users': {keyword: dict(users[keyword]) for keyword in counts},
+            'channels': {keyword: dict(channels[keyword]) for keyword in counts},
+            'buckets': {keyword: dict(sorted(buckets[keyword].items(), key=lambda item: item[0] or '')) for keyword in counts},
+            'scanned': scanned,
+        }
+
+    def get_usernames(self, user_ids):
+        """Resolve user IDs to usernames in one query."""
+        user_ids = [user_id for user_id in set(user_ids) if user_id is not None]
+        if not user_ids:
+            return {}
+        placeholders = ', '.join('?' for _ in user_ids)
+        cursor = self.db_manager.execute(
+            f'SELECT user_id, username FROM users WHERE user_id IN ({placeholders})', user_ids
+        )
+        return dict(cursor.fetchall())
+
+    ### Activity Rollups ###
+
+    # Source rollup, bucket column and length of the bucket key for each timeline granularity
+    TIMELINE_BUCKETS = {
+        'hour': ('activity_hourly', 'hour', 13),
+        'day': ('activity_daily', 'day', 10),
+        'month': ('activity_daily', 'day', 7),
+        'year': ('activity_daily', 'day', 4),
+    }
+
+    def activity_timeline(self, channel_name=None, user_id=None, bucket='day', since=None, until=None):
+        """
+        Messages per time bucket, oldest first, read from the hourly and daily rollups.
+
+        since (inclusive) and until (exclusive) are compared at the granularity of
+        the rollup read: whole hours for "hour", whole days otherwise.
+
+        Returns:
+            list[tuple]: (bucket, message count)
+        """
+        table, column, length = self.TIMELINE_BUCKETS[bucket]
+        where, params = self._rollup_filters(column, channel_name, user_id, since, until)
+        return self.db_manager.fetchall(f'''
+            SELECT substr({column}, 1, {length}) AS bucket, SUM(message_count)
+            FROM {table}
+            {where}
+            GROUP BY bucket
+            ORDER BY bucket
+        ''', params)
+
+    def top_posters(self, channel_name=None, limit=10, since=None, until=None):
+        """
+        The users who posted the most messages, read from the daily rollup.
+
+        Returns:
+            list[tuple]: (user_id, username, message count), most active first.
+        """
+        where, params = self._rollup_filters('day', channel_name, None, since, until)
+        where += ' AND user_id != 0' if where else 'WHERE user_id != 0'
+        return self.db_manager.fetchall(f'''
+            SELECT top.user_id, users.username, top.message_count
+            FROM (
+                SELECT user_id, SUM(message_count) AS message_count
+                FROM activity_daily
+                {where}
+                GROUP BY user_id
+                ORDER BY message_count DESC
+                LIMIT ?
+            ) AS top
+            LEFT JOIN users ON users.user_id = top.user_id
+            ORDER BY top.message_count DESC
+        ''', (*params, limit))
 
-        messages = cursor.fetchall()
-        keyword_count = defaultdict(int)
+    def posting_heatmap(self, channel_name=None, user_id=None, since=None, until=None):
+        """
+        Messages per weekday and hour of day (UTC), read from the hourly rollup.
 
-        for message in messages:
-            for keyword in keywords:
-                if re.search(r'\b' + re.escape(keyword) + r'\b', message[0], re.IGNORECASE):
-                    keyword_count[keyword] += 1
+        Returns:
+            list[list[int]]: 7 rows (Sunday first) of 24 hourly counts.
+        """
+        where, params = self._rollup_filters('hour', channel_name, user_id, since, until)
+        heatmap = [[0] * 24 for _ in range(7)]
+        for weekday, hour, count in self.db_manager.fetchall(f'''
+            SELECT CAST(strftime('%w', substr(hour, 1, 10)) AS INTEGER), CAST(substr(hour, 12, 2) AS INTEGER),
+                   SUM(message_count)
+            FROM activity_hourly
+            {where}
+            GROUP BY 1, 2
+        ''', params):
+            heatmap[weekday][hour] = count
+        return heatmap
 
-        conn.close()
-        return dict(keyword_count)
+    def _rollup_filters(self, column, channel_name, user_id, since, until):
+        conditions, params = [], []
+        if channel_name is not None:
+            conditions.append('channel_id = (SELECT channel_id FROM channels WHERE title = ?)')
+            params.append(channel_name)
+        if user_id is not None:
+            conditions.append('user_id = ?')
+            params.append(user_id)
+        length = 13 if column == 'hour' else 10
+        if since:
+            conditions.append(f'{column} >= ?')
+            params.append(since[:length])
+        if until:
+            conditions.append(f'{column} < ?')
+            params.append(until[:length])
+        return (f"WHERE {' AND '.join(conditions)}" if conditions else ''), params
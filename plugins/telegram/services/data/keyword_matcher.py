@@ -0,0 +1,136 @@
+import os
+import re
+
+class KeywordMatcher:
+    """
+    Matches any number of keywords against a text in a single pass.
+
+    The keywords are folded into a prefix trie and compiled into one regular
+    expression, so "scam", "scammer" and "scheme" become s(?:c(?:am(?:mer)?|heme)).
+    The regex engine then walks each text once, whatever the number of keywords,
+    instead of once per keyword. Matching is case-insensitive and on whole words.
+
+    Matches may overlap, as with a separate search per keyword: the trie sits in
+    a lookahead tried at every word start, so "york" is still found inside
+    "new york". Keywords that are whole-word prefixes of the longest match at a
+    position ("new" in "new york") are added from a precomputed table.
+    """
+
+    def __init__(self, keywords):
+        self.lookup = {}    # lowercased keyword -> keyword as given
+        for keyword in keywords:
+            keyword = keyword.strip()
+            if keyword:
+                self.lookup.setdefault(keyword.lower(), keyword)
+
+        self.pattern = None
+        self.prefixes = {}  # lowercased keyword -> shorter keywords it starts with, ending on a word boundary
+        if self.lookup:
+            trie = self._build_trie(self.lookup)
+            self.pattern = re.compile(r'(?<!\w)(?=(' + self._trie_pattern(trie) + r')(?!\w))', re.IGNORECASE)
+            self.prefixes = self._build_prefixes(self.lookup)
+
+    @property
+    def keywords(self):
+        return list(self.lookup.values())
+
+    def __bool__(self):
+        return self.pattern is not None
+
+    def findall(self, text):
+        """Return the keyword (as given) of every match in the text, in order."""
+        if not text or self.pattern is None:
+            return []
+        lookup = self.lookup
+        prefixes = self.prefixes
+        found = []
+        ends = {}   # keyword -> end of its last match, so a keyword never overlaps itself
+        for match in self.pattern.finditer(text):
+            start = match.start()
+            longest = match.group(1).lower()
+            for keyword in (longest, *prefixes.get(longest, ())):
+                if ends.get(keyword, 0) > start:
+                    continue
+                ends[keyword] = start + len(keyword)
+                found.append(lookup[keyword])
+        return found
+
+    def matches(self, text):
+        """Return the set of distinct keywords found in the text."""
+        return set(self.findall(text))
+
+    ### Pattern Building ###
+
+    @staticmethod
+    def _build_prefixes(words):
+        prefixes = {}
+        for word in words:
+            nested = [word[:end] for end in range(len(word) - 1, 0, -1)
+                      if word[:end] in words and not (word[end].isalnum() or word[end] == '_')]
+            if nested:
+                prefixes[word] = nested
+        return prefixes
+
+    @staticmethod
+    def _build_trie(words):
+        trie = {}
+        for word in words:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[''] = {}   # end of a keyword
+        return trie
+
+    @classmethod
+    def _trie_pattern(cls, node):
+        """Turn a trie node into a regex without capturing groups."""
+        ends_here = '' in node
+        branches = [re.escape(char) + cls._trie_pattern(child) for char, child in sorted(node.items()) if char]
+
+        if not branches:
+            return ''
+
+        if len(branches) == 1:
+            body = branches[0]
+            # A single branch of more than one character must be grouped to be made optional
+            if ends_here:
+                return f'(?:{body})?' if len(body) > 1 else f'{body}?'
+            return body
+
+        body = '(?:' + '|'.join(branches) + ')'
+        return body + '?' if ends_here else body
+
+class KeywordWatchlist:
+    """
+    Keywords read from a file, one per line, reloaded whenever the file changes.
+
+    Blank lines and lines starting with # are ignored. Keywords passed directly
+    are kept in addition to those in the file. The file is only re-read when its
+    modification time or size changes, so checking for changes costs one stat().
+    """
+
+    def __init__(self, path, keywords=()):
+        self.path = path
+        self.extra_keywords = list(keywords)
+        self._signature = None
+
+    def changed(self):
+        """Whether the file differs from the version last loaded."""
+        return self._stat() != self._signature
+
+    def load(self):
+        """Read the file and compile the keywords into a new KeywordMatcher."""
+        signature = self._stat()
+        keywords = list(self.extra_keywords)
+        if signature is not None:
+            with open(self.path, encoding='utf-8') as file:
+                keywords += [line.strip() for line in file if line.strip() and not line.lstrip().startswith('#')]
+        self._signature = signature
+        return KeywordMatcher(keywords)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,228 @@
+import json
+import os
+import shutil
+import time
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+class ParquetExporter:
+    """
+    Exports the collected corpus to Parquet for analysis with pandas, Polars or DuckDB.
+
+    Tables are read with keyset pagination and written chunk by chunk, so memory
+    use is bounded by chunk_size whatever the size of the database:
+
+        <export_dir>/messages/channel_id=<id>/month=<YYYY-MM>/part-<first id>-<last id>-<n>.parquet
+        <export_dir>/attachments/channel_id=<id>/part-<first id>-<last id>-<n>.parquet
+        <export_dir>/users/users.parquet
+        <export_dir>/channels/channels.parquet
+
+    messages and attachments are append-only, so they are exported incrementally:
+    the highest row ID written is kept in <export_dir>/_export_state.json and the
+    next run only appends newer rows as new files. users and channels are small
+    and updated in place, so they are rewritten whole on every run.
+
+    Read the message partitions back with, e.g.:
+
+        pandas.read_parquet('<export_dir>/messages')
+    """
+
+    STATE_FILE = '_export_state.json'
+    TABLES = ('messages', 'attachments', 'users', 'channels')
+
+    def __init__(self, db_manager, chunk_size=50000):
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+
+    ### Table Definitions ###
+
+    @staticmethod
+    def _schemas():
+        return {
+            'messages': pa.schema([
+                ('id', pa.int64()),
+                ('message_id', pa.int64()),
+                ('channel_id', pa.int64()),
+                ('user_id', pa.int64()),
+                ('date', pa.timestamp('s')),
+                ('content', pa.string()),
+                ('reply_to_message_id', pa.int64()),
+                ('fwd_from_user_id', pa.int64()),
+                ('fwd_from_channel_id', pa.int64()),
+                ('month', pa.string()),
+            ]),
+            'attachments': pa.schema([
+                ('id', pa.int64()),
+                ('channel_id', pa.int64()),
+                ('message_id', pa.int64()),
+                ('file_name', pa.string()),
+                ('file_type', pa.string()),
+                ('file_path', pa.string()),
+                ('mime_type', pa.string()),
+                ('size', pa.int64()),
+                ('document_id', pa.int64()),
+                ('sha256', pa.string()),
+            ]),
+            'users': pa.schema([
+                ('id', pa.int64()),
+                ('user_id', pa.int64()),
+                ('username', pa.string()),
+                ('first_name', pa.string()),
+                ('last_name', pa.string()),
+            ]),
+            'channels': pa.schema([
+                ('id', pa.int64()),
+                ('channel_id', pa.int64()),
+                ('title', pa.string()),
+                ('username', pa.string()),
+                ('type', pa.string()),
+                ('member_count', pa.int64()),
+                ('date_created', pa.timestamp('s')),
+            ]),
+        }
+
+    # Columns selected for each table; month is derived from the message date
+    SELECT = {
+        'messages': 'id, message_id, channel_id, user_id, date, content, reply_to_message_id, fwd_from_user_id, '
+                    'fwd_from_channel_id, COALESCE(substr(date, 1, 7), \'unknown\') AS month',
+        'attachments': 'id, channel_id, message_id, file_name, file_type, file_path, mime_type, size, document_id, sha256',
+        'users': 'id, user_id, username, first_name, last_name',
+        'channels': 'id, channel_id, title, username, type, member_count, date_created',
+    }
+    PARTITIONS = {'messages': ['channel_id', 'month'], 'attachments': ['channel_id']}
+    INCREMENTAL = ('messages', 'attachments')
+    TIMESTAMPS = ('date', 'date_created')   # stored as "YYYY-MM-DD HH:MM:SS" text
+
+    ### Exporting ###
+
+    def export(self, export_dir, tables=None, full=False):
+        """
+        Export tables to export_dir.
+
+        Parameters:
+            export_dir (str): Destination directory.
+            tables (list[str]): Tables to export (default: all).
+            full (bool): Ignore the saved state and export messages and attachments from the start.
+                Existing files of those tables are replaced.
+
+        Returns:
+            dict: rows written per table.
+        """
+        os.makedirs(export_dir, exist_ok=True)
+        state = self._load_state(export_dir)
+        written = {}
+
+        for table in tables or self.TABLES:
+            started = time.monotonic()
+            directory = os.path.join(export_dir, table)
+            if table in self.INCREMENTAL:
+                rewrite = full
+                if not full and self._unpartitioned(table, directory):
+                    print(f"Re-exporting {table} from the start: {directory} predates its partitioning.")
+                    rewrite = True
+                after = 0 if rewrite else state.get(table, 0)
+                # Fix the upper bound first: rows inserted while exporting belong to the next run
+                upper = self.db_manager.fetchone(f"SELECT COALESCE(MAX(id), 0) FROM {table}")[0]
+                if rewrite and os.path.isdir(directory):
+                    shutil.rmtree(directory)
+                written[table] = self._write_dataset(table, directory, after, upper) if upper > after else 0
+                state[table] = max(after, upper)
+                self._save_state(export_dir, state)
+            else:
+                written[table] = self._write_snapshot(table, directory)
+            print(f"Exported {written[table]} {table} to {directory} in {time.monotonic() - started:.1f}s.")
+
+        return written
+
+    def _write_dataset(self, table, directory, after, upper):
+        """
+        Append the rows with after < id <= upper as new files, partitioned where the table defines it.
+
+        File names carry the ID range, so re-running an export interrupted before
+        its state was saved overwrites its own files instead of duplicating rows.
+        """
+        count = 0
+
+        def batches():
+            nonlocal count
+            for batch in self._batches(table, after, upper):
+                count += batch.num_rows
+                yield batch
+
+        partitioning = self.PARTITIONS.get(table)
+        ds.write_dataset(
+            batches(),
+            directory,
+            schema=self._schemas()[table],
+            format='parquet',
+            partitioning=partitioning,
+            partitioning_flavor='hive' if partitioning else None,
+            basename_template=f'part-{after + 1}-{upper}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+            max_rows_per_group=self.chunk_size,
+        )
+        return count
+
+    def _unpartitioned(self, table, directory):
+        """Whether a partitioned table was exported before as plain files, which new partitions cannot be appended to."""
+        if not self.PARTITIONS.get(table) or not os.path.isdir(directory):
+            return False
+        return any(name.endswith('.parquet') for name in os.listdir(directory))
+
+    def _write_snapshot(self, table, directory):
+        """Rewrite a whole table as one file, replacing the previous export only once complete."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{table}.parquet')
+        partial = path + '.partial'
+        count = 0
+
+        with pq.ParquetWriter(partial, self._schemas()[table]) as writer:
+            for batch in self._batches(table):
+                writer.write_batch(batch)
+                count += batch.num_rows
+        os.replace(partial, path)
+        return count
+
+    def _batches(self, table, after=0, upper=None):
+        """Yield the table as Arrow record batches of up to chunk_size rows, in ID order."""
+        schema = self._schemas()[table]
+        query = f"SELECT {self.SELECT[table]} FROM {table} WHERE id > ?"
+        if upper is not None:
+            query += " AND id <= ?"
+        query += f" ORDER BY id LIMIT {int(self.chunk_size)}"
+
+        while True:
+            params = (after, upper) if upper is not None else (after,)
+            rows = self.db_manager.fetchall(query, params)
+            if not rows:
+                return
+            yield self._to_batch(rows, schema)
+            after = rows[-1][0]
+
+    def _to_batch(self, rows, schema):
+        arrays = []
+        for field, values in zip(schema, zip(*rows)):
+            if field.name in self.TIMESTAMPS:
+                array = pc.strptime(pa.array(values, pa.string()), format='%Y-%m-%d %H:%M:%S', unit='s',
+                                    error_is_null=True)
+            else:
+                array = pa.array(values, field.type)
+            arrays.append(array)
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    ### State ###
+
+    def _load_state(self, export_dir):
+        path = os.path.join(export_dir, self.STATE_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def _save_state(self, export_dir, state):
+        path = os.path.join(export_dir, self.STATE_FILE)
+        with open(path + '.partial', 'w', encoding='utf-8') as file:
+            json.dump(state, file, indent=2)
+        os.replace(path + '.partial', path)
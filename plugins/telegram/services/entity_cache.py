@@ -0,0 +1,198 @@
+import time
+from telethon import utils
+from telethon.errors.rpcerrorlist import RPCError
+from telethon.tl.types import (
+    User, Chat, ChatForbidden, Channel, ChannelForbidden,
+    InputPeerUser, InputPeerChat, InputPeerChannel,
+)
+
+class EntityCache:
+    """
+    Persistent cache of resolved Telegram entities.
+
+    Maps entity IDs, usernames and titles to the access hash and type needed to
+    address the entity, so monitors and collectors can build an InputPeer without
+    a get_entity() round-trip (a common FloodWait trigger, and for titles a walk
+    over every dialog). Entries older than ttl seconds are refreshed over the
+    network on their next lookup; if that fails the stale entry is still used.
+
+    The cache is filled whenever entities come by for free: the dialog list
+    when collecting channels, member lists and message senders when collecting
+    users, and every get_entity() result.
+    """
+
+    DEFAULT_TTL = 7 * 24 * 3600
+    COLUMNS = 'peer_id, type, access_hash, username, title, resolved_at'
+
+    def __init__(self, client, db_manager, ttl=DEFAULT_TTL):
+        self.client = client
+        self.db_manager = db_manager
+        self.ttl = ttl
+        self._peers = {}    # (type, id) -> record, for this run
+
+    ### Storing ###
+
+    def remember(self, entity):
+        """Store one Telethon User, Chat or Channel."""
+        self.remember_many([entity])
+
+    def remember_many(self, entities, persist=True):
+        """
+        Store many entities in one transaction.
+
+        With persist=False the entities are only cached in memory and the records
+        are returned for the caller to save, e.g. through its own writer thread.
+        """
+        records = [record for record in map(self._record, entities) if record]
+        for record in records:
+            self._peers[(record['type'], record['id'])] = record
+        if persist and records:
+            self.db_manager.save_entities(records)
+        return records
+
+    @staticmethod
+    def _record(entity):
+        if isinstance(entity, User):
+            kind = 'user'
+            title = ' '.join(name for name in (entity.first_name, entity.last_name) if name) or None
+        elif isinstance(entity, (Channel, ChannelForbidden)):
+            kind, title = 'channel', entity.title
+        elif isinstance(entity, (Chat, ChatForbidden)):
+            kind, title = 'chat', entity.title
+        else:
+            return None
+
+        access_hash = getattr(entity, 'access_hash', None)
+        if kind != 'chat' and access_hash is None:
+            # Users seen without an access hash (e.g. "min" users) cannot be addressed
+            return None
+
+        return {
+            'id': entity.id,
+            'type': kind,
+            'access_hash': access_hash,
+            'username': getattr(entity, 'username', None),
+            'title': title,
+            'resolved_at': time.time(),
+        }
+
+    ### Lookups ###
+
+    def lookup(self, key, kind=None):
+        """
+        Find a cached entity by ID, @username or title, without any network request.
+
+        Parameters:
+            key (int | str): Entity ID, username (with or without @) or title.
+            kind (str): Restrict numeric lookups to "user", "channel" or "chat".
+
+        Returns:
+            dict: Record with id, type, access_hash, username, title, resolved_at and
+                input_peer, or None if the entity is not cached.
+        """
+        peer_id, marked_kind = self._parse_id(key)
+        kind = kind or marked_kind
+
+        if peer_id is not None:
+            for cached_kind in ([kind] if kind else ['channel', 'chat', 'user']):
+                if (cached_kind, peer_id) in self._peers:
+                    return self._with_peer(self._peers[(cached_kind, peer_id)])
+            query, params = f'SELECT {self.COLUMNS} FROM entity_cache WHERE peer_id = ?', [peer_id]
+            if kind:
+                query += ' AND type = ?'
+                params.append(kind)
+            row = self.db_manager.fetchone(query + " ORDER BY type = 'user'", params)
+        else:
+            name = str(key).strip()
+            username = name.rsplit('/', 1)[-1].lstrip('@')
+            row = self.db_manager.fetchone(
+                f'SELECT {self.COLUMNS} FROM entity_cache WHERE username = ? COLLATE NOCASE ORDER BY resolved_at DESC', (username,)
+            ) or self.db_manager.fetchone(
+                f'SELECT {self.COLUMNS} FROM entity_cache WHERE title = ? ORDER BY resolved_at DESC', (name,)
+            )
+
+        if row is None:
+            return None
+        record = dict(zip(('id', 'type', 'access_hash', 'username', 'title', 'resolved_at'), row))
+        self._peers[(record['type'], record['id'])] = record
+        return self._with_peer(record)
+
+    def resolve(self, key, kind=None):
+        """Look an entity up in the cache, resolving it over the network when missing or expired."""
+        record = self.lookup(key, kind)
+        if record and not self._expired(record):
+            return record
+        try:
+            entity = self.client.get_entity(self._network_key(key, record))
+        except (RPCError, ValueError):
+            if record:
+                return record
+            raise
+        return self._stored(entity)
+
+    async def resolve_async(self, key, kind=None, save=None):
+        """
+        resolve() for use inside coroutines running on the client's event loop.
+
+        save is a coroutine function called with the records of a newly resolved
+        entity instead of writing them from the event loop, so callers with a
+        writer thread can queue the write there.
+        """
+        record = self.lookup(key, kind)
+        if record and not self._expired(record):
+            return record
+        try:
+            entity = await self.client.get_entity(self._network_key(key, record))
+        except (RPCError, ValueError):
+            if record:
+                return record
+            raise
+        if save is None:
+            return self._stored(entity)
+        record = self._stored(entity, persist=False)
+        await save([record])
+        return record
+
+    def _stored(self, entity, persist=True):
+        record = self._record(entity)
+        if record is None:
+            raise ValueError(f"Cannot cache entity {entity!r}")
+        self.remember_many([entity], persist=persist)
+        return self._with_peer(record)
+
+    def input_peer(self, key, kind=None):
+        """InputPeer of a cached entity, or None if it is not cached."""
+        record = self.lookup(key, kind)
+        return record['input_peer'] if record else None
+
+    ### Helpers ###
+
+    def _expired(self, record):
+        return time.time() - record['resolved_at'] > self.ttl
+
+    @staticmethod
+    def _network_key(key, record):
+        # A stale record still tells Telegram exactly which entity to refresh
+        return record['input_peer'] if record else key
+
+    @staticmethod
+    def _parse_id(key):
+        """Return (ID, kind or None) for numeric keys, including marked -100... channel IDs; (None, None) otherwise."""
+        if isinstance(key, int) or (isinstance(key, str) and key.strip().lstrip('-').isdigit()):
+            value = int(key)
+            if value >= 0:
+                return value, None
+            peer_id, peer_type = utils.resolve_id(value)
+            return peer_id, 'chat' if peer_type.__name__ == 'PeerChat' else 'channel'
+        return None, None
+
+    @staticmethod
+    def _with_peer(record):
+        record = dict(record)
+        if record['type'] == 'user':
+            record['input_peer'] = InputPeerUser(record['id'], record['access_hash'])
+        elif record['type'] == 'channel':
+            record['input_peer'] = InputPeerChannel(record['id'], record['access_hash'])
+        else:
+            record['input_peer'] = InputPeerChat(record['id'])
+        return record
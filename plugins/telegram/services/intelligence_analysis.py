@@ -1,161 +1,80 @@
-from telethon.tl.functions.messages import GetHistoryRequest
-from telethon.tl.types import PeerChannel
-import sqlite3
-import networkx as nx
-import threading
-import re
-import time
-from telethon import events
+from plugins.telegram.services.social_graph import SocialGraph
 
 class IntelligenceAnalysis:
+    # Weighted interaction edges aggregated in SQL. Nodes are user IDs, or negated
+    # channel IDs for channels (and for anonymous channel posts, which have no sender).
+    SOCIAL_EDGES_QUERY = '''
+        WITH edges (source, target, posts, replies, forwards) AS (
+            SELECT user_id, -channel_id, COUNT(*), 0, 0
+            FROM messages
+            WHERE user_id IS NOT NULL
+            GROUP BY user_id, channel_id
+
+            UNION ALL
+
+            SELECT COALESCE(reply.user_id, -reply.channel_id), COALESCE(parent.user_id, -parent.channel_id), 0, COUNT(*), 0
+            FROM messages reply
+            JOIN messages parent ON parent.channel_id = reply.channel_id AND parent.message_id = reply.reply_to_message_id
+            WHERE reply.reply_to_message_id IS NOT NULL
+            GROUP BY 1, 2
+
+            UNION ALL
+
+            SELECT COALESCE(user_id, -channel_id), COALESCE(fwd_from_user_id, -fwd_from_channel_id), 0, 0, COUNT(*)
+            FROM messages
+            WHERE fwd_from_user_id IS NOT NULL OR fwd_from_channel_id IS NOT NULL
+            GROUP BY 1, 2
+        )
+        SELECT source, target, SUM(posts), SUM(replies), SUM(forwards)
+        FROM edges
+        WHERE source IS NOT NULL AND target IS NOT NULL AND source != target
+        GROUP BY source, target
+    '''
+
     def __init__(self, client, db_manager):
         self.client = client
         self.db_manager = db_manager
 
-    ### Real-Time Monitoring ###
-
-    def start_realtime_monitoring(self, channel_name):
-        """Monitor a specific channel in real-time and log all new messages."""
-        channel = self.client.get_entity(channel_name)
-        print(f"Starting real-time monitoring for channel: {channel.title}")
-        
-        def monitor():
-            while True:
-                history = self.client(GetHistoryRequest(
-                    peer=PeerChannel(channel.id),
-                    limit=1,
-                    offset_date=None,
-                    add_offset=0,
-                    max_id=0,
-                    min_id=0,
-                    hash=0
-                ))
-                
-                if history.messages:
-                    message = history.messages[0]
-                    self._log_message(message, channel.id)
-                    print(f"Real-time message in {channel.title}: {message.message}")
-
-                time.sleep(2)  # Polling interval
-
-        threading.Thread(target=monitor, daemon=True).start()
-
-    def start_realtime_monitoring_for_all_channels(self):
-        """Monitor all channels in real-time."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute("SELECT title FROM channels")
-        channels = cursor.fetchall()
-        conn.close()
-
-        for (channel_name,) in channels:
-            self.start_realtime_monitoring(channel_name)
-            
-    def start_realtime_monitoring_for_user(self, user_name):
-        """
-        Start real-time monitoring of messages for a specific user by username.
-        
-        Parameters:
-            user_name (str): The username of the user to monitor.
-        """
-        user = self.client.get_entity(user_name)
-        
-        print(f"Starting real-time monitoring for user: {user_name}")
-
-        @self.client.on(events.NewMessage(from_user=user))
-        async def handler(event):
-            message_data = {
-                'message_id': event.message.id,
-                'user_id': user.id,
-                'channel_id': event.chat_id if event.is_channel else None,
-                'date': event.message.date.strftime("%Y-%m-%d %H:%M:%S"),
-                'content': event.message.message
-            }
-
-            self.db_manager.save_message(message_data)
-            print(f"New message from {user_name}: {event.message.message}")
-
-        self.client.run_until_disconnected()
-
-    def _log_message(self, message, channel_id):
-        """Helper method to log a new message to the database."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT 1 FROM messages WHERE message_id = ?', (message.id,))
-        if cursor.fetchone() is None:
-            cursor.execute('''
-                INSERT INTO messages (message_id, channel_id, user_id, date, content)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (message.id, channel_id, message.from_id.user_id, message.date.strftime("%Y-%m-%d %H:%M:%S"), message.message))
-            conn.commit()
-        conn.close()
-
     ### Social Network Analysis ###
 
-    def build_social_graph(self):
-        """Build and analyze a social graph based on user interactions across messages."""
-        G = nx.DiGraph()  # Directed graph for social interactions
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
+    def build_social_graph(self, top=10):
+        """
+        Build and analyze a social graph of users and channels.
 
-        # Fetch all messages with users
-        cursor.execute('''
-            SELECT user_id, channel_id FROM messages
-        ''')
-        interactions = cursor.fetchall()
-        conn.close()
+        Edges are users posting in channels, users replying to each other and
+        messages forwarded from users or channels, each weighted by its number
+        of messages.
 
-        for user_id, channel_id in interactions:
-            G.add_node(user_id)
-            G.add_edge(user_id, channel_id)
+        Returns:
+            SocialGraph: The graph, with PageRank and communities computed.
+        """
+        edges = self.db_manager.execute(self.SOCIAL_EDGES_QUERY).fetchall()
+        graph = SocialGraph(edges, self._node_labels())
+        pagerank = graph.compute_pagerank()
+        communities = graph.compute_communities()
 
         print("Social Network Analysis:")
-        print("Number of Nodes (Users/Channels):", G.number_of_nodes())
-        print("Number of Edges (Interactions):", G.number_of_edges())
-
-        # Identify key influencers using centrality
-        centrality = nx.degree_centrality(G)
-        top_influencers = sorted(centrality.items(), key=lambda x: x[1], reverse=True)[:10]
-        print("Top 10 Influencers (User IDs):")
-        for influencer, score in top_influencers:
-            print(f"User ID: {influencer}, Influence Score: {score}")
-
-    ### Keyword Monitoring ###
-
-    def realtime_keyword_monitoring(self, keywords):
-        """Monitor all messages for specified keywords in real-time."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute("SELECT title FROM channels")
-        channels = cursor.fetchall()
-        conn.close()
-
-        def monitor_channel_keywords(channel_name):
-            channel = self.client.get_entity(channel_name)
-            print(f"Keyword monitoring started for channel: {channel.title}")
-
-            def monitor():
-                while True:
-                    history = self.client(GetHistoryRequest(
-                        peer=PeerChannel(channel.id),
-                        limit=1,
-                        offset_date=None,
-                        add_offset=0,
-                        max_id=0,
-                        min_id=0,
-                        hash=0
-                    ))
-
-                    if history.messages:
-                        message = history.messages[0]
-                        for keyword in keywords:
-                            if re.search(r'\b' + re.escape(keyword) + r'\b', message.message, re.IGNORECASE):
-                                print(f"Keyword '{keyword}' found in {channel.title}: {message.message}")
-                                self._log_message(message, channel.id)
-
-                    time.sleep(2)  # Polling interval
-
-            threading.Thread(target=monitor, daemon=True).start()
-
-        for (channel_name,) in channels:
-            monitor_channel_keywords(channel_name)
+        print("Number of Nodes (Users/Channels):", graph.number_of_nodes)
+        print("Number of Edges (Interactions):", graph.number_of_edges)
+        print("Number of Communities:", len(set(communities.tolist())))
+
+        print(f"Top {top} Influencers (Users):")
+        for node in graph.top_nodes(pagerank, top, channels=False):
+            print(f"User: {graph.label(node)} (ID: {graph.node_ids()[node]}), "
+                  f"Influence Score: {pagerank[node]:.6f}, Community: {communities[node]}")
+
+        print(f"Top {top} Channels:")
+        for node in graph.top_nodes(pagerank, top, channels=True):
+            print(f"Channel: {graph.label(node)} (ID: {graph.node_ids()[node]}), "
+                  f"Influence Score: {pagerank[node]:.6f}, Community: {communities[node]}")
+
+        return graph
+
+    def _node_labels(self):
+        labels = {}
+        for user_id, username, first_name, last_name in self.db_manager.execute(
+                'SELECT user_id, username, first_name, last_name FROM users'):
+            labels[user_id] = username or ' '.join(name for name in (first_name, last_name) if name) or None
+        for channel_id, title in self.db_manager.execute('SELECT channel_id, title FROM channels'):
+            labels[-channel_id] = title
+        return labels
@@ -1,58 +1,89 @@
 import sqlite3
-import re
 from collections import defaultdict
 
 class DataIndexer:
+    """
+    Ranked full-text search over collected messages, users, channels and
+    attachment names, backed by the FTS5 indexes maintained by DatabaseManager.
+
+    Queries use FTS5 syntax: plain terms are ANDed, "quoted text" matches a
+    phrase, term* matches a prefix, and OR / NOT combine terms. Input that is
+    not valid FTS5 syntax is searched as a list of literal terms instead.
+    """
+
+    ENTITY_TYPES = ('messages', 'users', 'channels', 'attachments')
+
+    SEARCH_QUERIES = {
+        'messages': '''
+            SELECT messages.message_id, messages.channel_id, messages.date,
+                   snippet(messages_fts, 0, '[', ']', '...', 16)
+            FROM messages_fts
+            JOIN messages ON messages.id = messages_fts.rowid
+            WHERE messages_fts MATCH ?
+            ORDER BY messages_fts.rank
+            LIMIT ? OFFSET ?
+        ''',
+        'users': '''
+            SELECT users.user_id, users.username, users.first_name, users.last_name
+            FROM users_fts
+            JOIN users ON users.id = users_fts.rowid
+            WHERE users_fts MATCH ?
+            ORDER BY users_fts.rank
+            LIMIT ? OFFSET ?
+        ''',
+        'channels': '''
+            SELECT channels.channel_id, channels.title, channels.username
+            FROM channels_fts
+            JOIN channels ON channels.id = channels_fts.rowid
+            WHERE channels_fts MATCH ?
+            ORDER BY channels_fts.rank
+            LIMIT ? OFFSET ?
+        ''',
+        'attachments': '''
+            SELECT attachments.message_id, attachments.file_name, attachments.file_path
+            FROM attachments_fts
+            JOIN attachments ON attachments.id = attachments_fts.rowid
+            WHERE attachments_fts MATCH ?
+            ORDER BY attachments_fts.rank
+            LIMIT ? OFFSET ?
+        ''',
+    }
+
     def __init__(self, db_manager):
         self.db_manager = db_manager
 
     def index_all_data(self):
-        """Index messages, users, channels, and attachments for fast searching."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT message_id, content FROM messages')
-        messages = cursor.fetchall()
-        cursor.execute('SELECT user_id, username FROM users')
-        users = cursor.fetchall()
-        cursor.execute('SELECT channel_id, title FROM channels')
-        channels = cursor.fetchall()
-        cursor.execute('SELECT message_id, file_name FROM attachments')
-        attachments = cursor.fetchall()
-        conn.close()
-
-        self.message_index = {msg_id: content for msg_id, content in messages}
-        self.user_index = {user_id: username for user_id, username in users}
-        self.channel_index = {chan_id: title for chan_id, title in channels}
-        self.attachment_index = {msg_id: file_name for msg_id, file_name in attachments}
-
-    def search(self, query):
-        """
-        Perform a search on indexed data for the query.
-        Returns a dictionary of matches across all entities.
+        """Rebuild the full-text indexes for messages, users, channels, and attachments."""
+        self.db_manager.rebuild_search_indexes()
+
+    def search(self, query, limit=20, page=1, entity_types=None):
         """
-        results = defaultdict(list)
+        Perform a ranked search on indexed data for the query.
 
-        for msg_id, content in self.message_index.items():
-            if re.search(r'\b' + re.escape(query) + r'\b', content, re.IGNORECASE):
-                results['messages'].append((msg_id, content))
+        Parameters:
+            query (str): FTS5 query (terms, "phrases", prefix*, OR / NOT).
+            limit (int): Maximum results per entity type.
+            page (int): 1-based page of results per entity type.
+            entity_types (list[str]): Restrict the search to these entity types.
 
-        for user_id, username in self.user_index.items():
-            if re.search(r'\b' + re.escape(query) + r'\b', username, re.IGNORECASE):
-                results['users'].append((user_id, username))
+        Returns a dictionary of matches across all entities, best matches first.
+        """
+        results = defaultdict(list)
+        offset = (max(page, 1) - 1) * limit
 
-        for chan_id, title in self.channel_index.items():
-            if re.search(r'\b' + re.escape(query) + r'\b', title, re.IGNORECASE):
-                results['channels'].append((chan_id, title))
+        for entity_type in entity_types or self.ENTITY_TYPES:
+            results[entity_type] = self._match(self.SEARCH_QUERIES[entity_type], query, limit, offset)
 
-        for msg_id, file_name in self.attachment_index.items():
-            if re.search(r'\b' + re.escape(query) + r'\b', file_name, re.IGNORECASE):
-                results['attachments'].append((msg_id, file_name))
+        return results
 
-        print("Search Results for:", query)
-        for entity, matches in results.items():
-            print(f"{entity.capitalize()} Matches:")
-            for match in matches:
-                print(match)
+    def _match(self, sql, query, limit, offset):
+        try:
+            return self.db_manager.fetchall(sql, (query, limit, offset))
+        except sqlite3.OperationalError:
+            return self.db_manager.fetchall(sql, (self._literal_query(query), limit, offset))
 
-        return results
+    @staticmethod
+    def _literal_query(query):
+        """Quote every whitespace-separated term so FTS5 operators and punctuation are matched literally."""
+        terms = query.split()
+        return ' '.join('"' + term.replace('"', '""') + '"' for term in terms) or '""'
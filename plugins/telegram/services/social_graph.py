@@ -0,0 +1,223 @@
+import os
+from xml.sax.saxutils import escape, quoteattr
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import scipy.sparse as sp
+
+class SocialGraph:
+    """
+    Weighted, directed interaction graph of users and channels held as sparse
+    arrays, so graphs with millions of nodes fit in memory and analyse in seconds.
+
+    Nodes are encoded as integers the way the edge query produces them: user IDs
+    as-is and channel IDs negated. Every (source, target) pair carries the number
+    of messages posted (user -> channel), replies and forwards between them.
+    """
+
+    EDGE_KINDS = ('posts', 'replies', 'forwards')
+
+    def __init__(self, edges, labels=None):
+        """
+        Parameters:
+            edges (list[tuple]): (source, target, posts, replies, forwards) rows.
+            labels (dict): Optional encoded node -> display label (username, title).
+        """
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2 + len(self.EDGE_KINDS))
+        self.nodes, index = np.unique(edges[:, :2], return_inverse=True)
+        index = index.reshape(-1, 2)
+
+        self.sources = index[:, 0]
+        self.targets = index[:, 1]
+        self.kind_weights = {kind: edges[:, 2 + i] for i, kind in enumerate(self.EDGE_KINDS)}
+        self.weights = edges[:, 2:].sum(axis=1).astype(np.float64)
+        self.labels = labels or {}
+
+        n = len(self.nodes)
+        self.adjacency = sp.csr_matrix((self.weights, (self.sources, self.targets)), shape=(n, n))
+
+        self.pagerank = None
+        self.communities = None
+
+    @property
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def number_of_edges(self):
+        return len(self.weights)
+
+    def is_channel(self):
+        """Boolean mask of channel nodes."""
+        return self.nodes < 0
+
+    def node_ids(self):
+        """Telegram ID of every node (channel IDs un-negated)."""
+        return np.abs(self.nodes)
+
+    def label(self, node_index):
+        node = int(self.nodes[node_index])
+        return self.labels.get(node) or str(abs(node))
+
+    ### Analysis ###
+
+    def in_degree(self):
+        """Weighted in-degree (interactions received) of every node."""
+        return np.asarray(self.adjacency.sum(axis=0)).ravel()
+
+    def out_degree(self):
+        """Weighted out-degree (interactions made) of every node."""
+        return np.asarray(self.adjacency.sum(axis=1)).ravel()
+
+    def compute_pagerank(self, damping=0.85, max_iterations=100, tolerance=1e-9):
+        """Weighted PageRank by power iteration on the sparse transition matrix."""
+        n = self.number_of_nodes
+        if not n:
+            self.pagerank = np.zeros(0)
+            return self.pagerank
+
+        out_degree = self.out_degree()
+        dangling = out_degree == 0
+        inverse = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+        transition = (sp.diags(inverse) @ self.adjacency).T.tocsr()
+
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iterations):
+            updated = damping * (transition @ rank + rank[dangling].sum() / n) + (1 - damping) / n
+            converged = np.abs(updated - rank).sum() < tolerance * n
+            rank = updated
+            if converged:
+                break
+
+        self.pagerank = rank
+        return rank
+
+    def compute_communities(self, max_iterations=30, tolerance=0.001, seed=0):
+        """
+        Detect communities by weighted label propagation on the undirected graph.
+
+        Each iteration is vectorised over all edges: the weight every node
+        receives per neighbouring label is summed by building a sparse
+        (node x label) matrix, and every node takes its heaviest label. A random
+        half of the nodes adopt it each round, which avoids the oscillation of
+        fully synchronous propagation. Stops once fewer than `tolerance` of the
+        nodes would still change.
+
+        Returns:
+            numpy.ndarray: Community number of every node, largest community first.
+        """
+        n = self.number_of_nodes
+        symmetric = (self.adjacency + self.adjacency.T).tocoo()
+        rows, cols, weights = symmetric.row, symmetric.col, symmetric.data
+        row_starts = np.flatnonzero(np.diff(np.r_[-1, rows]))   # rows are sorted: coo from csr
+        nodes = rows[row_starts]
+        rng = np.random.default_rng(seed)
+        labels = np.arange(n)
+
+        for _ in range(max_iterations):
+            if not len(rows):
+                break
+            label_weights = sp.csr_matrix((weights, (rows, labels[cols])), shape=(n, n))
+            data, indices, indptr = label_weights.data, label_weights.indices, label_weights.indptr
+
+            # Heaviest label per node (the lowest label on ties)
+            row_lengths = np.diff(indptr)
+            row_max = np.maximum.reduceat(data, indptr[nodes])
+            heaviest = np.flatnonzero(data == np.repeat(row_max, row_lengths[nodes]))
+            heaviest_rows = np.repeat(np.arange(n), row_lengths)[heaviest]
+            first = np.flatnonzero(np.diff(np.r_[-1, heaviest_rows]))
+            best = labels.copy()
+            best[heaviest_rows[first]] = indices[heaviest[first]]
+
+            changing = best != labels
+            if changing.sum() <= tolerance * n:
+                break
+            update = changing & (rng.random(n) < 0.5)
+            labels[update] = best[update]
+
+        _, communities, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+        rank_by_size = np.empty_like(sizes)
+        rank_by_size[np.argsort(-sizes, kind='stable')] = np.arange(len(sizes))
+        self.communities = rank_by_size[communities]
+        return self.communities
+
+    def top_nodes(self, scores, count=10, channels=None):
+        """Indices of the highest scoring nodes, optionally only channels (True) or users (False)."""
+        candidates = np.arange(self.number_of_nodes)
+        if channels is not None:
+            candidates = candidates[self.is_channel() == channels]
+        return candidates[np.argsort(-scores[candidates], kind='stable')[:count]]
+
+    ### Export ###
+
+    def write(self, export_path):
+        """Export to GraphML, or to a Parquet edge list when the path ends in .parquet."""
+        directory = os.path.dirname(export_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if export_path.endswith('.parquet'):
+            self.write_parquet(export_path)
+        else:
+            self.write_graphml(export_path)
+
+    def write_parquet(self, export_path):
+        """Write the edge list to Parquet, and the node table next to it as <name>.nodes.parquet."""
+        pq.write_table(pa.table({
+            'source': self.nodes[self.sources],
+            'target': self.nodes[self.targets],
+            'weight': self.weights,
+            **self.kind_weights,
+        }), export_path)
+
+        pq.write_table(pa.table(self._node_columns()), export_path[:-len('.parquet')] + '.nodes.parquet')
+
+    def write_graphml(self, export_path):
+        """Stream the graph to GraphML without building an in-memory XML tree or networkx graph."""
+        columns = self._node_columns()
+        node_keys = [('type', 'string'), ('telegram_id', 'long'), ('label', 'string'),
+                     ('in_degree', 'double'), ('out_degree', 'double')]
+        if self.pagerank is not None:
+            node_keys.append(('pagerank', 'double'))
+        if self.communities is not None:
+            node_keys.append(('community', 'int'))
+        edge_keys = [('weight', 'double')] + [(kind, 'long') for kind in self.EDGE_KINDS]
+
+        with open(export_path, 'w', encoding='utf-8') as file:
+            file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            file.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+            for name, kind in node_keys:
+                file.write(f'  <key id="{name}" for="node" attr.name="{name}" attr.type="{kind}"/>\n')
+            for name, kind in edge_keys:
+                file.write(f'  <key id="{name}" for="edge" attr.name="{name}" attr.type="{kind}"/>\n')
+            file.write('  <graph edgedefault="directed">\n')
+
+            for i, node in enumerate(self.nodes):
+                file.write(f'    <node id="{node}">')
+                for name, _ in node_keys:
+                    file.write(f'<data key="{name}">{escape(str(columns[name][i]))}</data>')
+                file.write('</node>\n')
+
+            for source, target, weight, *kinds in zip(self.nodes[self.sources], self.nodes[self.targets], self.weights,
+                                                      *self.kind_weights.values()):
+                file.write(f'    <edge source="{source}" target="{target}"><data key="weight">{weight}</data>')
+                for kind, value in zip(self.EDGE_KINDS, kinds):
+                    if value:
+                        file.write(f'<data key={quoteattr(kind)}>{value}</data>')
+                file.write('</edge>\n')
+
+            file.write('  </graph>\n</graphml>\n')
+
+    def _node_columns(self):
+        columns = {
+            'node': self.nodes,
+            'type': np.where(self.is_channel(), 'channel', 'user'),
+            'telegram_id': self.node_ids(),
+            'label': [self.label(i) for i in range(self.number_of_nodes)],
+            'in_degree': self.in_degree(),
+            'out_degree': self.out_degree(),
+        }
+        if self.pagerank is not None:
+            columns['pagerank'] = self.pagerank
+        if self.communities is not None:
+            columns['community'] = self.communities
+        return columns
@@ -1,15 +1,151 @@
 import sqlite3
+import threading
+from contextlib import contextmanager
 
 class DatabaseManager:
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-65536",      # 64 MiB page cache
+        "PRAGMA mmap_size=268435456",    # 256 MiB memory-mapped I/O
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA foreign_keys=ON",
+        "PRAGMA recursive_triggers=ON",  # INSERT OR REPLACE must fire delete triggers to keep FTS in sync
+    )
+
+    # Full-text indexes kept in sync with their source tables by triggers:
+    # index name -> (source table, indexed columns)
+    SEARCH_INDEXES = {
+        'messages_fts': ('messages', ('content',)),
+        'users_fts': ('users', ('username', 'first_name', 'last_name')),
+        'channels_fts': ('channels', ('title', 'username')),
+        'attachments_fts': ('attachments', ('file_name',)),
+    }
+
+    # Message-count rollups kept current by triggers:
+    # table name -> (bucket column, length of the "YYYY-MM-DD HH:MM:SS" date prefix forming the bucket)
+    ACTIVITY_ROLLUPS = {
+        'activity_hourly': ('hour', 13),
+        'activity_daily': ('day', 10),
+    }
+
+    # Optional message and attachment columns, filled in for dicts that do not carry them
+    MESSAGE_RELATIONS = {'reply_to_message_id': None, 'fwd_from_user_id': None, 'fwd_from_channel_id': None}
+    ATTACHMENT_BLOB = {'mime_type': None, 'size': None, 'document_id': None, 'sha256': None, 'channel_id': None}
+
     def __init__(self, db_name='telegram_database.db'):
         self.db_name = db_name
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.query_log = None  # set to a list to record every read query (used by tests/test_query_plans.py)
         self._initialize_database()
 
-    def _initialize_database(self):
-        """ Initialize the database and create tables if they do not exist """
-        conn = sqlite3.connect(self.db_name)
+    ### Connection Handling ###
+
+    def get_connection(self):
+        """
+        Return the persistent connection owned by the calling thread.
+
+        Connections are opened lazily, one per thread, in autocommit mode so that
+        transaction boundaries are controlled explicitly through transaction().
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_name, isolation_level=None)
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Context-managed write transaction on the calling thread's connection.
+
+        Yields a cursor. The outermost block commits on success and rolls back on
+        error; nested blocks join the enclosing transaction.
+        """
+        conn = self.get_connection()
         cursor = conn.cursor()
+        if self._local.depth == 0:
+            cursor.execute("BEGIN IMMEDIATE")
+        self._local.depth += 1
+        try:
+            yield cursor
+        except BaseException:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.rollback()
+            raise
+        else:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.commit()
+        finally:
+            cursor.close()
+
+    def execute(self, query, params=()):
+        """Execute a read query and return the cursor for iteration."""
+        if self.query_log is not None:
+            self.query_log.append((query, params))
+        return self.get_connection().execute(query, params)
+
+    def explain(self, query, params=()):
+        """Return the EXPLAIN QUERY PLAN detail lines for a query."""
+        return [row[3] for row in self.get_connection().execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+    def fetchall(self, query, params=()):
+        """Execute a read query and return all rows."""
+        return self.execute(query, params).fetchall()
+
+    def fetchone(self, query, params=()):
+        """Execute a read query and return the first row, or None."""
+        return self.execute(query, params).fetchone()
 
+    def close(self):
+        """Close every connection opened by this manager."""
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.execute("PRAGMA optimize")
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    # Connection belongs to another thread that already closed it
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+    ### Schema ###
+
+    def _initialize_database(self):
+        """
+        Bring the database schema up to date.
+
+        The applied schema version is stored in PRAGMA user_version; each pending
+        migration runs in its own transaction and bumps the version on success.
+        Migrations are idempotent, so databases created before versioning was
+        introduced (user_version 0) are upgraded safely.
+        """
+        version = self.fetchone("PRAGMA user_version")[0]
+        for target, migration in self.MIGRATIONS:
+            if target <= version:
+                continue
+            with self.transaction() as cursor:
+                getattr(self, migration)(cursor)
+                cursor.execute(f"PRAGMA user_version = {int(target)}")
+            version = target
+
+    def schema_version(self):
+        """Return the schema version the database has been migrated to."""
+        return self.fetchone("PRAGMA user_version")[0]
+
+    def _migrate_base_schema(self, cursor):
+        """Version 1: core tables."""
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS channels (
                 id INTEGER PRIMARY KEY,
@@ -64,8 +200,291 @@ class DatabaseManager:
             )
         ''')
 
-        conn.commit()
-        conn.close()
+    def _migrate_unique_messages(self, cursor):
+        """
+        Version 2: enforce one row per (channel_id, message_id).
+
+        Databases created before the constraint existed may hold duplicates from
+        earlier probe-then-insert collection, so those are dropped (keeping the
+        first copy) before the unique index is built.
+        """
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_messages_channel_message'"
+        )
+        if cursor.fetchone():
+            return
+
+        cursor.execute('''
+            DELETE FROM messages
+            WHERE id NOT IN (SELECT MIN(id) FROM messages GROUP BY channel_id, message_id)
+        ''')
+        cursor.execute('''
+            CREATE UNIQUE INDEX idx_messages_channel_message ON messages (channel_id, message_id)
+        ''')
+
+    def _migrate_collection_checkpoints(self, cursor):
+        """Version 3: per-channel collection checkpoints."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS collection_checkpoints (
+                channel_id INTEGER PRIMARY KEY,
+                max_message_id INTEGER,      -- newest message stored (high-water mark)
+                min_message_id INTEGER,      -- oldest message stored (backfill position)
+                backfill_complete INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT
+            )
+        ''')
+
+    def _migrate_search_indexes(self, cursor):
+        """
+        Version 4: FTS5 external-content indexes and their sync triggers.
+
+        An index created on an already populated database is rebuilt from its
+        source table once; afterwards the triggers keep it current on every
+        insert, update and delete.
+        """
+        for index, (table, columns) in self.SEARCH_INDEXES.items():
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (index,))
+            exists = cursor.fetchone() is not None
+
+            column_list = ', '.join(columns)
+            new_values = ', '.join(f'new.{column}' for column in columns)
+            old_values = ', '.join(f'old.{column}' for column in columns)
+
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+                    {column_list}, content='{table}', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {index}(rowid, {column_list}) VALUES (new.id, {new_values});
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {index}({index}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {column_list} ON {table} BEGIN
+                    INSERT INTO {index}({index}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                    INSERT INTO {index}(rowid, {column_list}) VALUES (new.id, {new_values});
+                END
+            ''')
+
+            if not exists:
+                cursor.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+    def _migrate_query_indexes(self, cursor):
+        """Version 5: indexes backing the display, process and export queries."""
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_channel_date ON messages (channel_id, date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_user_channel ON messages (user_id, channel_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_message_id ON messages (message_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_attachments_message_id ON attachments (message_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_channels_channel ON user_channels (channel_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_channels_title ON channels (title)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_channels_username ON channels (username)")
+        cursor.execute("ANALYZE")
+
+    def _migrate_display_indexes(self, cursor):
+        """Version 6: indexes backing date-ordered, keyset-paginated message listings."""
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_date ON messages (date, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_user_date ON messages (user_id, date)")
+        cursor.execute("DROP INDEX IF EXISTS idx_user_channels_channel")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_channels_channel_user ON user_channels (channel_id, user_id)")
+        cursor.execute("ANALYZE")
+
+    def _migrate_message_relations(self, cursor):
+        """Version 7: reply and forward origins of messages, the interaction edges of the social graph."""
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(messages)")}
+        for column in ('reply_to_message_id', 'fwd_from_user_id', 'fwd_from_channel_id'):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE messages ADD COLUMN {column} INTEGER")
+
+        # Partial indexes: only replies and forwards are indexed, so they stay small
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_messages_reply_to ON messages (channel_id, reply_to_message_id, user_id)
+            WHERE reply_to_message_id IS NOT NULL
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_messages_forwards ON messages (fwd_from_user_id, fwd_from_channel_id, user_id, channel_id)
+            WHERE fwd_from_user_id IS NOT NULL OR fwd_from_channel_id IS NOT NULL
+        ''')
+
+    def _migrate_blob_store(self, cursor):
+        """Version 8: content-addressed attachment blobs, and the Telegram documents known to hold them."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                size INTEGER,
+                mime_type TEXT,
+                path TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS documents (
+                document_id INTEGER PRIMARY KEY,   -- Telegram document ID
+                sha256 TEXT NOT NULL REFERENCES blobs (sha256)
+            )
+        ''')
+
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(attachments)")}
+        for column, kind in (('document_id', 'INTEGER'), ('sha256', 'TEXT')):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE attachments ADD COLUMN {column} {kind}")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_attachments_sha256 ON attachments (sha256)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_attachments_message_file ON attachments (message_id, file_name)")
+
+    def _migrate_entity_cache(self, cursor):
+        """Version 9: resolved Telegram entities, so peers can be addressed without get_entity() calls."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS entity_cache (
+                peer_id INTEGER NOT NULL,
+                type TEXT NOT NULL,          -- user, channel or chat
+                access_hash INTEGER,
+                username TEXT,
+                title TEXT,
+                resolved_at REAL NOT NULL,
+                PRIMARY KEY (peer_id, type)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_entity_cache_username ON entity_cache (username COLLATE NOCASE)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_entity_cache_title ON entity_cache (title)")
+
+    def _migrate_user_checkpoints(self, cursor):
+        """Version 10: per-(user, channel) checkpoints of user-focused message collection."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_collection_checkpoints (
+                user_id INTEGER NOT NULL,
+                channel_id INTEGER NOT NULL,
+                max_message_id INTEGER,      -- newest message of the user stored
+                min_message_id INTEGER,      -- oldest message of the user stored
+                backfill_complete INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT,
+                PRIMARY KEY (user_id, channel_id)
+            )
+        ''')
+
+    def _migrate_alerts(self, cursor):
+        """Version 11: keyword alerts raised by real-time monitoring."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY,
+                keyword TEXT NOT NULL,
+                channel_id INTEGER,
+                message_id INTEGER,
+                user_id INTEGER,
+                date TEXT,              -- message date
+                content TEXT,
+                matched_at TEXT NOT NULL,
+                UNIQUE(channel_id, message_id, keyword)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_keyword_date ON alerts (keyword, date)")
+
+    def _migrate_activity_rollups(self, cursor):
+        """
+        Version 12: hourly and daily message counts per channel and user.
+
+        Triggers on messages keep the rollups current within the same transaction
+        as every insert, update and delete, so the batched writers update them
+        incrementally. Messages without a date or channel are not counted, and
+        messages without a known sender are counted under user_id 0.
+        """
+        for table, (bucket, length) in self.ACTIVITY_ROLLUPS.items():
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+            exists = cursor.fetchone() is not None
+
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    channel_id INTEGER NOT NULL,
+                    {bucket} TEXT NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    message_count INTEGER NOT NULL,
+                    PRIMARY KEY (channel_id, {bucket}, user_id)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_user ON {table} (user_id, {bucket})")
+
+            add_new = f'''
+                INSERT INTO {table} (channel_id, {bucket}, user_id, message_count)
+                SELECT new.channel_id, substr(new.date, 1, {length}), COALESCE(new.user_id, 0), 1
+                WHERE new.date IS NOT NULL AND new.channel_id IS NOT NULL
+                ON CONFLICT (channel_id, {bucket}, user_id) DO UPDATE SET message_count = message_count + 1;
+            '''
+            remove_old = f'''
+                UPDATE {table} SET message_count = message_count - 1
+                WHERE channel_id = old.channel_id AND {bucket} = substr(old.date, 1, {length})
+                  AND user_id = COALESCE(old.user_id, 0);
+                DELETE FROM {table}
+                WHERE channel_id = old.channel_id AND {bucket} = substr(old.date, 1, {length})
+                  AND user_id = COALESCE(old.user_id, 0) AND message_count <= 0;
+            '''
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON messages BEGIN {add_new} END")
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON messages BEGIN {remove_old} END")
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF channel_id, user_id, date ON messages
+                BEGIN {remove_old} {add_new} END
+            ''')
+
+            if not exists:
+                cursor.execute(f'''
+                    INSERT INTO {table} (channel_id, {bucket}, user_id, message_count)
+                    SELECT channel_id, substr(date, 1, {length}), COALESCE(user_id, 0), COUNT(*)
+                    FROM messages
+                    WHERE date IS NOT NULL AND channel_id IS NOT NULL
+                    GROUP BY 1, 2, 3
+                ''')
+
+    def _migrate_attachment_channels(self, cursor):
+        """
+        Version 13: record the channel of every attachment.
+
+        Message IDs are only unique within a channel, so attachments are tied to
+        their message by (channel_id, message_id). Existing rows get the channel
+        of their message where only one channel has that message ID; ambiguous
+        rows are left without a channel rather than guessed.
+        """
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(attachments)")}
+        if 'channel_id' not in columns:
+            cursor.execute("ALTER TABLE attachments ADD COLUMN channel_id INTEGER")
+        cursor.execute('''
+            UPDATE attachments SET channel_id = (
+                SELECT MIN(channel_id) FROM messages WHERE messages.message_id = attachments.message_id
+            )
+            WHERE channel_id IS NULL
+              AND (SELECT COUNT(DISTINCT channel_id) FROM messages WHERE messages.message_id = attachments.message_id) = 1
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_attachments_message_document
+            ON attachments (channel_id, message_id, document_id)
+        ''')
+
+    MIGRATIONS = (
+        (1, '_migrate_base_schema'),
+        (2, '_migrate_unique_messages'),
+        (3, '_migrate_collection_checkpoints'),
+        (4, '_migrate_search_indexes'),
+        (5, '_migrate_query_indexes'),
+        (6, '_migrate_display_indexes'),
+        (7, '_migrate_message_relations'),
+        (8, '_migrate_blob_store'),
+        (9, '_migrate_entity_cache'),
+        (10, '_migrate_user_checkpoints'),
+        (11, '_migrate_alerts'),
+        (12, '_migrate_activity_rollups'),
+        (13, '_migrate_attachment_channels'),
+    )
+
+    def rebuild_search_indexes(self):
+        """Rebuild every full-text index from its source table and merge its segments."""
+        with self.transaction() as cursor:
+            for index in self.SEARCH_INDEXES:
+                cursor.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+                cursor.execute(f"INSERT INTO {index}({index}) VALUES ('optimize')")
+
+    ### Writes ###
 
     def save_user(self, user_data, channel_id):
         """
@@ -75,48 +494,230 @@ class DatabaseManager:
             user_data (dict): Dictionary containing user details (user_id, username, first_name, last_name).
             channel_id (int): The ID of the channel the user belongs to.
         """
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT OR IGNORE INTO users (user_id, username, first_name, last_name)
-            VALUES (:user_id, :username, :first_name, :last_name)
-        ''', user_data)
+        with self.transaction():
+            self.save_users([user_data])
+            self.save_user_channels([user_data['user_id']], channel_id)
 
-        cursor.execute('''
-            INSERT OR IGNORE INTO user_channels (user_id, channel_id)
-            VALUES (?, ?)
-        ''', (user_data['user_id'], channel_id))
+    def save_users(self, users):
+        """
+        Insert or update a batch of users in a single statement.
 
-        conn.commit()
-        conn.close()
+        Known users only have their names updated when they changed, so
+        unchanged rows are not rewritten (nor re-indexed for search).
+        """
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO users (user_id, username, first_name, last_name)
+                VALUES (:user_id, :username, :first_name, :last_name)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    username = excluded.username,
+                    first_name = excluded.first_name,
+                    last_name = excluded.last_name
+                WHERE excluded.username IS NOT users.username
+                   OR excluded.first_name IS NOT users.first_name
+                   OR excluded.last_name IS NOT users.last_name
+            ''', users)
 
+    def save_user_channels(self, user_ids, channel_id):
+        """Associate a batch of users with a channel."""
+        with self.transaction() as cursor:
+            cursor.executemany(
+                'INSERT OR IGNORE INTO user_channels (user_id, channel_id) VALUES (?, ?)',
+                [(user_id, channel_id) for user_id in user_ids]
+            )
 
     def save_message(self, message_data):
         """
         Save a message to the database.
 
         Parameters:
-            message_data (dict): Dictionary containing message details (message_id, user_id, channel_id, date, content).
+            message_data (dict): Dictionary containing message details (message_id, user_id, channel_id, date, content),
+                and optionally reply_to_message_id, fwd_from_user_id and fwd_from_channel_id.
         """
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        self.save_messages([message_data])
 
-        cursor.execute('''
-            INSERT INTO messages (message_id, user_id, channel_id, date, content)
-            VALUES (:message_id, :user_id, :channel_id, :date, :content)
-        ''', message_data)
+    def save_messages(self, messages):
+        """
+        Save a batch of messages in a single transaction.
 
-        conn.commit()
-        conn.close()
+        Messages already stored for the same channel are ignored.
+
+        Parameters:
+            messages (list[dict]): Message dictionaries as accepted by save_message.
+
+        Returns:
+            int: Number of newly inserted messages.
+        """
+        messages = [
+            message if 'reply_to_message_id' in message else {**self.MESSAGE_RELATIONS, **message}
+            for message in messages
+        ]
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT OR IGNORE INTO messages (message_id, user_id, channel_id, date, content,
+                                                reply_to_message_id, fwd_from_user_id, fwd_from_channel_id)
+                VALUES (:message_id, :user_id, :channel_id, :date, :content,
+                        :reply_to_message_id, :fwd_from_user_id, :fwd_from_channel_id)
+            ''', messages)
+            return cursor.rowcount
 
     def save_channel_info(self, channel_id, title, username, channel_type, member_count, date_created):
         """Save or update channel info with all relevant details."""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO channels (channel_id, title, username, type, member_count, date_created)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (channel_id, title, username, channel_type, member_count, date_created))
-        conn.commit()
-        conn.close()
\ No newline at end of file
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT OR REPLACE INTO channels (channel_id, title, username, type, member_count, date_created)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (channel_id, title, username, channel_type, member_count, date_created))
+
+    def save_attachment(self, message_id, file_name, file_type, file_path, mime_type=None, size=None,
+                        document_id=None, sha256=None, channel_id=None):
+        """Save an attachment record for a downloaded file."""
+        self.save_attachments([{
+            'channel_id': channel_id,
+            'message_id': message_id,
+            'file_name': file_name,
+            'file_type': file_type,
+            'file_path': file_path,
+            'mime_type': mime_type,
+            'size': size,
+            'document_id': document_id,
+            'sha256': sha256,
+        }])
+
+    def save_attachments(self, attachments):
+        """
+        Save a batch of attachment records in a single transaction.
+
+        Records carrying a sha256 also register their blob and, with a
+        document_id, map that Telegram document to the blob.
+        """
+        attachments = [{**self.ATTACHMENT_BLOB, **attachment} for attachment in attachments]
+        blobs = [attachment for attachment in attachments if attachment['sha256']]
+
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO attachments (channel_id, message_id, file_name, file_type, file_path, mime_type, size, document_id, sha256)
+                VALUES (:channel_id, :message_id, :file_name, :file_type, :file_path, :mime_type, :size, :document_id, :sha256)
+            ''', attachments)
+            if blobs:
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO blobs (sha256, size, mime_type, path)
+                    VALUES (:sha256, :size, :mime_type, :file_path)
+                ''', blobs)
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO documents (document_id, sha256)
+                    VALUES (:document_id, :sha256)
+                ''', [blob for blob in blobs if blob['document_id'] is not None])
+
+    def save_alerts(self, alerts):
+        """Insert keyword alerts, one per (channel, message, keyword); repeats are ignored."""
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT OR IGNORE INTO alerts (keyword, channel_id, message_id, user_id, date, content, matched_at)
+                VALUES (:keyword, :channel_id, :message_id, :user_id, :date, :content, :matched_at)
+            ''', alerts)
+
+    def get_document_blob(self, document_id):
+        """
+        Look up the stored blob of a Telegram document.
+
+        Returns:
+            tuple: (sha256, path, size) or None if the document was never downloaded.
+        """
+        return self.fetchone('''
+            SELECT blobs.sha256, blobs.path, blobs.size
+            FROM documents
+            JOIN blobs ON blobs.sha256 = documents.sha256
+            WHERE documents.document_id = ?
+        ''', (document_id,))
+
+    def save_entities(self, entities):
+        """Insert or refresh resolved entities (dicts with id, type, access_hash, username, title, resolved_at)."""
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO entity_cache (peer_id, type, access_hash, username, title, resolved_at)
+                VALUES (:id, :type, :access_hash, :username, :title, :resolved_at)
+                ON CONFLICT(peer_id, type) DO UPDATE SET
+                    access_hash = excluded.access_hash,
+                    username = excluded.username,
+                    title = excluded.title,
+                    resolved_at = excluded.resolved_at
+            ''', entities)
+
+    ### Collection Checkpoints ###
+
+    def get_checkpoint(self, channel_id):
+        """Return the collection checkpoint for a channel as a dict, or None if it was never collected."""
+        row = self.fetchone('''
+            SELECT max_message_id, min_message_id, backfill_complete, updated_at
+            FROM collection_checkpoints
+            WHERE channel_id = ?
+        ''', (channel_id,))
+        if row is None:
+            return None
+        max_message_id, min_message_id, backfill_complete, updated_at = row
+        return {
+            'max_message_id': max_message_id,
+            'min_message_id': min_message_id,
+            'backfill_complete': bool(backfill_complete),
+            'updated_at': updated_at,
+        }
+
+    def update_checkpoint(self, channel_id, max_message_id=None, min_message_id=None, backfill_complete=None):
+        """
+        Advance a channel's collection checkpoint.
+
+        The high-water mark only ever grows and the backfill position only ever
+        shrinks, so stale or out-of-order updates cannot move them backwards.
+        """
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO collection_checkpoints (channel_id, max_message_id, min_message_id, backfill_complete, updated_at)
+                VALUES (:channel_id, :max_message_id, :min_message_id, COALESCE(:backfill_complete, 0), datetime('now'))
+                ON CONFLICT(channel_id) DO UPDATE SET
+                    max_message_id = MAX(COALESCE(max_message_id, excluded.max_message_id), COALESCE(excluded.max_message_id, max_message_id)),
+                    min_message_id = MIN(COALESCE(min_message_id, excluded.min_message_id), COALESCE(excluded.min_message_id, min_message_id)),
+                    backfill_complete = COALESCE(:backfill_complete, backfill_complete),
+                    updated_at = excluded.updated_at
+            ''', {
+                'channel_id': channel_id,
+                'max_message_id': max_message_id,
+                'min_message_id': min_message_id,
+                'backfill_complete': None if backfill_complete is None else int(backfill_complete),
+            })
+
+    def get_user_checkpoint(self, user_id, channel_id):
+        """Return the checkpoint of a user's messages in a channel as a dict, or None if never collected."""
+        row = self.fetchone('''
+            SELECT max_message_id, min_message_id, backfill_complete, updated_at
+            FROM user_collection_checkpoints
+            WHERE user_id = ? AND channel_id = ?
+        ''', (user_id, channel_id))
+        if row is None:
+            return None
+        max_message_id, min_message_id, backfill_complete, updated_at = row
+        return {
+            'max_message_id': max_message_id,
+            'min_message_id': min_message_id,
+            'backfill_complete': bool(backfill_complete),
+            'updated_at': updated_at,
+        }
+
+    def update_user_checkpoint(self, user_id, channel_id, max_message_id=None, min_message_id=None, backfill_complete=None):
+        """Advance the checkpoint of a user's messages in a channel, with the same rules as update_checkpoint()."""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO user_collection_checkpoints (user_id, channel_id, max_message_id, min_message_id, backfill_complete, updated_at)
+                VALUES (:user_id, :channel_id, :max_message_id, :min_message_id, COALESCE(:backfill_complete, 0), datetime('now'))
+                ON CONFLICT(user_id, channel_id) DO UPDATE SET
+                    max_message_id = MAX(COALESCE(max_message_id, excluded.max_message_id), COALESCE(excluded.max_message_id, max_message_id)),
+                    min_message_id = MIN(COALESCE(min_message_id, excluded.min_message_id), COALESCE(excluded.min_message_id, min_message_id)),
+                    backfill_complete = COALESCE(:backfill_complete, backfill_complete),
+                    updated_at = excluded.updated_at
+            ''', {
+                'user_id': user_id,
+                'channel_id': channel_id,
+                'max_message_id': max_message_id,
+                'min_message_id': min_message_id,
+                'backfill_complete': None if backfill_complete is None else int(backfill_complete),
+            })
@@ -1,17 +1,20 @@
 import os
-import sqlite3
-import shutil
-import networkx as nx
 from plugins.telegram.services.telegram_client import TelegramClientManager
 from plugins.telegram.services.telegram_database import DatabaseManager
+from plugins.telegram.services.data.attachment_downloader import AttachmentDownloader
+from plugins.telegram.services.data.attachment_export import AttachmentExporter, AttachmentQuery
+from plugins.telegram.services.data.blob_store import BlobStore
 from plugins.telegram.services.data.data_collection import DataCollector
 from plugins.telegram.services.data.data_display import DataDisplay
 from plugins.telegram.services.data.data_processing import DataProcessor
+from plugins.telegram.services.data.parquet_export import ParquetExporter
+from plugins.telegram.services.entity_cache import EntityCache
 from plugins.telegram.services.intelligence_analysis import IntelligenceAnalysis
 from plugins.telegram.services.search_and_storage import DataIndexer
+from plugins.telegram.services.update_dispatcher import UpdateDispatcher
 
 class TelegramService:
-    ATTACHMENTS_DIR = "data/attachments"
+    ATTACHMENTS_DIR = BlobStore.DEFAULT_DIRECTORY
 
     def __init__(self, auth_service):
         self.auth_service = auth_service
@@ -19,11 +22,20 @@ class TelegramService:
         self.client = self.client_manager.get_client()
         self.db_manager = DatabaseManager()
 
-        self.data_collector = DataCollector(self.client, self.db_manager)
+        self.entity_cache = EntityCache(self.client, self.db_manager)
+
+        self.data_collector = DataCollector(self.client, self.db_manager, entity_cache=self.entity_cache)
         self.data_display = DataDisplay(self.db_manager)
         self.data_processor = DataProcessor(self.db_manager)
         self.intelligence_analysis = IntelligenceAnalysis(self.client, self.db_manager)
         self.data_indexer = DataIndexer(self.db_manager)
+        self.attachment_exporter = AttachmentExporter(self.db_manager)
+        self.parquet_exporter = ParquetExporter(self.db_manager)
+        self.update_dispatcher = UpdateDispatcher(self.client, self.db_manager, entity_cache=self.entity_cache)
+
+    def close(self):
+        """Release the database connections held by the service."""
+        self.db_manager.close()
 
     ### Collection and Data Retrieval ###
 
@@ -31,43 +43,70 @@ class TelegramService:
         """Collect all channels the user has access to."""
         self.data_collector.collect_all_channels()
 
-    def collect_all_participants_in_channel(self, channel_name):
+    def collect_all_participants_in_channel(self, channel_name, source='auto'):
         """Collect all users from a specific channel."""
-        self.data_collector.collect_active_users_in_channel(channel_name)
+        self.data_collector.collect_users_in_channel(channel_name, source)
 
     def collect_messages_in_channel(self, channel_name):
         """Collect all messages from a specific channel."""
         self.data_collector.collect_messages_in_channel(channel_name)
 
-    def collect_messages_from_user(self, user_id):
+    def collect_messages_from_user(self, user_id, concurrency=None):
         """Collect all messages from a specific user across all channels."""
-        self.data_collector.collect_messages_from_user(user_id)
+        self.data_collector.collect_messages_from_user(user_id, concurrency)
 
-    def collect_messages_from_multiple_channels(self, channel_names=None):
+    def collect_messages_from_multiple_channels(self, channel_names=None, concurrency=None):
         """
         Collect all messages from specified channels. 
         If channel_names is None, collects from all available channels.
         """
-        self.data_collector.collect_messages_from_multiple_channels(channel_names)
+        self.data_collector.collect_messages_from_multiple_channels(channel_names, concurrency)
+
+    def collect_all_messages(self, concurrency=None):
+        """Collect messages from every collected channel concurrently."""
+        self.data_collector.collect_messages_from_multiple_channels(None, concurrency)
+
+    def configure_attachments(self, workers=4, max_size=None, types=None):
+        """Set the number of download workers and the size/type filters for attachments."""
+        self.data_collector.configure_attachments(workers, max_size, types)
 
-    def collect_all_users(self):
+    def collect_all_users(self, concurrency=None, source='auto'):
         """Collect all users across all channels."""
-        self.data_collector.collect_all_users()
+        self.data_collector.collect_all_users(concurrency, source)
         print("Collected all users across all channels.")
         
     ### Real-time Monitoring ###
     
+    # The start_* methods only register subscriptions on the shared update
+    # dispatcher; run_realtime_monitoring() then serves all of them at once.
+
     def start_realtime_monitoring_for_user(self, user_name):
         """Start real-time monitoring of messages for user."""
-        self.intelligence_analysis.start_realtime_monitoring_for_user(user_name)
+        self.update_dispatcher.subscribe_user(user_name)
 
     def start_realtime_monitoring_for_channel(self, channel_name):
         """Start real-time monitoring of messages in a specific channel."""
-        self.intelligence_analysis.start_realtime_monitoring(channel_name)
+        self.update_dispatcher.subscribe_channel(channel_name)
 
     def start_realtime_monitoring_for_all_channels(self):
         """Start real-time monitoring of all available channels."""
-        self.intelligence_analysis.start_realtime_monitoring_for_all_channels()
+        self.update_dispatcher.subscribe_all_channels()
+
+    def start_keyword_monitoring(self, keywords):
+        """Start real-time monitoring of all incoming messages for keywords."""
+        self.update_dispatcher.subscribe_keywords(keywords)
+
+    def start_keyword_file_monitoring(self, path):
+        """Start real-time monitoring for the keywords in a file, reloaded whenever it changes."""
+        self.update_dispatcher.subscribe_keywords_file(path)
+
+    def set_alert_output(self, path):
+        """Append keyword alerts to a JSONL file as well as the alerts table."""
+        self.update_dispatcher.set_alert_output(path)
+
+    def run_realtime_monitoring(self):
+        """Process updates for every registered subscription until disconnected."""
+        self.update_dispatcher.run()
 
     ### Display Collected Data ###
 
@@ -75,13 +114,13 @@ class TelegramService:
         """Display all collected channels."""
         return self.data_display.display_channels()
 
-    def display_messages_from_user(self, user_id):
+    def display_messages_from_user(self, user_id, **options):
         """Display all messages collected from a specific user."""
-        return self.data_display.display_messages_from_user(user_id)
+        return self.data_display.display_messages_from_user(user_id, **options)
 
-    def display_messages_in_channel(self, channel_name):
+    def display_messages_in_channel(self, channel_name, **options):
         """Display all messages in a specified channel."""
-        return self.data_display.display_messages_in_channel(channel_name)
+        return self.data_display.display_messages_in_channel(channel_name, **options)
 
     def display_latest_messages_in_channel(self, channel_name, limit=10):
         """Display the latest messages in a specific channel."""
@@ -93,202 +132,140 @@ class TelegramService:
         """Analyze user activity levels in a specified channel."""
         return self.data_processor.analyze_user_activity(channel_name)
 
+    def activity_timeline(self, channel_name=None, user_id=None, bucket='day', since=None, until=None):
+        """Messages per hour, day, month or year, from the activity rollups."""
+        return self.data_processor.activity_timeline(channel_name, user_id, bucket, since, until)
+
+    def top_posters(self, channel_name=None, limit=10, since=None, until=None):
+        """The users posting the most messages, from the activity rollups."""
+        return self.data_processor.top_posters(channel_name, limit, since, until)
+
+    def posting_heatmap(self, channel_name=None, user_id=None, since=None, until=None):
+        """Messages per weekday and hour of day, from the activity rollups."""
+        return self.data_processor.posting_heatmap(channel_name, user_id, since, until)
+
     def keyword_analysis_in_channel(self, keywords, channel_name):
         """Analyze messages in a specific channel for specified keywords."""
         return self.data_processor.keyword_analysis_in_channel(keywords, channel_name)
 
+    def analyze_keywords(self, keywords, channel_name=None, bucket='day'):
+        """Count keyword mentions per keyword, user, channel and time bucket in a single pass."""
+        return self.data_processor.analyze_keywords(keywords, channel_name, bucket)
+
+    def get_usernames(self, user_ids):
+        """Resolve user IDs to usernames."""
+        return self.data_processor.get_usernames(user_ids)
+
     ### Intelligence and Surveillance ###
 
     def build_social_network_graph(self, export_path=None):
         """Build a social network graph for all users and interactions and optionally export it."""
-        G = self.intelligence_analysis.build_social_graph()
+        graph = self.intelligence_analysis.build_social_graph()
 
         if export_path:
-            # Save the graph in GraphML format for visualization in tools like Gephi
-            nx.write_graphml(G, export_path)
+            # GraphML for visualization in tools like Gephi, or Parquet edge lists for analysis at scale
+            graph.write(export_path)
             print(f"Social network graph exported to {export_path}")
 
-        return G
+        return graph
 
     ### Advanced Search ###
 
-    def search_collected_data(self, query):
-        """Search for a keyword across all collected entities (channels, users, messages)."""
-        return self.data_indexer.search(query)
-
-    ### Updated Attachment Saving with Directory Structure ###
-
-    def save_attachment(self, message, file_type, user_id, channel_id):
-        """Download and save the attachment to a structured directory based on channel and user."""
-        file_path = self.client.download_media(message, file=self._get_attachment_path(channel_id, user_id, file_type))
-        if file_path:
-            file_name = os.path.basename(file_path)
-
-            # Store file path in the database
-            conn = sqlite3.connect(self.db_manager.db_name)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO attachments (message_id, file_name, file_type, file_path)
-                VALUES (?, ?, ?, ?)
-            ''', (message.id, file_name, file_type, file_path))
-            conn.commit()
-            conn.close()
-            print(f"Saved {file_type} to {file_path}")
-
-    def _get_attachment_path(self, channel_id, user_id, file_type):
-        """Create and return the directory path for storing attachments based on channel, user, and type."""
-        channel_dir = os.path.join(self.ATTACHMENTS_DIR, f"channel_{channel_id}")
-        user_dir = os.path.join(channel_dir, f"user_{user_id}")
-        type_dir = os.path.join(user_dir, file_type + "s")
-
-        os.makedirs(type_dir, exist_ok=True)  # Ensure the directories exist
-        return type_dir
+    def search_collected_data(self, query, limit=20, page=1, entity_types=None):
+        """Search for a keyword across all collected entities (channels, users, messages, attachments)."""
+        return self.data_indexer.search(query, limit=limit, page=page, entity_types=entity_types)
+
+    def rebuild_search_index(self):
+        """Rebuild the full-text search index from the collected data."""
+        self.data_indexer.index_all_data()
+
+    ### Attachment Saving ###
+
+    def save_attachment(self, message, file_type=None, user_id=None, channel_id=None):
+        """
+        Download the attachment of a message into the content-addressed blob store and record it.
+
+        A document that was downloaded before is not downloaded again.
+        """
+        downloader = AttachmentDownloader(self.client, self.db_manager, self.ATTACHMENTS_DIR)
+        records = self.client.loop.run_until_complete(downloader.download(message))
+        for record in records:
+            if file_type:
+                record['file_type'] = file_type
+            self.db_manager.save_attachments([record])
+            print(f"Saved {record['file_type']} to {record['file_path']}")
 
     ### Attachment Retrieval and Display Methods ###
 
     def get_all_attachments(self):
         """Retrieve all attachment paths."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute("SELECT file_path, file_name, file_type FROM attachments")
-        attachments = cursor.fetchall()
-        conn.close()
-        return attachments
+        return self.attachment_exporter.fetch(AttachmentQuery())
 
     def get_attachments_by_type(self, attachment_type):
         """Retrieve attachment paths of a specific type."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute("SELECT file_path, file_name, file_type FROM attachments WHERE file_type = ?", (attachment_type,))
-        attachments = cursor.fetchall()
-        conn.close()
-        return attachments
+        return self.attachment_exporter.fetch(AttachmentQuery(attachment_type=attachment_type))
 
     def get_attachments_by_channel(self, channel_id):
         """Retrieve all attachments from a specific channel."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT attachments.file_path, attachments.file_name, attachments.file_type
-            FROM attachments
-            JOIN messages ON attachments.message_id = messages.message_id
-            WHERE messages.channel_id = ?
-        ''', (channel_id,))
-        attachments = cursor.fetchall()
-        conn.close()
-        return attachments
+        return self.attachment_exporter.fetch(AttachmentQuery(channel_id=channel_id))
 
     def get_attachments_by_user(self, user_id):
         """Retrieve all attachments sent by a specific user across all channels."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT attachments.file_path, attachments.file_name, attachments.file_type
-            FROM attachments
-            JOIN messages ON attachments.message_id = messages.message_id
-            WHERE messages.user_id = ?
-        ''', (user_id,))
-        attachments = cursor.fetchall()
-        conn.close()
-        return attachments
+        return self.attachment_exporter.fetch(AttachmentQuery(user_id=user_id))
 
     def get_attachments_by_type_and_channel(self, attachment_type, channel_id):
         """Retrieve all attachments of a specific type from a specific channel."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT attachments.file_path, attachments.file_name, attachments.file_type
-            FROM attachments
-            JOIN messages ON attachments.message_id = messages.message_id
-            WHERE attachments.file_type = ? AND messages.channel_id = ?
-        ''', (attachment_type, channel_id))
-        attachments = cursor.fetchall()
-        conn.close()
-        return attachments
+        return self.attachment_exporter.fetch(AttachmentQuery(attachment_type=attachment_type, channel_id=channel_id))
 
     def get_attachments_by_type_and_user(self, attachment_type, user_id):
         """Retrieve all attachments of a specific type sent by a specific user."""
-        conn = sqlite3.connect(self.db_manager.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT attachments.file_path, attachments.file_name, attachments.file_type
-            FROM attachments
-            JOIN messages ON attachments.message_id = messages.message_id
-            WHERE attachments.file_type = ? AND messages.user_id = ?
-        ''', (attachment_type, user_id))
-        attachments = cursor.fetchall()
-        conn.close()
-        return attachments
-
-    def export_attachments(self, export_dir, attachment_type=None, channel_id=None, user_id=None):
+        return self.attachment_exporter.fetch(AttachmentQuery(attachment_type=attachment_type, user_id=user_id))
+
+    def export_attachments(self, export_dir, attachment_type=None, channel_id=None, user_id=None, since=None, until=None,
+                           dry_run=False, workers=8):
         """
-        Export attachments based on type, channel, user, or a combination of these filters to a specified directory.
+        Export attachments based on type, channel, user, date, or a combination of these filters to a specified directory.
         
         Parameters:
             export_dir (str): The path to the export directory.
-            attachment_type (str): The type of attachments to export (e.g., "image").
+            attachment_type (str): The type of attachments to export (e.g., "image", "pdf", "video/mp4").
             channel_id (int): The ID of the channel from which to export attachments.
             user_id (int): The ID of the user whose attachments should be exported.
+            since (str): Only attachments of messages sent on or after this date.
+            until (str): Only attachments of messages sent before this date.
+            dry_run (bool): Only report what would be exported.
+            workers (int): Number of files placed at the same time.
+        """
+        query = AttachmentQuery(attachment_type, channel_id, user_id, since, until)
+        self.attachment_exporter.workers = workers
+        return self.attachment_exporter.export(query, export_dir, dry_run)
+
+    def export_parquet(self, export_dir, tables=None, full=False):
         """
-        # Fetch attachments based on filters
-        if attachment_type and channel_id:
-            attachments = self.get_attachments_by_type_and_channel(attachment_type, channel_id)
-        elif attachment_type and user_id:
-            attachments = self.get_attachments_by_type_and_user(attachment_type, user_id)
-        elif attachment_type:
-            attachments = self.get_attachments_by_type(attachment_type)
-        elif channel_id:
-            attachments = self.get_attachments_by_channel(channel_id)
-        elif user_id:
-            attachments = self.get_attachments_by_user(user_id)
-        else:
-            attachments = self.get_all_attachments()
-
-        if not attachments:
-            print("No attachments found for the specified criteria.")
-            return
-
-        os.makedirs(export_dir, exist_ok=True)
-
-        for file_path, file_name, file_type in attachments:
-            sub_dir = export_dir
-            if channel_id:
-                sub_dir = os.path.join(sub_dir, f"channel_{channel_id}")
-            if user_id:
-                sub_dir = os.path.join(sub_dir, f"user_{user_id}")
-            if attachment_type:
-                sub_dir = os.path.join(sub_dir, f"{attachment_type}s")
-
-            os.makedirs(sub_dir, exist_ok=True)
-
-            dest_path = os.path.join(sub_dir, file_name)
-            shutil.copy2(file_path, dest_path)
-            print(f"Exported {file_name} to {dest_path}")
-
-        print(f"Export completed. Files saved to {export_dir}.")
+        Export messages, attachments, users and channels to Parquet.
 
+        Messages are partitioned by channel and month. Repeat exports into the same
+        directory only append messages and attachments collected since the last one.
+        """
+        return self.parquet_exporter.export(export_dir, tables, full)
 
     def export_all_users(self, export_path):
         """Export all users across all channels to a specified file."""
-        users = self.display_all_users()
-        
-        os.makedirs(os.path.dirname(export_path), exist_ok=True)
-        with open(export_path, 'w') as file:
-            file.write("User ID, Username, First Name, Last Name\n")
-            for user_id, username, first_name, last_name in users:
-                file.write(f"{user_id}, {username}, {first_name}, {last_name}\n")
-        print(f"Exported all users to {export_path}.")
+        os.makedirs(os.path.dirname(export_path) or '.', exist_ok=True)
+        with open(export_path, 'w', encoding='utf-8', newline='') as file:
+            count = self.data_display.display_all_users(output_format='csv', output=file)
+        print(f"Exported {count} users to {export_path}.")
         
-    def display_all_users(self):
+    def display_all_users(self, **options):
         """Display all users across all channels."""
-        return self.data_display.display_all_users()
+        return self.data_display.display_all_users(**options)
     
-    def display_all_messages(self):
-        return self.data_display.display_all_messages()
+    def display_all_messages(self, **options):
+        return self.data_display.display_all_messages(**options)
     
-    def display_messages_from_user_in_channel(self, user_id, channel_name):
+    def display_messages_from_user_in_channel(self, user_id, channel_name, **options):
         """Display all messages from a specific user in a specific channel."""
-        return self.data_display.display_messages_from_user_in_channel(user_id, channel_name)
+        return self.data_display.display_messages_from_user_in_channel(user_id, channel_name, **options)
     
     
     def display_channels_for_user(self, user_id):
@@ -296,9 +273,6 @@ class TelegramService:
         return self.data_display.display_channels_for_user(user_id)
     
     
-    def display_users_in_channel(self, channel_name):
+    def display_users_in_channel(self, channel_name, **options):
         """Display users in a specific channel."""
-        users = self.data_display.display_users_in_channel(channel_name)
-        for user_id, username, first_name, last_name in users:
-            print(f"User ID: {user_id}, Username: {username}, First Name: {first_name}, Last Name: {last_name}")
-        return users
\ No newline at end of file
+        return self.data_display.display_users_in_channel(channel_name, **options)
\ No newline at end of file
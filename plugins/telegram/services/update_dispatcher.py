@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from telethon import events, utils
+from telethon.tl.types import PeerUser
+from plugins.telegram.services.data.batch_writer import BatchWriter
+from plugins.telegram.services.data.keyword_matcher import KeywordMatcher, KeywordWatchlist
+from plugins.telegram.services.entity_cache import EntityCache
+
+class UpdateDispatcher:
+    """
+    Single event-driven entry point for real-time monitoring.
+
+    One events.NewMessage handler receives every update pushed by Telegram and
+    routes it by chat ID to channel subscriptions, by sender ID to user
+    subscriptions, and by content to keyword subscriptions. Nothing is polled,
+    so bursts of messages are never missed and no requests are spent on idle
+    channels. Matching messages are persisted through a BatchWriter that is
+    flushed every FLUSH_INTERVAL seconds or once batch_size rows are buffered.
+
+    Every keyword match raises an alert, stored in the alerts table and
+    appended to a JSONL file when one is set. Keywords can come from a
+    watchlist file, which is checked for changes on every flush and recompiled
+    off the event loop, so the list can be edited while monitoring runs.
+    """
+
+    FLUSH_INTERVAL = 2
+
+    def __init__(self, client, db_manager, batch_size=100, entity_cache=None):
+        self.client = client
+        self.db_manager = db_manager
+        self.entity_cache = entity_cache or EntityCache(client, db_manager)
+        self.writer = BatchWriter(db_manager, batch_size)
+
+        self.channels = {}          # channel_id -> title
+        self.users = {}             # user_id -> username
+        self.keyword_matcher = KeywordMatcher([])
+        self.watchlist = None
+        self.alert_file = None
+
+    ### Subscriptions ###
+
+    def subscribe_channel(self, channel_name):
+        """Monitor a channel or group given by title, username or numeric ID, resolved through the entity cache."""
+        if str(channel_name).lstrip('-').isdigit():
+            # Updates carry bare IDs, so strip the -100... / - mark of channel and chat IDs
+            channel_id, _ = EntityCache._parse_id(channel_name)
+            title = self.db_manager.fetchone('SELECT title FROM channels WHERE channel_id = ?', (channel_id,))
+            self.channels[channel_id] = title[0] if title else str(channel_id)
+        else:
+            channel = self.entity_cache.resolve(channel_name)
+            self.channels[channel['id']] = channel['title']
+            channel_id = channel['id']
+        print(f"Starting real-time monitoring for channel: {self.channels[channel_id]}")
+
+    def subscribe_all_channels(self):
+        """Monitor every channel stored in the database, without resolving each one over the network."""
+        for channel_id, title in self.db_manager.fetchall("SELECT channel_id, title FROM channels"):
+            self.channels[channel_id] = title
+        print(f"Starting real-time monitoring for {len(self.channels)} channels.")
+
+    def subscribe_user(self, user_name):
+        """Monitor messages sent by a user, in any chat."""
+        user = self.entity_cache.resolve(user_name, 'user')
+        self.users[user['id']] = user_name
+        print(f"Starting real-time monitoring for user: {user_name}")
+
+    def subscribe_keywords(self, keywords):
+        """Monitor every incoming message for any of the given keywords."""
+        self.keyword_matcher = KeywordMatcher(self.keyword_matcher.keywords + list(keywords))
+        print(f"Keyword monitoring started for: {', '.join(self.keyword_matcher.keywords)}")
+
+    def subscribe_keywords_file(self, path):
+        """Monitor every incoming message for the keywords listed in a file, reloading it whenever it changes."""
+        self.watchlist = KeywordWatchlist(path, self.keyword_matcher.keywords)
+        self.keyword_matcher = self.watchlist.load()
+        print(f"Keyword monitoring started for {len(self.keyword_matcher.keywords)} keywords from {path}")
+
+    def set_alert_output(self, path):
+        """Append every keyword alert to a JSONL file."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.alert_file = open(path, 'a', encoding='utf-8')
+        print(f"Writing keyword alerts to {path}")
+
+    def has_subscriptions(self):
+        return bool(self.channels or self.users or self.keyword_matcher or self.watchlist)
+
+    ### Dispatching ###
+
+    def run(self):
+        """Register the handler and process updates until the client disconnects."""
+        if not self.has_subscriptions():
+            print("Nothing to monitor.")
+            return
+
+        self.client.add_event_handler(self._on_new_message, events.NewMessage())
+        flusher = self.client.loop.create_task(self._flush_periodically())
+        try:
+            self.client.run_until_disconnected()
+        finally:
+            flusher.cancel()
+            self.writer.flush()
+            if self.alert_file:
+                self.alert_file.close()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            self.writer.flush()
+            if self.alert_file:
+                self.alert_file.flush()
+            if self.watchlist and self.watchlist.changed():
+                await self._reload_keywords()
+
+    async def _reload_keywords(self):
+        """Recompile the watchlist on a worker thread and swap the matcher in once ready."""
+        try:
+            matcher = await asyncio.get_event_loop().run_in_executor(None, self.watchlist.load)
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Failed to reload keywords from {self.watchlist.path}: {e}")
+            return
+        self.keyword_matcher = matcher
+        print(f"Reloaded {len(matcher.keywords)} keywords from {self.watchlist.path}")
+
+    async def _on_new_message(self, event):
+        message = event.message
+        chat_id = utils.get_peer_id(message.peer_id, add_mark=False)
+        sender_id = message.from_id.user_id if isinstance(message.from_id, PeerUser) else None
+        is_private = isinstance(message.peer_id, PeerUser)
+
+        matched = False
+
+        if chat_id in self.channels and not is_private:
+            print(f"Real-time message in {self.channels[chat_id]}: {message.message}")
+            matched = True
+
+        if sender_id in self.users:
+            print(f"New message from {self.users[sender_id]}: {message.message}")
+            matched = True
+
+        if self.keyword_matcher:
+            found = self.keyword_matcher.matches(message.message)
+            for keyword in found:
+                print(f"Keyword '{keyword}' found in chat {chat_id}: {message.message}")
+                self._raise_alert(keyword, message, chat_id, sender_id)
+            matched = matched or bool(found)
+
+        if matched:
+            self.writer.add_message(message, None if is_private else chat_id)
+
+    def _raise_alert(self, keyword, message, chat_id, sender_id):
+        alert = {
+            'keyword': keyword,
+            'channel_id': chat_id,
+            'message_id': message.id,
+            'user_id': sender_id,
+            'date': message.date.strftime("%Y-%m-%d %H:%M:%S") if message.date else None,
+            'content': message.message,
+            'matched_at': datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self.writer.add_alert(alert)
+        if self.alert_file:
+            self.alert_file.write(json.dumps(alert, ensure_ascii=False) + '\n')
@@ -1,13 +1,14 @@
 import logging
 import os
 import json
+import queue
 import subprocess
 import requests
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, urljoin
-from playwright.sync_api import sync_playwright
 from bs4 import BeautifulSoup
+from core.fetch.page_fetcher import PageFetcher
 from plugins.website.techkagoofil import TechkaGoofil
 
 OUTPUT_DIR = "data/output"
@@ -60,45 +61,77 @@ def run_katana_for_urls(target, all_urls_file, auth_header=None, target_only=Fal
         logger.removeHandler(console_handler)
         
 
-def download_full_page_with_js(url, output_file, auth_header=None):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        if auth_header:
-            key, value = auth_header.split("=", 1)
-            page.set_extra_http_headers({key: value})
+def download_full_page_with_js(url, output_file, browser_pool, auth_header=None):
+    headers = {}
+    if auth_header:
+        key, value = auth_header.split("=", 1)
+        headers[key] = value
 
-        try:
+    try:
+        with browser_pool.page(extra_http_headers=headers) as page:
             page.goto(url)
             with open(output_file, "w", encoding="utf-8") as f:
                 f.write(page.content())
-            print(f"Downloaded content for {url}")
-        except Exception as e:
-            print(f"Error fetching {url}: {e}")
-        finally:
-            browser.close()
+        print(f"Downloaded content for {url}")
+        return True
+    except Exception as e:
+        print(f"Error fetching {url}: {e}")
+        return False
 
-def process_url(url, scraped_dir, metadata, collection_date, auth_header=None):
+def download_page(url, output_file, fetcher, browser_pool, auth_header=None):
+    """Save url over plain HTTP, rendering it in a browser only when it needs JavaScript."""
+    headers = None
+    if auth_header:
+        key, value = auth_header.split("=", 1)
+        headers = {key: value}
+
+    try:
+        result = fetcher.fetch(url, headers=headers)
+        if result.failed:
+            print(f"Error fetching {url}: {result.reason}")
+            return False
+        if result.needs_browser:
+            saved = download_full_page_with_js(url, output_file, browser_pool, auth_header)
+            fetcher.count("browser" if saved else "failed")
+            return saved
+        # Written as served, so binary documents are saved intact
+        with open(output_file, "wb") as f:
+            f.write(result.body)
+    except (OSError, requests.RequestException) as e:
+        # One URL failing never stops the worker, and metadata.json is still written
+        print(f"Error saving {url}: {e}")
+        fetcher.count("failed")
+        return False
+    print(f"Downloaded content for {url}")
+    return True
+
+def process_url(url, scraped_dir, metadata, collection_date, fetcher, browser_pool, auth_header=None):
     parsed_url = urlparse(url)
     
     path = os.path.join(scraped_dir, parsed_url.netloc, parsed_url.path.strip('/'))
     
-    if parsed_url.path.endswith('/') or not os.path.basename(parsed_url.path):
-        os.makedirs(path, exist_ok=True)
-        output_file = os.path.join(path, "index.html")
-    else:
-        directory = os.path.dirname(path)
-        os.makedirs(directory, exist_ok=True)
-        filename = os.path.basename(parsed_url.path)
-        if '.' not in filename:
-            filename += ".html" 
-        output_file = os.path.join(directory, filename)
+    try:
+        if parsed_url.path.endswith('/') or not os.path.basename(parsed_url.path):
+            os.makedirs(path, exist_ok=True)
+            output_file = os.path.join(path, "index.html")
+        else:
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            filename = os.path.basename(parsed_url.path)
+            if '.' not in filename:
+                filename += ".html" 
+            output_file = os.path.join(directory, filename)
+    except OSError as e:
+        print(f"Error saving {url}: {e}")
+        fetcher.count("failed")
+        return
 
     if os.path.exists(output_file):
         print(f"Skipping {url}; already processed.")
         return
 
-    download_full_page_with_js(url, output_file, auth_header)
+    if not download_page(url, output_file, fetcher, browser_pool, auth_header):
+        return
     
     metadata_entry = {
         "filepath": output_file,
@@ -107,7 +140,7 @@ def process_url(url, scraped_dir, metadata, collection_date, auth_header=None):
     }
     metadata.append(metadata_entry)
 
-def run_playwright_for_content(urls_file, scraped_dir, metadata, auth_header=None):
+def run_playwright_for_content(urls_file, scraped_dir, metadata, browser_pool, auth_header=None):
     if not os.path.exists(urls_file):
         os.makedirs(os.path.dirname(urls_file), exist_ok=True)
         open(urls_file, "w").close()
@@ -116,10 +149,28 @@ def run_playwright_for_content(urls_file, scraped_dir, metadata, auth_header=Non
         urls = [url.strip() for url in f if url.strip()]
 
     collection_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    fetcher = PageFetcher(pool_size=CONCURRENT_DOWNLOAD_WORKERS)
+    pending = queue.SimpleQueue()
+    for url in urls:
+        pending.put(url)
+
+    def worker():
+        # Each worker reuses its thread's pooled browser for every URL that needs one
+        try:
+            while True:
+                try:
+                    url = pending.get_nowait()
+                except queue.Empty:
+                    return
+                process_url(url, scraped_dir, metadata, collection_date, fetcher, browser_pool, auth_header)
+        finally:
+            browser_pool.close_thread()
+
     with ThreadPoolExecutor(max_workers=CONCURRENT_DOWNLOAD_WORKERS) as executor:
-        futures = [executor.submit(process_url, url, scraped_dir, metadata, collection_date, auth_header) for url in urls]
-        for future in as_completed(futures):
+        futures = [executor.submit(worker) for _ in range(CONCURRENT_DOWNLOAD_WORKERS)]
+        for future in futures:
             future.result()
+    fetcher.report()
 
     with open(METADATA_FILE, "w", encoding="utf-8") as json_file:
         json.dump(metadata, json_file, ensure_ascii=False, indent=4)
@@ -157,7 +208,7 @@ def download_file(file_url, output_dir):
     except requests.HTTPError as e:
         print(f"File download error from {file_url}: {e}")
         
-def run_techkagoofil(domain, save_directory, slow_download=False, max_pages=200):
+def run_techkagoofil(domain, save_directory, browser_pool, slow_download=False, max_pages=200):
     print(f"[*] Running TechkaGoofil for domain: {domain}")
     link_file = os.path.join(OUTPUT_DIR, f"techkagoofil_urls_{domain}.txt")
     output_json_path = os.path.join(OUTPUT_DIR, f"techkagoofil_filebindings_{domain}.json")
@@ -167,7 +218,8 @@ def run_techkagoofil(domain, save_directory, slow_download=False, max_pages=200)
         output_dir=save_directory,
         slow_download=slow_download,
         link_file=link_file,
-        max_pages=max_pages
+        max_pages=max_pages,
+        browser_pool=browser_pool
     )
 
     try:
@@ -182,7 +234,7 @@ def run_techkagoofil(domain, save_directory, slow_download=False, max_pages=200)
     except Exception as e:
         print(f"Error running TechkaGoofil for domain {domain}: {e}")
 
-def collect(target, auth_header=None, target_only=False, slow_download=False, techkagoofil=False, scrap=False, max_pages=200):
+def collect(target, browser_pool, auth_header=None, target_only=False, slow_download=False, techkagoofil=False, scrap=False, max_pages=200):
     
     if scrap:
         metadata = []
@@ -197,7 +249,7 @@ def collect(target, auth_header=None, target_only=False, slow_download=False, te
             with open(METADATA_FILE, "r") as metadata_file:
                 metadata = json.load(metadata_file)
 
-        run_playwright_for_content(ALL_URLS_FILE, SCRAPED_DIR, metadata, auth_header)
+        run_playwright_for_content(ALL_URLS_FILE, SCRAPED_DIR, metadata, browser_pool, auth_header)
         
         extract_and_download_files(SCRAPED_DIR, ["pdf", "jpeg", "webp", "dat", "sql" "webm", "bin", "docx", "doc", "pptx", "xlsx", "jpg", "png", "txt", "bak", "backup", "xls", "csv", "md", "cpp", "py", "js"])
 
@@ -205,6 +257,6 @@ def collect(target, auth_header=None, target_only=False, slow_download=False, te
             json.dump(metadata, json_file, ensure_ascii=False, indent=4)
         
     if techkagoofil:
-        run_techkagoofil(target, os.path.join(SCRAPED_DIR, target, "techkagoofil"), slow_download=slow_download, max_pages=max_pages)
+        run_techkagoofil(target, os.path.join(SCRAPED_DIR, target, "techkagoofil"), browser_pool, slow_download=slow_download, max_pages=max_pages)
         
     print("Collection finished.")
\ No newline at end of file
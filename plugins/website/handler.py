@@ -52,6 +52,7 @@ class Handler(Plugin):
     def _handle_collect(self, args):
         collect(
             args.url, 
+            self.service_provider.get_browser_pool(),
             scrap=args.scrap,
             auth_header=args.auth_header, 
             target_only=args.target_only, 
@@ -92,5 +93,5 @@ class Handler(Plugin):
                 
     def _handle_snapshot(self, args):
         output_file = os.path.join(SCRAPED_DIR, "snapshot.html")
-        handle_snapshot(args.url, output_file, auth_header=args.auth_header)
+        handle_snapshot(args.url, output_file, self.service_provider.get_browser_pool(), auth_header=args.auth_header)
         print(f"Snapshot of {args.url} saved to {output_file}")
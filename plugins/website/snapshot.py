@@ -1,24 +1,22 @@
 import os
 from urllib.parse import urljoin, urlparse
 import requests
-from playwright.sync_api import sync_playwright
 
 SCRAPED_DIR = "data/output/scraped"
 
-def handle_snapshot(url, output_file, auth_header=None):
+def handle_snapshot(url, output_file, browser_pool, auth_header=None):
     parsed_url = urlparse(url)
     domain = parsed_url.netloc
     snapshot_dir = os.path.join(SCRAPED_DIR, f"{domain}-snapshot")
     os.makedirs(snapshot_dir, exist_ok=True)
     output_file_path = os.path.join(snapshot_dir, "index.html")
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        if auth_header:
-            key, value = auth_header.split("=", 1)
-            page.set_extra_http_headers({key: value})
+    headers = {}
+    if auth_header:
+        key, value = auth_header.split("=", 1)
+        headers[key] = value
 
+    with browser_pool.page(extra_http_headers=headers) as page:
         try:
             page.goto(url, wait_until="networkidle")
             html_content = page.content()
@@ -37,8 +35,6 @@ def handle_snapshot(url, output_file, auth_header=None):
 
         except Exception as e:
             print(f"Error fetching {url}: {e}")
-        finally:
-            browser.close()
 
 
 def download_asset(asset_url, output_dir, base_url):
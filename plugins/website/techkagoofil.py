@@ -2,18 +2,18 @@ import os
 import mimetypes
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
+from plugins.dork.services.link_extractor import LinkExtractor
 import requests
 
 class TechkaGoofil:
-    def __init__(self, domain, output_dir="output", file_types=None, max_pages=200, slow_download=False, link_file="discovered_links.txt"):
+    def __init__(self, domain, output_dir="output", file_types=None, max_pages=200, slow_download=False, link_file="discovered_links.txt", browser_pool=None):
         self.domain = domain
         self.output_dir = output_dir
         self.file_types = file_types or ["pdf", "docx", "doc", "txt"]
         self.max_pages = int(max_pages) if max_pages else 200
         self.slow_download = slow_download
         self.link_file = link_file
+        self.browser_pool = browser_pool
         self.seen_urls = set()
         self.file_metadata = {}
         self.links_loaded_from_file = False
@@ -34,14 +34,10 @@ class TechkaGoofil:
             self.links_loaded_from_file = True
 
     def start_browser(self):
-        self.playwright = sync_playwright().start()
-        self.browser = self.playwright.chromium.launch(headless=False)
-        self.page = self.browser.new_page()
+        self.page = self.browser_pool.lease(headless=False)
 
     def close_browser(self):
-        self.page.close()
-        self.browser.close()
-        self.playwright.stop()
+        self.browser_pool.release(self.page)
 
     def _search_files_on_engine(self, query, engine_url, engine_name):
         self.page.goto(engine_url)
@@ -67,52 +63,9 @@ class TechkaGoofil:
             pass
 
     def extract_links_with_titles(self, content, engine):
-        soup = BeautifulSoup(content, 'html.parser')
-        links_with_titles = {}
-
-        if engine == "google":
-            for result in soup.find_all('div', class_='g'):
-                title_tag = result.find('h3')
-                link_tag = result.find('a', href=True)
-                if title_tag and link_tag:
-                    title = title_tag.get_text(strip=True)
-                    url = link_tag['href']
-                    if url not in self.seen_urls:
-                        links_with_titles[url] = title
-                        self.seen_urls.add(url)
-
-        elif engine == "duckduckgo":
-            for result in soup.find_all('article', {'data-testid': 'result'}):
-                title_tag = result.find('h2')
-                link_tag = title_tag.find('a', href=True) if title_tag else None
-                if title_tag and link_tag:
-                    title = title_tag.get_text(strip=True)
-                    url = link_tag['href']
-                    if url not in self.seen_urls:
-                        links_with_titles[url] = title
-                        self.seen_urls.add(url)
-
-        elif engine == "bing":
-            for result in soup.find_all('li', class_='b_algo'):
-                title_tag = result.find('h2')
-                link_tag = title_tag.find('a', href=True) if title_tag else None
-                if title_tag and link_tag:
-                    title = title_tag.get_text(strip=True)
-                    url = link_tag['href']
-                    if url not in self.seen_urls:
-                        links_with_titles[url] = title
-                        self.seen_urls.add(url)
-
-        elif engine == "yandex":
-            for result in soup.find_all('div', class_='Organic'):
-                title_tag = result.find('h2', class_='OrganicTitle-LinkText')
-                link_tag = result.find('a', href=True)
-                if title_tag and link_tag:
-                    title = title_tag.get_text(strip=True)
-                    url = link_tag['href']
-                    if url not in self.seen_urls:
-                        links_with_titles[url] = title
-                        self.seen_urls.add(url)
+        links_with_titles = {
+            url: details['title'] for url, details in LinkExtractor.extract_links(content, engine, self.seen_urls).items()
+        }
 
         self.file_metadata.update(links_with_titles)
         with open(self.link_file, "a") as f:
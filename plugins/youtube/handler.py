@@ -46,7 +46,8 @@ class Handler(Plugin):
                 audio_codec=args.audio_codec,
                 do_transcript=args.transcript,
                 do_description=args.description,
-                do_comments=args.comments
+                do_comments=args.comments,
+                browser_pool=self.service_provider.get_browser_pool()
             )
         elif args.mode == "channel":
             handle_channel(
@@ -57,5 +58,6 @@ class Handler(Plugin):
                 audio_codec=args.audio_codec,
                 do_transcript=args.transcript,
                 do_description=args.description,
-                do_comments=args.comments
+                do_comments=args.comments,
+                browser_pool=self.service_provider.get_browser_pool()
             )
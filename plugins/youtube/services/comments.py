@@ -4,9 +4,9 @@ import time
 import json
 
 try:
-    from playwright.sync_api import sync_playwright, Page
+    from playwright.sync_api import Page
 except ImportError:
-    sync_playwright = None
+    Page = None
 
 def extract_video_id(url: str) -> str:
     match = re.search(r"(?:v=)([a-zA-Z0-9_\-]{11})", url)
@@ -190,8 +190,8 @@ def scrape_all_comments(page: "Page") -> list:
     data = gather_comments_data(page)
     return data
 
-def download_comments(url: str, out_dir: str = ".") -> None:
-    if not sync_playwright:
+def download_comments(url: str, browser_pool, out_dir: str = ".") -> None:
+    if not Page:
         print("[ERROR] You must install playwright to run this script.")
         return
 
@@ -203,10 +203,7 @@ def download_comments(url: str, out_dir: str = ".") -> None:
     fp = os.path.join(out_dir, f"{video_id}_comments.json")
 
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            page = browser.new_page()
-
+        with browser_pool.page(headless=False) as page:
             page.set_default_navigation_timeout(60000)
             page.set_default_timeout(60000)
 
@@ -218,8 +215,6 @@ def download_comments(url: str, out_dir: str = ".") -> None:
 
             comments_data = scrape_all_comments(page)
 
-            browser.close()
-
         with open(fp, "w", encoding="utf-8") as f:
             json.dump(comments_data, f, indent=2, ensure_ascii=False)
         print(f"[INFO] Comments saved to: {fp}")
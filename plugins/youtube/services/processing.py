@@ -20,7 +20,8 @@ def handle_single_video(
     audio_codec: str = "aac",
     do_transcript: bool = False,
     do_description: bool = False,
-    do_comments: bool = False
+    do_comments: bool = False,
+    browser_pool=None
 ) -> None:
     
     if "/shorts/" in url:
@@ -38,7 +39,7 @@ def handle_single_video(
     if do_description:
         download_description(url, out_dir)
     if do_comments:
-        download_comments(url, out_dir)
+        download_comments(url, browser_pool, out_dir)
     if do_audio:
         download_audio(url, out_dir)
 
@@ -51,7 +52,8 @@ def handle_channel(
     audio_codec: str = "aac",
     do_transcript: bool = False,
     do_description: bool = False,
-    do_comments: bool = False
+    do_comments: bool = False,
+    browser_pool=None
 ) -> None:
     if not os.path.exists(out_dir):
         os.makedirs(out_dir)
@@ -77,7 +79,8 @@ def handle_channel(
                     audio_codec=audio_codec,
                     do_transcript=do_transcript,
                     do_description=do_description,
-                    do_comments=do_comments
+                    do_comments=do_comments,
+                    browser_pool=browser_pool
                 )
     except Exception as ex:
         print(f"[ERROR] Channel/playlist failed: {ex}")
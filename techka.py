@@ -3,13 +3,17 @@ from core.providers.service_provider import ServiceProvider
 from core.plugins.plugin_handler import initialize as initialize_plugins
 
 if __name__ == "__main__":
+    service_provider = ServiceProvider()
     plugins = initialize_plugins([
         'plugins', 
         'plugins/techka-secret'
     ])({
-        "service_provider": ServiceProvider()
+        "service_provider": service_provider
     })
         
     cli_handler = CliController(plugins)
 
-    cli_handler.execute()
+    try:
+        cli_handler.execute()
+    finally:
+        service_provider.shutdown()
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import time
+import unittest
+from plugins.telegram.services.entity_cache import EntityCache
+from plugins.telegram.services.telegram_database import DatabaseManager
+from plugins.telegram.services.update_dispatcher import UpdateDispatcher
+
+BASIC_CHAT = -1001234567          # basic group 1001234567: below 10**12, so not a channel mark
+CHANNEL = -1001234567890          # channel 1234567890, marked as -(10**12 + id)
+
+class MarkedIdTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_manager = DatabaseManager(os.path.join(self.directory.name, 'test.db'))
+
+    def tearDown(self):
+        self.db_manager.close()
+        self.directory.cleanup()
+
+    def test_parse_id(self):
+        self.assertEqual(EntityCache._parse_id(BASIC_CHAT), (1001234567, 'chat'))
+        self.assertEqual(EntityCache._parse_id(str(BASIC_CHAT)), (1001234567, 'chat'))
+        self.assertEqual(EntityCache._parse_id(CHANNEL), (1234567890, 'channel'))
+        self.assertEqual(EntityCache._parse_id(str(CHANNEL)), (1234567890, 'channel'))
+        self.assertEqual(EntityCache._parse_id('1234567'), (1234567, None))
+
+    def test_lookup_keeps_chats_and_channels_apart(self):
+        now = time.time()
+        self.db_manager.save_entities([
+            {'id': 1001234567, 'type': 'chat', 'access_hash': None, 'username': None, 'title': 'group', 'resolved_at': now},
+            {'id': 1234567, 'type': 'channel', 'access_hash': 1, 'username': None, 'title': 'other', 'resolved_at': now},
+            {'id': 1234567890, 'type': 'channel', 'access_hash': 2, 'username': None, 'title': 'channel', 'resolved_at': now},
+        ])
+        cache = EntityCache(None, self.db_manager)
+        self.assertEqual(cache.lookup(BASIC_CHAT)['title'], 'group')
+        self.assertEqual(cache.lookup(CHANNEL)['title'], 'channel')
+
+    def test_subscribe_channel_uses_bare_ids(self):
+        dispatcher = UpdateDispatcher(None, self.db_manager)
+        dispatcher.subscribe_channel(str(BASIC_CHAT))
+        dispatcher.subscribe_channel(str(CHANNEL))
+        self.assertEqual(set(dispatcher.channels), {1001234567, 1234567890})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import re
+import unittest
+from plugins.telegram.services.data.keyword_matcher import KeywordMatcher
+
+def per_keyword(keywords, text):
+    """What a separate whole-word search per keyword finds, for comparison."""
+    found = []
+    for keyword in keywords:
+        found += [keyword] * len(re.findall(r'(?<!\w)' + re.escape(keyword) + r'(?!\w)', text, re.IGNORECASE))
+    return sorted(found)
+
+class KeywordMatcherTest(unittest.TestCase):
+    def test_keyword_inside_longer_keyword_is_counted(self):
+        matcher = KeywordMatcher(['new york', 'york'])
+        self.assertEqual(sorted(matcher.findall('Flights to New York today')), ['new york', 'york'])
+
+    def test_keyword_prefix_of_longer_keyword_is_counted(self):
+        matcher = KeywordMatcher(['new york', 'new'])
+        self.assertEqual(sorted(matcher.findall('new york')), ['new', 'new york'])
+
+    def test_overlapping_keywords_are_both_counted(self):
+        matcher = KeywordMatcher(['new york', 'york city'])
+        self.assertEqual(sorted(matcher.findall('new york city')), ['new york', 'york city'])
+
+    def test_whole_words_only(self):
+        matcher = KeywordMatcher(['scam', 'scammer'])
+        self.assertEqual(matcher.findall('scammers scammer scam'), ['scammer', 'scam'])
+
+    def test_matches_per_keyword_search(self):
+        keywords = ['new york', 'york', 'new', 'york city', 'ha ha', 'ha', 'scam', 'scammer', 'Scam Alert']
+        text = 'NEW YORK city scam alert: ha ha ha, the new scammer in york. newyork scam'
+        self.assertEqual(sorted(KeywordMatcher(keywords).findall(text)), per_keyword(keywords, text))
+
+    def test_keywords_are_returned_as_given(self):
+        matcher = KeywordMatcher(['Scam Alert'])
+        self.assertEqual(matcher.findall('SCAM ALERT'), ['Scam Alert'])
+        self.assertEqual(matcher.findall(None), [])
+
+if __name__ == '__main__':
+    unittest.main()
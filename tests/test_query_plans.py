@@ -0,0 +1,130 @@
+"""
+EXPLAIN QUERY PLAN regression check for the Telegram display and process paths.
+
+Runs every query issued by DataDisplay, DataProcessor and the social graph
+builder against a freshly migrated database and fails if any of them scans a
+table it is not expected to read in full.
+"""
+import contextlib
+import io
+import os
+import re
+import tempfile
+import unittest
+from plugins.telegram.services.telegram_database import DatabaseManager
+from plugins.telegram.services.data.data_display import DataDisplay
+from plugins.telegram.services.data.data_processing import DataProcessor
+from plugins.telegram.services.intelligence_analysis import IntelligenceAnalysis
+from plugins.telegram.services.data.attachment_export import AttachmentExporter, AttachmentQuery
+
+SAMPLE_CHANNEL = "audit channel"
+SAMPLE_USER = 1
+
+SINCE = {'since': '2024-01-01'}
+AFTER = {'after': '2024-01-01 00:00:00|1', 'limit': 100}
+
+# (component, method, args, kwargs, tables the query may legitimately read in full)
+AUDITED_CALLS = (
+    ('display', 'display_channels', (), {}, {'channels'}),
+    ('display', 'display_single_channel', (SAMPLE_CHANNEL,), {}, set()),
+    ('display', 'display_all_users', (), {}, {'users'}),
+    ('display', 'display_messages_in_channel', (SAMPLE_CHANNEL,), {}, set()),
+    ('display', 'display_all_messages', (), {}, {'messages'}),
+    ('display', 'display_messages_from_user', (SAMPLE_USER,), {}, set()),
+    ('display', 'display_latest_messages_in_channel', (SAMPLE_CHANNEL,), {}, set()),
+    ('display', 'display_messages_from_user_in_channel', (SAMPLE_USER, SAMPLE_CHANNEL), {}, set()),
+    ('display', 'display_all_messages', (), SINCE, set()),
+    ('display', 'display_all_messages', (), AFTER, set()),
+    ('display', 'display_messages_in_channel', (SAMPLE_CHANNEL,), AFTER, set()),
+    ('display', 'display_messages_from_user', (SAMPLE_USER,), SINCE, set()),
+    ('display', 'display_users_in_channel', (SAMPLE_CHANNEL,), {'after': '1'}, set()),
+    ('display', 'display_channels_for_user', (SAMPLE_USER,), {}, set()),
+    ('display', 'display_users_in_channel', (SAMPLE_CHANNEL,), {}, set()),
+    ('display', 'display_channel_statistics', (), {}, {'channels'}),
+    ('processor', 'analyze_user_activity', (SAMPLE_CHANNEL,), {}, set()),
+    ('processor', 'keyword_analysis_in_channel', (['audit'], SAMPLE_CHANNEL), {}, set()),
+    ('processor', 'process_user_interactions', (SAMPLE_CHANNEL,), {}, set()),
+    ('processor', 'analyze_keywords_in_messages', (['audit'], SAMPLE_CHANNEL), {}, set()),
+    ('processor', 'analyze_keywords', (['audit'],), {}, {'messages'}),
+    ('processor', 'get_usernames', ([SAMPLE_USER],), {}, set()),
+    ('processor', 'activity_timeline', (SAMPLE_CHANNEL,), {}, set()),
+    ('processor', 'activity_timeline', (), {'user_id': SAMPLE_USER, 'bucket': 'hour'}, set()),
+    ('processor', 'activity_timeline', (), {'bucket': 'month', **SINCE}, {'activity_daily'}),
+    ('processor', 'activity_timeline', (), {}, {'activity_daily'}),
+    ('processor', 'top_posters', (SAMPLE_CHANNEL,), {}, set()),
+    ('processor', 'top_posters', (), {}, {'activity_daily'}),
+    ('processor', 'posting_heatmap', (SAMPLE_CHANNEL,), {}, set()),
+    ('processor', 'posting_heatmap', (), {'user_id': SAMPLE_USER}, set()),
+    ('exporter', 'fetch', (AttachmentQuery(channel_id=1, since='2024-01-01'),), {}, set()),
+    ('exporter', 'fetch', (AttachmentQuery(attachment_type='image', user_id=SAMPLE_USER),), {}, set()),
+    ('exporter', 'fetch', (AttachmentQuery(attachment_type='image'),), {}, {'attachments'}),
+    # The graph reads every message once; replies must still find their parent by index
+    ('analysis', 'build_social_graph', (), {}, {'messages', 'users', 'channels', 'edges'}),
+)
+
+# "SCAN messages" or "SCAN m USING INDEX ..." (a full walk, even if through an index);
+# "SEARCH ..." lines are index lookups and always acceptable.
+SCAN_PATTERN = re.compile(r'^SCAN (\w+)')
+
+def _seed(db_manager):
+    """Insert one row per table so every code path issues its queries."""
+    db_manager.save_channel_info(1, SAMPLE_CHANNEL, 'audit', 'channel', 1, None)
+    db_manager.save_user({'user_id': SAMPLE_USER, 'username': 'audit', 'first_name': 'A', 'last_name': 'B'}, 1)
+    db_manager.save_message({'message_id': 1, 'user_id': SAMPLE_USER, 'channel_id': 1, 'date': '2024-01-01 00:00:00', 'content': 'audit'})
+
+def _full_scans(db_manager, query, params):
+    """Return the tables (by name or alias) a query scans in full."""
+    scans = set()
+    for detail in db_manager.explain(query, params):
+        match = SCAN_PATTERN.match(detail)
+        if match:
+            scans.add(match.group(1))
+    return scans
+
+def _table_aliases(query):
+    """Map aliases used in FROM/JOIN clauses back to table names."""
+    aliases = {}
+    for table, alias in re.findall(r'(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', query, re.IGNORECASE):
+        aliases[table] = table
+        if alias and alias.upper() not in ('ON', 'WHERE', 'JOIN', 'GROUP', 'ORDER', 'LEFT', 'INNER', 'LIMIT'):
+            aliases[alias] = table
+    return aliases
+
+class QueryPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_manager = DatabaseManager(os.path.join(self.directory.name, 'audit.db'))
+        _seed(self.db_manager)
+        self.components = {
+            'display': DataDisplay(self.db_manager),
+            'processor': DataProcessor(self.db_manager),
+            'analysis': IntelligenceAnalysis(None, self.db_manager),
+            'exporter': AttachmentExporter(self.db_manager),
+        }
+
+    def tearDown(self):
+        self.db_manager.close()
+        self.directory.cleanup()
+
+    def _queries(self, component, method, args, kwargs):
+        """Run one audited call and return the (query, params) it issued."""
+        self.db_manager.query_log = []
+        try:
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                getattr(self.components[component], method)(*args, **kwargs)
+            return self.db_manager.query_log
+        finally:
+            self.db_manager.query_log = None
+
+    def test_no_unexpected_full_table_scans(self):
+        for component, method, args, kwargs, allowed in AUDITED_CALLS:
+            for query, params in self._queries(component, method, args, kwargs):
+                aliases = _table_aliases(query)
+                # Walking the (small) materialised result of a subquery is not a table scan
+                derived = set(re.findall(r'\)\s+AS\s+(\w+)', query, re.IGNORECASE))
+                scanned = {aliases.get(name, name) for name in _full_scans(self.db_manager, query, params) - derived}
+                with self.subTest(method=method, args=args, kwargs=kwargs, query=' '.join(query.split())):
+                    self.assertEqual(scanned - allowed, set())
+
+if __name__ == '__main__':
+    unittest.main()